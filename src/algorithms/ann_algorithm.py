@@ -0,0 +1,213 @@
+"""
+This module compares documents in a dense, low-dimensional space and searches it with an inverted-file (IVF) index:
+originals are clustered with k-means and a query only scans the originals of the clusters closest to it, so the cost
+of a query grows with the size of the probed clusters instead of the size of the corpus.
+"""
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import BaseModel
+from src.util.file_manager import FileManager as Fm
+from src.util.metrics import metrics
+from src.util.text import Document
+
+
+class AnnAlgorithm(BaseModel):
+    """
+    This class projects the TF-IDF vectors of the documents into n_components dimensions, either with a truncated SVD
+    (latent semantic analysis, which also relates words that appear in similar contexts) or with a random Gaussian
+    projection, and returns the cosine similarity of the projected vectors. Originals outside the probed clusters get a
+    similarity of 0.
+
+    Recall is tuned with n_probe: probing every cluster gives the exact similarity in the projected space.
+    """
+    cost = 1.5
+    methods = ("svd", "random")
+
+    def __init__(self, n_components: int = 128, method: str = "svd", n_lists: int | None = None, n_probe: int = 8,
+                 seed: int = 0):
+        """
+        :param n_components: The number of dimensions of the projected space.
+        :param method: The projection, "svd" or "random".
+        :param n_lists: The number of clusters of the IVF index. Defaults to the square root of the number of originals.
+        :param n_probe: The number of clusters scanned per query.
+        :param seed: The seed of the projection and the clustering.
+        """
+        super().__init__()
+        if method not in self.methods:
+            raise ValueError("Invalid projection method.")
+        self.__scorer = CosineAlgorithm("tfidf")
+        self.__n_components = n_components
+        self.__method = method
+        self.__n_lists = n_lists
+        self.n_probe = n_probe
+        self.__seed = seed
+        self.__projection: np.ndarray | None = None
+        self.__embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.__centroids = np.zeros((0, 0), dtype=np.float32)
+        self.__centroid_norms = np.zeros(0, dtype=np.float32)
+        # Rows of the originals grouped by cluster: the rows of cluster i are members[offsets[i]:offsets[i + 1]]
+        self.__members = np.zeros(0, dtype=np.int64)
+        self.__offsets = np.zeros(1, dtype=np.int64)
+        self.__source = None
+
+    @property
+    def scorer(self) -> CosineAlgorithm:
+        return self.__scorer
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self.__embeddings
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Fits the TF-IDF index, the projection and the IVF index over a directory unless they are already fitted over it.
+        :param f_dir: The directory containing the original files.
+        """
+        self.__scorer.prepare(f_dir)
+        if self.__source == Path(f_dir) and self.__projection is not None:
+            return
+        matrix = self.__scorer.index.matrix
+        with metrics.time("ann.fit"):
+            self.__fit_projection(matrix)
+            self.__embeddings = self.__project(matrix)
+            self.__fit_lists()
+        self.__source = Path(f_dir)
+
+    def __fit_projection(self, matrix: sparse.csr_matrix) -> None:
+        n_docs, n_terms = matrix.shape
+        n_components = max(min(self.__n_components, n_docs - 1, n_terms - 1), 1)
+        if self.__method == "svd" and n_components < min(n_docs, n_terms):
+            # Imported here so importing the module doesn't load scikit-learn
+            from sklearn.decomposition import TruncatedSVD
+            svd = TruncatedSVD(n_components, random_state=self.__seed).fit(matrix)
+            self.__projection = svd.components_.T.astype(np.float32)
+        else:
+            rng = np.random.default_rng(self.__seed)
+            self.__projection = (rng.standard_normal((n_terms, self.__n_components)) /
+                                 np.sqrt(self.__n_components)).astype(np.float32)
+
+    def __project(self, vectors: sparse.csr_matrix) -> np.ndarray:
+        embeddings = np.asarray(vectors @ self.__projection, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+    def __fit_lists(self) -> None:
+        n_docs = len(self.__embeddings)
+        n_lists = min(self.__n_lists or max(int(np.sqrt(n_docs)), 1), max(n_docs, 1))
+        if n_docs == 0:
+            labels = np.zeros(0, dtype=np.int64)
+            self.__centroids = np.zeros((1, self.__embeddings.shape[1]), dtype=np.float32)
+        elif n_lists == 1:
+            labels = np.zeros(n_docs, dtype=np.int64)
+            self.__centroids = self.__embeddings.mean(axis=0, keepdims=True)
+        else:
+            from sklearn.cluster import KMeans
+            kmeans = KMeans(n_lists, n_init=1, random_state=self.__seed).fit(self.__embeddings)
+            labels = kmeans.labels_.astype(np.int64)
+            self.__centroids = kmeans.cluster_centers_.astype(np.float32)
+        self.__centroid_norms = np.einsum("ij,ij->i", self.__centroids, self.__centroids)
+        self.__members = np.argsort(labels, kind="stable")
+        self.__offsets = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=len(self.__centroids)))])
+
+    def embed(self, documents: list[Document]) -> np.ndarray:
+        """
+        Projects documents into the fitted space.
+        :param documents: The documents to project.
+        :return: A (documents x n_components) float32 array of normalized embeddings.
+        """
+        index = self.__scorer.index
+        return self.__project(index.vectorize_counts([document.term_counts for document in documents]))
+
+    def candidates(self, embedding: np.ndarray) -> np.ndarray:
+        """
+        Looks up the originals of the n_probe clusters closest to an embedding.
+        :param embedding: A normalized embedding returned by embed().
+        :return: The sorted row indices of the candidate originals.
+        """
+        n_probe = min(self.n_probe, len(self.__centroids))
+        # Same order as the Euclidean distance used to assign the originals to clusters, since embedding is normalized
+        closeness = 2 * (self.__centroids @ embedding) - self.__centroid_norms
+        closest = np.argpartition(-closeness, n_probe - 1)[:n_probe]
+        rows = [self.__members[self.__offsets[c]:self.__offsets[c + 1]] for c in closest]
+        return np.sort(np.concatenate(rows))
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        """
+        Calculates the similarity between two documents in the space fitted over the original document's directory.
+        :param f_file_path: The original document.
+        :param s_file_path: The document to analyze.
+        :return: A tuple containing the similarity percentage and the original document's path.
+        """
+        if not Fm.validate_file(f_file_path, create=False) or not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(Path(f_file_path).parent)
+        original, suspicious = self.embed([Document(f_file_path), Document(s_file_path)])
+        return max(float(original @ suspicious) * 100, 0.0), str(f_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        """
+        Compares the candidate files of a directory against a single file.
+        :param f_dir: The directory containing the files to compare.
+        :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most similar candidates are returned, sorted by descending similarity.
+        :return: A list of tuples containing the similarity and the path of every candidate original.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        embedding = self.embed([Document(s_file_path)])[0]
+        rows = self.candidates(embedding)
+        scores = np.maximum(self.__embeddings[rows] @ embedding, 0) * 100
+        return self.select_top_k(scores, self.__scorer.index.doc_ids, top_k, rows)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against the candidate files of a directory. Originals that aren't candidates of a
+        file get a similarity of 0.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        return self.score_documents(f_dir, [Document(s_file) for s_file in s_files])
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against the candidate files of a directory.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        doc_ids = self.__scorer.index.doc_ids
+        scores = np.zeros((len(documents), len(doc_ids)))
+        if not documents or not doc_ids:
+            return scores, doc_ids
+        with metrics.time("ann.search"):
+            for i, embedding in enumerate(self.embed(documents)):
+                rows = self.candidates(embedding)
+                scores[i, rows] = np.maximum(self.__embeddings[rows] @ embedding, 0) * 100
+        return scores, doc_ids
+
+
+def measure_recall(model: AnnAlgorithm, f_dir: str | Path, s_files: list[Path]) -> float:
+    """
+    Measures how often the best original found by scanning every original in the projected space is among the
+    candidates of the probed clusters.
+    :param model: The model to evaluate.
+    :param f_dir: The directory containing the original files.
+    :param s_files: The suspicious files to evaluate.
+    :return: The fraction of files whose exhaustive best match is a candidate.
+    """
+    if not s_files:
+        return 1.0
+    model.prepare(f_dir)
+    embeddings = model.embed([Document(s_file) for s_file in s_files])
+    best = np.argmax(embeddings @ model.embeddings.T, axis=1)
+    found = sum(int(row in set(model.candidates(embedding).tolist())) for row, embedding in zip(best, embeddings))
+    return found / len(s_files)
@@ -0,0 +1,121 @@
+"""
+This module compares suspicious documents against each other to find groups of submissions copied from one another.
+The batch is vectorized once and the similarity graph is computed with a blocked self-join that only keeps the pairs
+above a threshold, so the output stays sparse even though every pair is scored.
+
+The join splits the vocabulary in two: the most frequent terms, which would make a sparse product nearly dense, are
+multiplied as a small dense matrix with BLAS, and the remaining terms with a sparse product. The sum of both parts is
+the exact cosine similarity.
+"""
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from src.algorithms.corpus_index import CorpusIndex
+from src.util.metrics import metrics
+
+
+class CollusionDetector:
+    """
+    This class builds the suspicious x suspicious cosine similarity graph of a directory, keeping the pairs whose
+    similarity is above threshold, and groups the submissions connected by those pairs into clusters.
+    """
+    def __init__(self, vec_type: str = "tfidf", threshold: float = 60.0, dense_terms: int = 1024,
+                 memory_budget: int = 64 * 2 ** 20):
+        """
+        :param vec_type: The term weighting, "count" or "tfidf". Weights are calculated over the suspicious batch.
+        :param threshold: The similarity percentage above which a pair of submissions is kept.
+        :param dense_terms: The number of most frequent terms multiplied as a dense matrix.
+        :param memory_budget: The maximum size in bytes of each block of dense similarities.
+        """
+        self.__index = CorpusIndex(vec_type)
+        self.threshold = threshold
+        self.dense_terms = dense_terms
+        self.memory_budget = memory_budget
+        self.__graph: sparse.csr_matrix | None = None
+
+    @property
+    def doc_ids(self) -> list[str]:
+        return self.__index.doc_ids
+
+    @property
+    def graph(self) -> sparse.csr_matrix | None:
+        """
+        :return: The upper triangular (submissions x submissions) matrix of the similarities above the threshold.
+        """
+        return self.__graph
+
+    def fit(self, suspicious_dir: str | Path) -> "CollusionDetector":
+        """
+        Vectorizes every file in a directory and builds its similarity graph.
+        :param suspicious_dir: The directory containing the submissions.
+        :return: The fitted detector.
+        """
+        self.__index.fit(suspicious_dir)
+        with metrics.time("collusion.join"):
+            self.__graph = self.__self_join(self.__index.matrix)
+        metrics.count("collusion.pairs", self.__graph.nnz)
+        return self
+
+    def __self_join(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        n_docs, n_terms = matrix.shape
+        minimum = self.threshold / 100
+        df = np.bincount(matrix.indices, minlength=n_terms)
+        frequent = np.zeros(n_terms, dtype=bool)
+        frequent[np.argsort(-df, kind="stable")[:self.dense_terms]] = True
+        dense = matrix[:, np.flatnonzero(frequent)].toarray().astype(np.float32)
+        rare = matrix[:, np.flatnonzero(~frequent)].tocsr()
+        # Compressed by column, so the columns from a block's first row on are a contiguous slice
+        rare_t = rare.T.tocsc()
+        block_size = max(int(self.memory_budget // (max(n_docs, 1) * dense.itemsize)), 1)
+        rows, cols, values = [], [], []
+        for start in range(0, n_docs, block_size):
+            end = min(start + block_size, n_docs)
+            # Only the pairs (i, j) with j > i, starting from the block's first row
+            block = dense[start:end] @ dense[start:].T
+            product = (rare[start:end] @ rare_t[:, start:]).tocoo()
+            # The entries of a sparse product are unique, so they can be added with a single fancy index
+            block[product.row, product.col] += product.data
+            i, j = np.nonzero(block > minimum)
+            i, j = i + start, j + start
+            pairs = j > i
+            rows.append(i[pairs])
+            cols.append(j[pairs])
+            values.append(np.minimum(block[i[pairs] - start, j[pairs] - start], 1.0) * 100)
+        if not rows:
+            return sparse.csr_matrix((n_docs, n_docs))
+        return sparse.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(n_docs, n_docs))
+
+    def pairs(self) -> list[tuple[float, str, str]]:
+        """
+        Lists the pairs of submissions above the threshold.
+        :return: A list of (similarity, path, path) tuples sorted by descending similarity.
+        """
+        graph = self.__graph.tocoo()
+        order = np.argsort(-graph.data, kind="stable")
+        return [(float(graph.data[k]), self.doc_ids[graph.row[k]], self.doc_ids[graph.col[k]]) for k in order]
+
+    def clusters(self) -> list[dict]:
+        """
+        Groups the submissions connected by pairs above the threshold.
+        :return: A list with a dictionary per group of at least two submissions, containing its files, its number of
+        pairs above the threshold and their highest and mean similarity, sorted by descending size.
+        """
+        n_clusters, labels = connected_components(self.__graph, directed=False)
+        graph = self.__graph.tocoo()
+        # Members and edges grouped by cluster: the members of cluster c are members[bounds[c]:bounds[c + 1]]
+        members = np.argsort(labels, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(labels, minlength=n_clusters))])
+        edge_labels = labels[graph.row]
+        edges = np.argsort(edge_labels, kind="stable")
+        edge_bounds = np.concatenate([[0], np.cumsum(np.bincount(edge_labels, minlength=n_clusters))])
+        results = []
+        for label in np.flatnonzero(np.diff(bounds) > 1):
+            scores = graph.data[edges[edge_bounds[label]:edge_bounds[label + 1]]]
+            results.append({"files": [self.doc_ids[i] for i in members[bounds[label]:bounds[label + 1]]],
+                            "pairs": len(scores), "max_score": float(scores.max()),
+                            "mean_score": float(scores.mean())})
+        return sorted(results, key=lambda c: (-len(c["files"]), -c["max_score"]))
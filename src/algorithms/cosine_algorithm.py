@@ -9,32 +9,90 @@ Creation date: 04-20-2023
 from pathlib import Path
 from typing import Any
 
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+import numpy as np
+from scipy import sparse
+from src.algorithms.corpus_index import CorpusIndex
 from src.algorithms.model import BaseModel
 from src.util.file_manager import FileManager as Fm
+from src.util.text import Document
 
 
 class CosineAlgorithm(BaseModel):
     """
     This class executes the cosine similarity algorithm using the provided method (uses CountVectorizer as the default method).
     """
-    def __init__(self, vec_type: str = "count"):
+    def __init__(self, vec_type: str = "count", stream_threshold: int = 64 * 2 ** 20, chunk_size: int = 2 ** 20,
+                 n_features: int | None = None, compact: bool = False):
+        """
+        :param vec_type: The vectorizer type, "count" or "tfidf".
+        :param stream_threshold: Files larger than this number of bytes are read in chunks.
+        :param chunk_size: The size in bytes of the chunks of streamed files.
+        :param n_features: If given, the index hashes terms into this number of columns instead of storing a vocabulary.
+        :param compact: Whether the index stores float32 raw counts instead of the weighted matrix (see CorpusIndex).
+        """
         super().__init__()
+        self.n_features = n_features
+        self.compact = compact
         self.__vectorizer = None
-        self.__vectorizer_types = {"tfidf": TfidfVectorizer(), "count": CountVectorizer()}
+        self.__vec_type = vec_type
+        self.stream_threshold = stream_threshold
+        self.chunk_size = chunk_size
+        self.__index = None
         self.validate_vectorizer(vec_type)
 
     def validate_vectorizer(self, vec_type: str) -> None:
         """
-        Validates that the currently chosen vectorizer type is whitelisted.
+        Validates that the currently chosen vectorizer type is whitelisted. The vectorizer itself is only created when
+        compare_text() needs it, so importing and creating the model doesn't load scikit-learn.
         :param vec_type:
         :return:
         """
-        if vec_type in self.__vectorizer_types.keys():
-            self.__vectorizer = self.__vectorizer_types.get(vec_type)
-        else:
+        if vec_type not in CorpusIndex.vec_types:
             raise ValueError("Invalid vectorizer type.")
+        self.__vectorizer = None
+
+    def __get_vectorizer(self) -> Any:
+        if self.__vectorizer is None:
+            # Imported here so only pairwise comparisons pay for loading scikit-learn
+            from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+            self.__vectorizer = TfidfVectorizer() if self.__vec_type == "tfidf" else CountVectorizer()
+        return self.__vectorizer
+
+    @property
+    def index(self) -> CorpusIndex | None:
+        return self.__index
+
+    def fit(self, f_dir: str | Path) -> CorpusIndex:
+        """
+        Fits the vectorizer once over all the files in a directory and keeps the resulting index for later comparisons.
+        :param f_dir: The directory containing the original files.
+        :return: The fitted corpus index.
+        """
+        self.__index = CorpusIndex(self.__vec_type, n_features=self.n_features, compact=self.compact).fit(f_dir)
+        return self.__index
+
+    def save_index(self, index_dir: str | Path) -> None:
+        """
+        Saves the fitted index to a directory so it can be reloaded without re-vectorizing the original files.
+        :param index_dir: The directory to save the index to.
+        """
+        if self.__index is None:
+            raise ValueError("The index has not been fitted.")
+        self.__index.save(index_dir)
+
+    def load_index(self, index_dir: str | Path, mmap: bool = True) -> CorpusIndex:
+        """
+        Loads an index saved with save_index(). Documents that changed since it was saved are listed in its stale
+        property.
+        :param index_dir: The directory the index was saved to.
+        :param mmap: Whether to memory-map the index instead of reading it into memory.
+        :return: The loaded corpus index.
+        """
+        index = CorpusIndex.load(index_dir, mmap=mmap)
+        if index.vec_type != self.__vec_type:
+            raise ValueError("The saved index uses a different vectorizer type.")
+        self.__index = index
+        return self.__index
 
     def compare_text(self, original: Path | str, suspicious: Path | str) -> tuple[int | Any, str]:
         """
@@ -46,24 +104,99 @@ class CosineAlgorithm(BaseModel):
         if not Fm.validate_file(original, create=False) or not Fm.validate_file(suspicious, create=False):
             raise ValueError("The provided path is not a file.")
         corpus = Fm.create_corpus(Path(original), Path(suspicious))
-        trsfm = self.__vectorizer.fit_transform(corpus)
+        trsfm = self.__get_vectorizer().fit_transform(corpus)
 
+        from sklearn.metrics.pairwise import cosine_similarity  # Loaded on first use, like the vectorizer
         res = cosine_similarity(trsfm[0:1], trsfm)[0][1] * 100
         return res, str(original)
 
-    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path) -> list[tuple[float, str]]:
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
         """
-        Compares all the files in a directory against a single file.
+        Compares all the files in a directory against a single file. The directory is vectorized once and reused by
+        subsequent calls for the same directory.
         :param f_dir: The directory containing the files to compare.
         :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most similar files are returned, sorted by descending similarity.
         :return: A list of tuples containing the cosine similarity between the two documents and the original document's content.
         """
-        values = []
         if not Path(f_dir).is_dir():
             raise ValueError("The provided path is not a directory.")
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        scores = self.__index.score_vectors(self.vectorize_files([s_file_path]))[0]
+        return self.select_top_k(scores, self.__index.doc_ids, top_k)
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Fits the index over a directory unless it is already fitted over it.
+        :param f_dir: The directory containing the files to compare.
+        """
+        if not Path(f_dir).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        if self.__index is None or self.__index.source != Path(f_dir):
+            self.fit(f_dir)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against all the files in a directory by vectorizing the whole batch at once.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        return self.__index.score_vectors(self.vectorize_files(s_files)), self.__index.doc_ids
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against all the files in a directory, reusing their term counts.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        return self.__index.score_vectors(self.vectorize_documents(documents)), self.__index.doc_ids
+
+    def vectorize_files(self, s_files: list[str | Path]) -> sparse.csr_matrix:
+        """
+        Vectorizes files against the fitted index. Files larger than stream_threshold bytes are read in chunks so
+        their size doesn't affect memory usage; smaller files are tokenized at once and their term counts are cached
+        when the file cache is enabled.
+        :param s_files: The files to vectorize.
+        :return: A sparse matrix with one normalized row per file.
+        """
+        rows, term_counts, positions = [], [], []
+        for i, s_file in enumerate(map(Path, s_files)):
+            if s_file.stat().st_size > self.stream_threshold:
+                rows.append(self.__index.vectorize_stream(Fm.read_chunks(s_file, self.chunk_size)))
+            else:
+                term_counts.append(Fm.read_derived(s_file, "terms", self.__index.count_terms))
+                positions.append(i)
+                rows.append(None)
+        return self.__combine(rows, term_counts, positions)
+
+    def vectorize_documents(self, documents: list[Document]) -> sparse.csr_matrix:
+        """
+        Vectorizes pre-analyzed documents against the fitted index using their term counts. Documents whose file is
+        larger than stream_threshold bytes are streamed from their file instead.
+        :param documents: The documents to vectorize.
+        :return: A sparse matrix with one normalized row per document.
+        """
+        rows, term_counts, positions = [], [], []
+        for i, document in enumerate(documents):
+            if document.path is not None and document.size > self.stream_threshold:
+                rows.append(self.__index.vectorize_stream(Fm.read_chunks(document.path, self.chunk_size)))
+            else:
+                term_counts.append(document.term_counts)
+                positions.append(i)
+                rows.append(None)
+        return self.__combine(rows, term_counts, positions)
 
-        for child in Path(f_dir).iterdir():
-            if child.is_file():
-                res = self.compare_text(child, s_file_path)
-                values.append(res)
-        return values
+    def __combine(self, rows: list, term_counts: list, positions: list[int]) -> sparse.csr_matrix:
+        counted = self.__index.vectorize_counts(term_counts)
+        if len(positions) == len(rows):
+            return counted
+        for j, i in enumerate(positions):
+            rows[i] = counted[j]
+        return sparse.vstack(rows, format="csr")
@@ -0,0 +1,117 @@
+"""
+This module evaluates similarity scores against a ground truth. Scores are sorted once and every distinct score is
+tried as a threshold at the same time, so picking the threshold or the model weights never requires comparing the
+files again.
+
+A file is considered plagiarized when its score is strictly above the threshold, as in ModelMediator.
+"""
+from itertools import combinations
+
+import numpy as np
+
+
+def threshold_curve(scores: np.ndarray, labels: np.ndarray) -> dict:
+    """
+    Computes the precision, recall, F1 score and accuracy of every threshold between the given scores, and the area
+    under the ROC curve.
+    :param scores: The similarity of every file with its most similar original.
+    :param labels: Whether every file is plagiarized.
+    :return: A dictionary containing the "thresholds" in descending order, the "precision", "recall", "f1" and
+    "accuracy" arrays of those thresholds, the "roc_auc", and the "threshold", "f1_score" and "accuracy_score" with the
+    highest F1 score. The precision of a threshold that flags no file is 1.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    if scores.shape != labels.shape or scores.ndim != 1:
+        raise ValueError("There must be one label per score.")
+    order = np.argsort(-scores, kind="stable")
+    scores, labels = scores[order], labels[order]
+    # A threshold equal to a distinct score flags the files ranked before its first occurrence
+    firsts = np.flatnonzero(np.r_[True, scores[1:] != scores[:-1]])
+    cumulative = np.r_[0, np.cumsum(labels)]
+    tp = cumulative[firsts]
+    fp = firsts - tp
+    positives, n_files = int(labels.sum()), len(labels)
+    negatives = n_files - positives
+    precision = np.divide(tp, firsts, out=np.ones(len(firsts)), where=firsts > 0)
+    recall = tp / positives if positives else np.zeros(len(firsts))
+    f1 = np.divide(2 * tp, firsts + positives, out=np.zeros(len(firsts)), where=firsts + positives > 0)
+    accuracy = (tp + negatives - fp) / max(n_files, 1)
+    # The ROC curve goes through every threshold and ends flagging all the files, ties are interpolated linearly
+    tpr = np.r_[tp, positives] / max(positives, 1)
+    fpr = np.r_[fp, negatives] / max(negatives, 1)
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if positives and negatives else float("nan")
+    best = int(np.argmax(f1)) if len(f1) else 0
+    return {"thresholds": scores[firsts], "precision": precision, "recall": recall, "f1": f1, "accuracy": accuracy,
+            "roc_auc": roc_auc, "threshold": float(scores[firsts][best]) if len(f1) else 0.0,
+            "f1_score": float(f1[best]) if len(f1) else 0.0,
+            "accuracy_score": float(accuracy[best]) if len(f1) else 0.0}
+
+
+def weight_grid(n_models: int, steps: int = 10) -> np.ndarray:
+    """
+    Lists the combinations of positive model weights in multiples of 1 / steps that add up to 1.
+    :param n_models: The number of models.
+    :param steps: The number of increments each weight is divided in.
+    :return: A (combinations x n_models) array of weights.
+    """
+    if n_models < 1 or steps < n_models:
+        raise ValueError("There must be at least one step per model.")
+    cuts = list(combinations(range(1, steps), n_models - 1))
+    cuts = np.array(cuts, dtype=np.int64).reshape(len(cuts), n_models - 1)
+    bounds = np.hstack([np.zeros((len(cuts), 1), dtype=np.int64), cuts, np.full((len(cuts), 1), steps)])
+    return np.diff(bounds, axis=1) / steps
+
+
+def ensemble_max(model_scores: np.ndarray, weights: np.ndarray, memory_budget: int = 64 * 2 ** 20) -> np.ndarray:
+    """
+    Computes every file's highest weighted average similarity for several combinations of weights. Files are processed
+    in blocks so the (combinations x block x originals) averages never exceed the memory budget.
+    :param model_scores: A (models x files x originals) array with the similarities of every model.
+    :param weights: A (combinations x models) array of weights.
+    :param memory_budget: The maximum size in bytes of each block's weighted averages.
+    :return: A (combinations x files) array with the highest similarity of every file.
+    """
+    n_models, n_files, n_originals = model_scores.shape
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, n_models)
+    weights = weights / weights.sum(axis=1, keepdims=True)
+    block_size = max(int(memory_budget // (max(len(weights) * n_originals, 1) * 8)), 1)
+    result = np.zeros((len(weights), n_files))
+    if n_originals == 0:
+        return result
+    for start in range(0, n_files, block_size):
+        block = model_scores[:, start:start + block_size]
+        result[:, start:start + block.shape[1]] = np.einsum("cm,mfo->cfo", weights, block).max(axis=2)
+    return result
+
+
+def calibrate(model_scores: np.ndarray, labels: np.ndarray, weights: np.ndarray | None = None,
+              memory_budget: int = 64 * 2 ** 20) -> dict:
+    """
+    Evaluates every combination of weights at every threshold and picks the one with the highest F1 score, breaking
+    ties with the area under the ROC curve.
+    :param model_scores: A (models x files x originals) array with the similarities of every model.
+    :param labels: Whether every file is plagiarized.
+    :param weights: A (combinations x models) array of weights to try. Only equal weights are evaluated if not given.
+    :param memory_budget: The maximum size in bytes of each block's weighted averages.
+    :return: A dictionary containing the best "weights", their "threshold", "f1_score", "accuracy_score" and
+    "roc_auc", the "curve" of the best weights as returned by threshold_curve(), the "f1" and "roc_auc" of every
+    combination in "grid", and the curve summary of every model on its own in "models".
+    """
+    model_scores = np.asarray(model_scores, dtype=np.float64)
+    n_models = model_scores.shape[0]
+    grid = np.ones((1, n_models)) / n_models if weights is None else np.asarray(weights, dtype=np.float64)
+    grid = grid.reshape(-1, n_models)
+    curves = [threshold_curve(scores, labels) for scores in ensemble_max(model_scores, grid, memory_budget)]
+    f1 = np.array([curve["f1_score"] for curve in curves])
+    roc_auc = np.array([curve["roc_auc"] for curve in curves])
+    best = int(np.lexsort((-np.nan_to_num(roc_auc, nan=-1.0), -f1))[0])
+    singles = ensemble_max(model_scores, np.eye(n_models), memory_budget)
+    models = []
+    for scores in singles:
+        curve = threshold_curve(scores, labels)
+        models.append({key: curve[key] for key in ("threshold", "f1_score", "accuracy_score", "roc_auc")})
+    return {"weights": grid[best].tolist(), "threshold": curves[best]["threshold"],
+            "f1_score": curves[best]["f1_score"], "accuracy_score": curves[best]["accuracy_score"],
+            "roc_auc": curves[best]["roc_auc"], "curve": curves[best],
+            "grid": {"weights": grid, "f1": f1, "roc_auc": roc_auc}, "models": models}
@@ -0,0 +1,244 @@
+"""
+This module resolves verbatim and near-verbatim copies of original documents with content fingerprints before any
+vectorization: a hash of the normalized text finds exact copies (including copies that only change case, whitespace or
+punctuation) and winnowing fingerprints of word n-grams find near-exact copies. Both lookups take time proportional to
+the length of the suspicious document; every other document falls back to the cosine similarity.
+"""
+from pathlib import Path
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import BaseModel
+from src.util.file_manager import FileManager as Fm
+from src.util.metrics import metrics
+from src.util.text import Document, hash_ngrams, text_digest, winnow
+
+
+class FingerprintIndex:
+    """
+    This class maps the normalized text digest and the winnowing fingerprints of a set of original documents to their
+    rows. A document is a near-exact copy of an original when the fingerprints they share are at least near_threshold
+    of the fingerprints of the larger of the two.
+    """
+    stages = ("exact", "near")
+
+    def __init__(self, ngram_size: int = 5, window: int = 4, near_threshold: float = 0.9):
+        """
+        :param ngram_size: The number of words per hashed n-gram.
+        :param window: The number of consecutive n-gram hashes per winnowing window.
+        :param near_threshold: The fraction of shared fingerprints above which a document is a near-exact copy.
+        """
+        self.__ngram_size = ngram_size
+        self.__window = window
+        self.near_threshold = near_threshold
+        self.__doc_ids: list[str] = []
+        self.__digests: dict[bytes, int] = {}
+        # Rows of the originals grouped by fingerprint: the rows of keys[i] are rows[offsets[i]:offsets[i + 1]]
+        self.__keys = np.zeros(0, dtype=np.uint32)
+        self.__offsets = np.zeros(1, dtype=np.int64)
+        self.__rows = np.zeros(0, dtype=np.int64)
+        self.__sizes = np.zeros(0, dtype=np.int64)
+
+    @property
+    def ngram_size(self) -> int:
+        return self.__ngram_size
+
+    @property
+    def window(self) -> int:
+        return self.__window
+
+    @property
+    def doc_ids(self) -> list[str]:
+        return self.__doc_ids
+
+    def fingerprints(self, document: Document) -> np.ndarray:
+        """
+        Calculates the winnowing fingerprints of a document.
+        :param document: The document to analyze.
+        :return: The sorted distinct fingerprints of the document.
+        """
+        return winnow(hash_ngrams(document.words, self.__ngram_size), self.__window)
+
+    def fit(self, files: list[str | Path]) -> "FingerprintIndex":
+        """
+        Fingerprints a list of original files.
+        :param files: The original files. Their position in the list is their row.
+        :return: The fitted index.
+        """
+        self.__doc_ids = [str(file) for file in files]
+        self.__digests = {}
+        fingerprints = []
+        with metrics.time("fingerprint.fit"):
+            for row, file in enumerate(files):
+                document = Document(file)
+                if document.words:
+                    self.__digests.setdefault(text_digest(document.words), row)
+                fingerprints.append(self.fingerprints(document))
+        self.__sizes = np.array([len(f) for f in fingerprints], dtype=np.int64)
+        keys = np.concatenate(fingerprints) if fingerprints else np.zeros(0, dtype=np.uint32)
+        rows = np.repeat(np.arange(len(fingerprints)), self.__sizes)
+        order = np.argsort(keys, kind="stable")
+        self.__keys, counts = np.unique(keys[order], return_counts=True)
+        self.__rows = rows[order]
+        self.__offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self
+
+    def lookup(self, document: Document) -> tuple[str, float, int] | None:
+        """
+        Looks up the original a document is an exact or near-exact copy of.
+        :param document: The document to analyze.
+        :return: A tuple containing the stage that found the copy ("exact" or "near"), the similarity percentage and
+        the original's row, or None if the document isn't a copy of any original.
+        """
+        if not document.words:
+            return None
+        row = self.__digests.get(text_digest(document.words))
+        if row is not None:
+            return "exact", 100.0, row
+        fingerprints = self.fingerprints(document)
+        if len(fingerprints) == 0 or len(self.__keys) == 0:
+            return None
+        positions = np.minimum(np.searchsorted(self.__keys, fingerprints), len(self.__keys) - 1)
+        positions = positions[self.__keys[positions] == fingerprints]
+        if len(positions) == 0:
+            return None
+        rows = np.concatenate([self.__rows[self.__offsets[p]:self.__offsets[p + 1]] for p in positions])
+        shared = np.bincount(rows, minlength=len(self.__sizes))
+        overlap = shared / np.maximum(self.__sizes, len(fingerprints))
+        best = int(np.argmax(overlap))
+        if overlap[best] < self.near_threshold:
+            return None
+        return "near", float(overlap[best]) * 100, best
+
+
+class FingerprintAlgorithm(BaseModel):
+    """
+    This class resolves exact and near-exact copies with a FingerprintIndex and scores every document with the cosine
+    similarity. A resolved copy gets the similarity of its stage with its original and its cosine similarity with every
+    other original. Copies are only left unvectorized when a single match is requested, by compare_texts() with
+    top_k=1 and by resolve_files().
+
+    The stage that produced every result is counted in the metrics ("fingerprint.exact", "fingerprint.near" and
+    "fingerprint.cosine") and reported by resolve_files().
+    """
+    cost = 0.5
+
+    def __init__(self, vec_type: str = "tfidf", ngram_size: int = 5, window: int = 4, near_threshold: float = 0.9):
+        """
+        :param vec_type: The vectorizer type of the cosine fallback.
+        :param ngram_size: The number of words per fingerprinted n-gram.
+        :param window: The number of consecutive n-gram hashes per winnowing window.
+        :param near_threshold: The fraction of shared fingerprints above which a document is a near-exact copy.
+        """
+        super().__init__()
+        self.__scorer = CosineAlgorithm(vec_type)
+        self.__index = FingerprintIndex(ngram_size, window, near_threshold)
+        # The directory, cosine index and index generation the fingerprints were fitted on
+        self.__fitted = None
+
+    @property
+    def scorer(self) -> CosineAlgorithm:
+        return self.__scorer
+
+    @property
+    def index(self) -> FingerprintIndex:
+        return self.__index
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Fits the cosine index and fingerprints every original of a directory unless they are already fitted over it.
+        :param f_dir: The directory containing the original files.
+        """
+        self.__scorer.prepare(f_dir)
+        index = self.__scorer.index
+        fitted = (Path(f_dir), index, index.generation)
+        if self.__fitted is not None and all(a is b or a == b for a, b in zip(self.__fitted, fitted)):
+            return
+        self.__index.fit(index.doc_ids)
+        self.__fitted = fitted
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        """
+        Calculates the similarity between two documents, with the fingerprints first and the cosine similarity if the
+        suspicious document isn't a copy of the original.
+        :param f_file_path: The original document.
+        :param s_file_path: The document to analyze.
+        :return: A tuple containing the similarity percentage and the original document's path.
+        """
+        if not Fm.validate_file(f_file_path, create=False) or not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        index = FingerprintIndex(self.__index.ngram_size, self.__index.window, self.__index.near_threshold)
+        match = index.fit([f_file_path]).lookup(Document(s_file_path))
+        if match is not None:
+            return match[1], str(f_file_path)
+        return self.__scorer.compare_text(f_file_path, s_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        """
+        Compares all the files in a directory against a single file.
+        :param f_dir: The directory containing the files to compare.
+        :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most similar files are returned, sorted by descending similarity.
+        :return: A list of tuples containing the similarity and the path of every original.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        # A copy's best match is its original, so a single match doesn't need the cosine scores
+        scores, doc_ids, _ = self.__resolve(f_dir, [Document(s_file_path)], vectorize_copies=top_k != 1)
+        return self.select_top_k(scores[0], doc_ids, top_k)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against all the files in a directory.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        return self.score_documents(f_dir, [Document(s_file) for s_file in s_files])
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against all the files in a directory. The similarity of a copy with its
+        original is the one found by the fingerprints.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        scores, doc_ids, _ = self.__resolve(f_dir, documents)
+        return scores, doc_ids
+
+    def __resolve(self, f_dir: str | Path, documents: list[Document],
+                  vectorize_copies: bool = True) -> tuple[np.ndarray, list[str], list[str]]:
+        self.prepare(f_dir)
+        doc_ids = self.__scorer.index.doc_ids
+        with metrics.time("fingerprint.lookup"):
+            matches = [self.__index.lookup(document) for document in documents]
+        stages = [match[0] if match is not None else "cosine" for match in matches]
+        rest = [i for i, match in enumerate(matches) if vectorize_copies or match is None]
+        scores = np.zeros((len(documents), len(doc_ids)))
+        if rest:
+            scores[rest] = self.__scorer.score_documents(f_dir, [documents[i] for i in rest])[0]
+        for i, match in enumerate(matches):
+            if match is not None:
+                scores[i, match[2]] = match[1]
+        for stage in FingerprintIndex.stages + ("cosine",):
+            metrics.count(f"fingerprint.{stage}", stages.count(stage))
+        return scores, doc_ids, stages
+
+    def resolve_files(self, f_dir: str | Path, s_files: list[Path]) -> list[dict]:
+        """
+        Compares a batch of files against all the files in a directory and reports the stage that produced every
+        result.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A list with a dictionary per file containing its path, its best similarity and original, and the
+        stage that found them: "exact", "near" or "cosine".
+        """
+        scores, doc_ids, stages = self.__resolve(f_dir, [Document(s_file) for s_file in s_files],
+                                                 vectorize_copies=False)
+        best = BaseModel.get_top_k(scores, doc_ids, 1)
+        return [{"file": str(s_file), "stage": stage, "score": matches[0][0] if matches else 0.0,
+                 "original": matches[0][1] if matches else ""}
+                for s_file, stage, matches in zip(s_files, stages, best)]
@@ -0,0 +1,171 @@
+"""
+This module pre-filters the original documents with MinHash signatures and locality-sensitive hashing before running
+the exact cosine similarity, so each suspicious document is only scored against a small set of candidate originals.
+"""
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import BaseModel
+from src.util.file_manager import FileManager as Fm
+from src.util.text import Document, tokenize
+
+# Mersenne prime used by the universal hash family of the signatures
+_PRIME = np.uint64((1 << 61) - 1)
+
+
+def shingle_hashes(text: str | list[str], size: int) -> np.ndarray:
+    """
+    Hashes every word shingle of a text. Words are extracted as in the cosine vectorizers.
+    :param text: The text to split, or its words.
+    :param size: The number of words per shingle.
+    :return: An array with the 32-bit hash of every distinct shingle.
+    """
+    words = tokenize(text) if isinstance(text, str) else text
+    shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))} if words else set()
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class MinHashAlgorithm(BaseModel):
+    """
+    This class selects candidate originals whose MinHash signatures share at least one LSH band with the suspicious
+    document, and scores only those candidates with the cosine similarity. Originals that aren't candidates get a
+    similarity of 0.
+
+    A pair of documents with a shingle Jaccard similarity s becomes a candidate with probability
+    1 - (1 - s ** rows) ** bands, where rows = num_perm / bands. The defaults (one row per band) favour recall; use more
+    rows per band to prune more aggressively on large corpora.
+    """
+    cost = 2.0
+
+    def __init__(self, vec_type: str = "tfidf", num_perm: int = 128, bands: int = 128, shingle_size: int = 3,
+                 seed: int = 1):
+        super().__init__()
+        if num_perm % bands != 0:
+            raise ValueError("The number of permutations must be a multiple of the number of bands.")
+        self.__scorer = CosineAlgorithm(vec_type)
+        self.__bands = bands
+        self.__rows = num_perm // bands
+        self.__shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self.__a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.__b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.__buckets: list[dict[bytes, list[int]]] = []
+        self.__source = None
+
+    @property
+    def scorer(self) -> CosineAlgorithm:
+        return self.__scorer
+
+    def signature(self, text: str | Document) -> np.ndarray:
+        """
+        Calculates the MinHash signature of a text.
+        :param text: The text to analyze, or its analyzed document.
+        :return: An array with the minimum hash of the text's shingles under every permutation.
+        """
+        hashes = shingle_hashes(text.words if isinstance(text, Document) else text, self.__shingle_size)
+        if len(hashes) == 0:
+            return np.full(len(self.__a), _PRIME, dtype=np.uint64)
+        return ((np.outer(hashes, self.__a) + self.__b) % _PRIME).min(axis=0)
+
+    def __band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.__rows:(i + 1) * self.__rows].tobytes() for i in range(self.__bands)]
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Fits the cosine index and hashes the signatures of every original into the LSH buckets.
+        :param f_dir: The directory containing the original files.
+        """
+        self.__scorer.prepare(f_dir)
+        if self.__source == Path(f_dir) and self.__buckets:
+            return
+        self.__buckets = [{} for _ in range(self.__bands)]
+        for row, doc_id in enumerate(self.__scorer.index.doc_ids):
+            signature = self.signature(Document(doc_id))
+            if signature[0] == _PRIME:
+                continue
+            for band, key in zip(self.__buckets, self.__band_keys(signature)):
+                band.setdefault(key, []).append(row)
+        self.__source = Path(f_dir)
+
+    def candidates(self, text: str | Document) -> np.ndarray:
+        """
+        Looks up the originals that share at least one LSH band with a text.
+        :param text: The text to analyze, or its analyzed document.
+        :return: The sorted row indices of the candidate originals in the cosine index.
+        """
+        found = set()
+        for band, key in zip(self.__buckets, self.__band_keys(self.signature(text))):
+            found.update(band.get(key, ()))
+        return np.array(sorted(found), dtype=np.int64)
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        return self.__scorer.compare_text(f_file_path, s_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        """
+        Compares the candidate files of a directory against a single file.
+        :param f_dir: The directory containing the files to compare.
+        :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most similar candidates are returned, sorted by descending similarity.
+        :return: A list of tuples containing the cosine similarity and the path of every candidate original.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        document = Document(s_file_path)
+        rows = self.candidates(document)
+        index = self.__scorer.index
+        scores = index.score_rows(index.vectorize_counts([document.term_counts]), rows)[0]
+        return self.select_top_k(scores, index.doc_ids, top_k, rows)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against the candidate files of a directory. Originals that aren't candidates of a
+        file get a similarity of 0.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        return self.score_documents(f_dir, [Document(s_file) for s_file in s_files])
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against the candidate files of a directory, reusing their words and term
+        counts.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        index = self.__scorer.index
+        scores = np.zeros((len(documents), len(index.doc_ids)))
+        for i, document in enumerate(documents):
+            rows = self.candidates(document)
+            scores[i, rows] = index.score_rows(index.vectorize_counts([document.term_counts]), rows)[0]
+        return scores, index.doc_ids
+
+
+def measure_recall(model: MinHashAlgorithm, f_dir: str | Path, s_files: list[Path],
+                   ground_truth: dict[str, bool] | None = None) -> float:
+    """
+    Measures how often the best original found by the exhaustive cosine scan is among the LSH candidates.
+    :param model: The model to evaluate.
+    :param f_dir: The directory containing the original files.
+    :param s_files: The suspicious files to evaluate.
+    :param ground_truth: If given, only the files marked as plagiarized in it are evaluated.
+    :return: The fraction of evaluated files whose exhaustive best match is a candidate.
+    """
+    if ground_truth is not None:
+        s_files = [f for f in s_files if ground_truth.get(Fm.extract_file_name(f))]
+    if not s_files:
+        return 1.0
+    exhaustive, _ = model.scorer.score_files(f_dir, s_files)
+    model.prepare(f_dir)
+    found = 0
+    for s_file, scores in zip(s_files, exhaustive):
+        found += int(np.argmax(scores) in set(model.candidates(Document(s_file)).tolist()))
+    return found / len(s_files)
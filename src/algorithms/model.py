@@ -1,12 +1,44 @@
+import cProfile
+import heapq
 from abc import ABC, abstractmethod
+from functools import partial
 from pathlib import Path
+from typing import Iterable, Iterator
 
+import numpy as np
+
+from src.algorithms.evaluation import calibrate, weight_grid
 from src.util.config import ConfigManager
 from src.util.ioutils import get_user_input, load_from_json_file
 from src.util.file_manager import FileManager as Fm
+from src.util.metrics import Metrics, metrics
+from src.util.parallel import imap_shards, map_shards, split
+from src.util.result_sink import ConsoleSink, ResultBatch, open_sink
+from src.util.text import Document
+
+
+def _score_shard(model: "BaseModel", shard: list[Path], f_dir: str | Path) -> tuple[np.ndarray, list[str]]:
+    return model.score_files(f_dir, shard)
+
+
+def _compare_block(mediator: "ModelMediator", block: list[Path], original_dir: str | Path,
+                   top_k: int) -> list[list[tuple[float, str]]]:
+    return mediator.compare_files(original_dir, block, top_k)
+
+
+def _compare_block_array(mediator: "ModelMediator", block: list[Path], original_dir: str | Path,
+                         top_k: int) -> tuple[np.ndarray, list[str]]:
+    return mediator.compare_files_array(original_dir, block, top_k)
+
+
+# A match of a structured result: the position of an original in the doc ids and its similarity
+MATCH_DTYPE = np.dtype([("doc", np.int32), ("score", np.float32)])
 
 
 class BaseModel(ABC):
+    # Rough relative cost of scoring a document, used to run cheaper models first in a cascade
+    cost: float = 1.0
+
     def __init__(self):
         self.__mediator = None
 
@@ -23,17 +55,135 @@ class BaseModel(ABC):
         ...
     
     @abstractmethod
-    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path) -> list[tuple[float, str]]:
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
         ...
 
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Prepares the model to compare files against a directory (e.g. by fitting an index). It is called before work is
+        sent to other processes so the prepared state is shipped to every worker.
+        :param f_dir: The directory containing the files to compare.
+        """
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against all the files in a directory. Models with a vectorized implementation should
+        override this method; the default one calls compare_texts() once per file.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        rows, doc_ids = [], []
+        for s_file in s_files:
+            results = sorted(self.compare_texts(f_dir, s_file), key=lambda x: x[1])
+            doc_ids = [r[1] for r in results]
+            rows.append([r[0] for r in results])
+        return np.array(rows, dtype=np.float64).reshape(len(s_files), len(doc_ids)), doc_ids
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against all the files in a directory. Models that read or tokenize the
+        documents should override this method to reuse the documents' analysis; the default one calls score_files()
+        with the documents' files.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        return self.score_files(f_dir, [document.path for document in documents])
+
+    def score_matrix(self, f_dir: str | Path, s_files: list[Path], workers: int = 1) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against all the files in a directory, sharding the files across worker processes.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :param workers: The number of processes to use. With 1, the comparison runs in the current process.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        if not s_files:
+            return self.score_files(f_dir, [])
+        parts = map_shards(partial(_score_shard, f_dir=f_dir), self, split(list(s_files), workers), workers)
+        return np.vstack([part[0] for part in parts]), parts[0][1]
+
+    @staticmethod
+    def select_top_k(scores: np.ndarray, doc_ids: list[str], k: int | None,
+                     rows: np.ndarray | None = None) -> list[tuple[float, str]]:
+        """
+        Selects the k highest similarities of a score vector with a partial sort, so only the selected entries are
+        sorted and converted to tuples.
+        :param scores: The similarities.
+        :param doc_ids: The original documents' paths.
+        :param k: The number of matches to return. Every entry is returned, in the order of scores, if None.
+        :param rows: The position in doc_ids of every entry of scores. Defaults to the same positions.
+        :return: A list of (similarity, path) tuples sorted by descending similarity.
+        """
+        rows = np.arange(len(scores)) if rows is None else rows
+        if k is None:
+            return [(float(score), doc_ids[row]) for score, row in zip(scores, rows)]
+        best, best_scores = BaseModel.__rank(np.asarray(scores).reshape(1, -1), k)
+        return [(float(score), doc_ids[rows[i]]) for i, score in zip(best[0], best_scores[0])]
+
+    @staticmethod
+    def select_top_k_results(results: Iterable[tuple[float, str]], k: int | None) -> list[tuple[float, str]]:
+        """
+        Selects the k highest similarities of a stream of results with a bounded heap.
+        :param results: The (similarity, path) tuples.
+        :param k: The number of matches to return. Every result is returned, in its original order, if None.
+        :return: A list of (similarity, path) tuples sorted by descending similarity.
+        """
+        if k is None:
+            return list(results)
+        return heapq.nlargest(k, results, key=lambda x: x[0])
+
+    @staticmethod
+    def get_top_k(scores: np.ndarray, doc_ids: list[str], k: int) -> list[list[tuple[float, str]]]:
+        """
+        Returns the k files with the highest similarity for every row of a score matrix.
+        :param scores: A (files x originals) array of similarities.
+        :param doc_ids: The original documents' paths, ordered as the columns of scores.
+        :param k: The number of matches to return per row.
+        :return: A list with the k best (similarity, path) tuples of every row, sorted by descending similarity.
+        """
+        best, best_scores = BaseModel.__rank(scores, k)
+        return [[(float(score), doc_ids[i]) for i, score in zip(row, row_scores)]
+                for row, row_scores in zip(best, best_scores)]
+
+    @staticmethod
+    def __rank(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        # Columns and scores of the k best matches of every row, by descending score
+        k = max(min(k, scores.shape[1]), 0)
+        if k == 0:
+            return np.zeros((scores.shape[0], 0), dtype=np.int64), np.zeros((scores.shape[0], 0))
+        best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(scores, best, axis=1)
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    @staticmethod
+    def get_top_k_array(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Returns the k files with the highest similarity for every row of a score matrix as a structured array, which
+        takes a fraction of the memory of lists of tuples.
+        :param scores: A (files x originals) array of similarities.
+        :param k: The number of matches to return per row.
+        :return: A (files x k) array of MATCH_DTYPE records sorted by descending similarity. Their doc field is a column
+        of scores.
+        """
+        best, best_scores = BaseModel.__rank(scores, k)
+        result = np.zeros(best.shape, dtype=MATCH_DTYPE)
+        result["doc"] = best
+        result["score"] = best_scores
+        return result
+
     @staticmethod
     def get_max_similarity(results: list[tuple[float, str]]) -> tuple[float, str]:
         """
-        Returns the file with the highest similarity.
+        Returns the file with the highest similarity, or a similarity of 0 with an empty path if there are no results.
         :param results: A list of tuples containing the cosine similarity between the two documents and the original document's path.
         :return: A tuple containing the cosine similarity between the two documents and the original document's path.
         """
-        return max(results, key=lambda x: x[0])
+        return max(results, key=lambda x: x[0], default=(0.0, ""))
 
 
 class BaseMediator(ABC):
@@ -47,74 +197,355 @@ class BaseMediator(ABC):
 
 
 class ModelMediator(BaseMediator):
-    def __init__(self, *args: BaseModel, config_mgr: ConfigManager = ConfigManager()):
+    """
+    This class combines the similarities of its child models with a weighted average. In cascade mode, models run from
+    the cheapest to the most expensive and the remaining ones are skipped for a file as soon as they can no longer
+    change its verdict; the reported similarity is then the weighted average of the models that ran.
+    """
+    # Upper bound of the similarities returned by the models
+    max_score = 100.0
+    # Similarity above which a file is considered plagiarized, unless a threshold is given
+    default_threshold = 60.0
+
+    def __init__(self, *args: BaseModel, config_mgr: ConfigManager | None = None, weights: list[float] | None = None,
+                 threshold: float = default_threshold, cascade: bool = False):
+        """
+        :param args: The child models.
+        :param config_mgr: The configuration containing the default directories and ground truth. A default
+        configuration is created if not given.
+        :param weights: The weight of every child model. All models weigh 1 if not given.
+        :param threshold: The similarity above which a file is considered plagiarized.
+        :param cascade: Whether to skip the remaining models once a file's verdict is decided.
+        """
         self.__models: list[BaseModel] = []
-        self.__config_manager = config_mgr
-        self.__ground_truth = load_from_json_file(self.__config_manager.get("GROUND_TRUTH"))
-        self.__cm = ConfigManager()
-        self.add_children(args)
+        self.__weights: list[float] = []
+        self.__config_manager = config_mgr if config_mgr is not None else ConfigManager()
+        self.__ground_truth: dict | None = None
+        self.threshold = threshold
+        self.cascade = cascade
+        if weights is not None and len(weights) != len(args):
+            raise ValueError("The number of weights must match the number of models.")
+        for model, weight in zip(args, weights if weights is not None else [1.0] * len(args)):
+            self.add_child(model, weight)
 
-    def add_child(self, model: BaseModel) -> None:
+    @property
+    def metrics(self) -> Metrics:
+        return metrics
+
+    @property
+    def weights(self) -> list[float]:
+        return self.__weights
+
+    @property
+    def ground_truth(self) -> dict:
+        # Loaded the first time it is needed and kept for the following runs
+        if self.__ground_truth is None:
+            self.__ground_truth = load_from_json_file(self.__config_manager.get("GROUND_TRUTH")) or {}
+        return self.__ground_truth
+
+    def add_child(self, model: BaseModel, weight: float = 1.0) -> None:
+        if weight <= 0:
+            raise ValueError("The weight of a model must be positive.")
         model.mediator = self
         self.__models.append(model)
+        self.__weights.append(weight)
     
     def add_children(self, models: tuple[BaseModel]) -> None:
         for m in models:
             self.add_child(m)
 
+    def prepare(self, original_dir: str | Path) -> None:
+        """
+        Builds the indexes of every child model over a directory so the first comparison doesn't pay for them.
+        :param original_dir: The directory containing the original files.
+        """
+        for model in self.__models:
+            model.prepare(original_dir)
+
     def compare_single(self, original_text: str | Path, suspicious_text: str | Path) -> tuple[float, str]:
         """
-        Returns the average results of all of the child models' comparison results.
+        Returns the weighted average of the child models' comparison results.
         :param original_text:
         :param suspicious_text:
-        :return: A tuple containing the average results of all of the child models' comparison results and the original document's path.
+        :return: A tuple containing the weighted average of the child models' comparison results and the original document's path.
         """
-        model_sum = 0
-        for model in self.__models:
-            model_result = model.compare_text(original_text, suspicious_text)
-            model_sum += model_result[0]
-        return model_sum / len(self.__models), str(original_text)
+        total, evaluated, remaining = np.zeros((1, 1)), 0.0, sum(self.__weights)
+        for model, weight in self.__ordered():
+            if self.cascade and evaluated and self.__decided(total, remaining)[0]:
+                metrics.count("cascade.skipped")
+                continue
+            total += weight * model.compare_text(original_text, suspicious_text)[0]
+            evaluated += weight
+            remaining -= weight
+        return float(total[0, 0]) / evaluated, str(original_text)
+
+    def __ordered(self) -> list[tuple[BaseModel, float]]:
+        pairs = list(zip(self.__models, self.__weights))
+        return sorted(pairs, key=lambda pair: pair[0].cost) if self.cascade else pairs
+
+    def __decided(self, totals: np.ndarray, remaining: float) -> np.ndarray:
+        # A file's verdict is decided when its best original stays below the threshold even if the remaining models
+        # return the maximum similarity, or is already above it even if they return 0
+        weight_sum = sum(self.__weights)
+        lower = totals.max(axis=1) / weight_sum
+        upper = (totals.max(axis=1) + remaining * self.max_score) / weight_sum
+        return (upper <= self.threshold) | (lower > self.threshold)
 
     def compare_dir(self, original_dir: str | Path, suspicious_text: str | Path) -> tuple[float, str]:
         """
-        Compares all the files in a directory against a single file. Returns the file with the highest similarity according to the average calculated using this class' compare_single() method.
+        Compares all the files in a directory against a single file. Returns the file with the highest similarity according to the weighted average of the child models' compare_texts() results.
         :param original_dir:
         :param suspicious_text:
         :return: A tuple containing the cosine similarity between the two most similar documents and the original document's path.
         """
-        results = []
-        for child in Path(original_dir).iterdir():
-            if child.is_file():
-                res = self.compare_single(child, suspicious_text)
-                results.append(res)
-        return BaseModel.get_max_similarity(results)
+        matches = self.top_matches(original_dir, suspicious_text, 1)
+        return matches[0] if matches else (0.0, "")
+
+    def top_matches(self, original_dir: str | Path, suspicious_text: str | Path,
+                    top_k: int = 5) -> list[tuple[float, str]]:
+        """
+        Compares all the files in a directory against a single file and returns the top_k files with the highest
+        weighted average of the child models' compare_texts() results.
+        :param original_dir: The directory containing the original files.
+        :param suspicious_text: The file to analyze.
+        :param top_k: The number of matches to return.
+        :return: A list of at most top_k (similarity, path) tuples sorted by descending similarity.
+        """
+        # A single model's top_k is already the ensemble's, so it only returns those (e.g. merged from its shards)
+        model_k = top_k if len(self.__models) == 1 else None
+        totals: dict[str, float] = {}
+        for model, weight in zip(self.__models, self.__weights):
+            for score, path in model.compare_texts(original_dir, suspicious_text, model_k):
+                totals[path] = totals.get(path, 0) + weight * score
+        weight_sum = sum(self.__weights)
+        return BaseModel.select_top_k_results(((total / weight_sum, path) for path, total in totals.items()), top_k)
 
-    def run_comparison(self, alternative_path: str | Path = None, show_ground_truth: bool = False) -> None:
+    def compare_batch(self, original_dir: str | Path, suspicious_dir: str | Path, top_k: int = 1,
+                      block_size: int | None = None, memory_budget: int = 64 * 2 ** 20,
+                      workers: int = 1) -> dict[str, list[tuple[float, str]]]:
+        """
+        Compares every file in a directory against all the files in another directory. Suspicious files are scored in
+        blocks of rows so the dense (block x originals) similarity matrix never exceeds the given memory budget. With
+        several workers, blocks are spread across processes and each one holds its own block in memory.
+        :param original_dir: The directory containing the original files.
+        :param suspicious_dir: The directory containing the files to analyze.
+        :param top_k: The number of matches to return per suspicious file.
+        :param block_size: The number of suspicious files scored at once. Derived from memory_budget if not given.
+        :param memory_budget: The maximum size in bytes of each block's dense similarity matrix.
+        :param workers: The number of processes to use. With 1, the comparison runs in the current process.
+        :return: A dictionary mapping every suspicious file's path to its top_k (similarity, path) tuples.
+        """
+        blocks = self.__blocks(original_dir, suspicious_dir, block_size, memory_budget, workers)
+        if workers > 1:
+            self.prepare(original_dir)
+        top = map_shards(partial(_compare_block, original_dir=original_dir, top_k=top_k), self, blocks, workers)
+        return {str(f): matches for block, block_top in zip(blocks, top) for f, matches in zip(block, block_top)}
+
+    def compare_blocks(self, original_dir: str | Path, suspicious_dir: str | Path, top_k: int = 1,
+                       block_size: int | None = None, memory_budget: int = 64 * 2 ** 20,
+                       workers: int = 1) -> Iterator[tuple[list[Path], np.ndarray, list[str]]]:
+        """
+        Same as compare_batch(), yielding the results of every block as a structured array as soon as it and the
+        previous blocks are done.
+        :param original_dir: The directory containing the original files.
+        :param suspicious_dir: The directory containing the files to analyze.
+        :param top_k: The number of matches to return per suspicious file.
+        :param block_size: The number of suspicious files scored at once. Derived from memory_budget if not given.
+        :param memory_budget: The maximum size in bytes of each block's dense similarity matrix.
+        :param workers: The number of processes to use. With 1, the comparison runs in the current process.
+        :return: An iterator over the files of every block, their (files x top_k) array of MATCH_DTYPE records and the
+        original documents' paths their doc field refers to.
+        """
+        blocks = self.__blocks(original_dir, suspicious_dir, block_size, memory_budget, workers)
+        if workers > 1:
+            self.prepare(original_dir)
+        top = imap_shards(partial(_compare_block_array, original_dir=original_dir, top_k=top_k), self, blocks, workers)
+        for block, (matches, doc_ids) in zip(blocks, top):
+            yield block, matches, doc_ids
+
+    @staticmethod
+    def __blocks(original_dir: str | Path, suspicious_dir: str | Path, block_size: int | None, memory_budget: int,
+                 workers: int) -> list[list[Path]]:
+        if not Path(suspicious_dir).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        s_files = sorted(child for child in Path(suspicious_dir).iterdir() if child.is_file())
+        if block_size is None:
+            n_originals = sum(1 for child in Path(original_dir).iterdir() if child.is_file())
+            block_size = memory_budget // (max(n_originals, 1) * np.dtype(np.float64).itemsize)
+        if workers > 1:
+            # Make sure every worker gets a block
+            block_size = min(block_size, -(-len(s_files) // workers))
+        block_size = max(int(block_size), 1)
+        return [s_files[start:start + block_size] for start in range(0, len(s_files), block_size)]
+
+    def find_collusion(self, suspicious_dir: str | Path | None = None, vec_type: str = "tfidf") -> list[dict]:
+        """
+        Compares the suspicious files against each other and groups the ones whose similarity is above the threshold.
+        :param suspicious_dir: The directory containing the submissions. Read from the config if not given.
+        :param vec_type: The term weighting used for the comparison, "count" or "tfidf".
+        :return: A dictionary per group of colluding submissions, sorted by descending size.
+        """
+        from src.algorithms.collusion import CollusionDetector  # Loaded on first use, it needs scipy's graph routines
+        suspicious_dir = suspicious_dir if suspicious_dir else self.__config_manager.get("SUSPICIOUS_FILES")
+        return CollusionDetector(vec_type, self.threshold).fit(suspicious_dir).clusters()
+
+    def compare_files(self, original_dir: str | Path, s_files: list[Path], top_k: int = 1) -> list[list[tuple[float, str]]]:
+        """
+        Compares a list of files against all the files in a directory using the weighted average of the child models'
+        results.
+        :param original_dir: The directory containing the original files.
+        :param s_files: The files to analyze.
+        :param top_k: The number of matches to return per file.
+        :return: A list with the top_k (similarity, path) tuples of every file, in the same order as s_files.
+        """
+        scores, doc_ids = self.__ensemble(original_dir, s_files)
+        return BaseModel.get_top_k(scores, doc_ids, top_k)
+
+    def compare_files_array(self, original_dir: str | Path, s_files: list[Path],
+                            top_k: int = 1) -> tuple[np.ndarray, list[str]]:
+        """
+        Same as compare_files(), with the results returned as a structured array.
+        :param original_dir: The directory containing the original files.
+        :param s_files: The files to analyze.
+        :param top_k: The number of matches to return per file.
+        :return: A tuple containing a (files x top_k) array of MATCH_DTYPE records and the original documents' paths
+        their doc field refers to.
+        """
+        scores, doc_ids = self.__ensemble(original_dir, s_files)
+        return BaseModel.get_top_k_array(scores, top_k), doc_ids
+
+    def __ensemble(self, original_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        metrics.count("documents", len(s_files))
+        # Read and tokenized once for all the models
+        documents = [Document(s_file) for s_file in s_files]
+        totals, doc_ids = None, None
+        active = np.arange(len(s_files))
+        evaluated = np.zeros(len(s_files))
+        remaining = sum(self.__weights)
+        for model, weight in self.__ordered():
+            if self.cascade and totals is not None:
+                decided = self.__decided(totals[active], remaining)
+                metrics.count("cascade.skipped", int(decided.sum()))
+                active = active[~decided]
+                if len(active) == 0:
+                    break
+            with metrics.time(f"model.{type(model).__name__}"):
+                scores, model_ids = model.score_documents(original_dir, [documents[i] for i in active])
+            if doc_ids is None:
+                totals, doc_ids = np.zeros((len(s_files), len(model_ids))), model_ids
+            elif model_ids != doc_ids:
+                position = {path: i for i, path in enumerate(model_ids)}
+                scores = scores[:, [position[path] for path in doc_ids]]
+            totals[active] += weight * scores
+            evaluated[active] += weight
+            remaining -= weight
+        return totals / evaluated[:, None], doc_ids
+
+    def score_models(self, original_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Scores a list of files against all the files in a directory with every child model, without averaging them.
+        :param original_dir: The directory containing the original files.
+        :param s_files: The files to analyze.
+        :return: A tuple containing a (models x files x originals) array with the similarities of every model and the
+        original documents' paths its last axis refers to.
+        """
+        documents = [Document(s_file) for s_file in s_files]
+        stacked, doc_ids = [], None
+        for model in self.__models:
+            with metrics.time(f"model.{type(model).__name__}"):
+                scores, model_ids = model.score_documents(original_dir, documents)
+            if doc_ids is None:
+                doc_ids = model_ids
+            elif model_ids != doc_ids:
+                position = {path: i for i, path in enumerate(model_ids)}
+                scores = scores[:, [position[path] for path in doc_ids]]
+            stacked.append(scores)
+        return np.stack(stacked), doc_ids
+
+    def calibrate(self, original_dir: str | Path | None = None, suspicious_dir: str | Path | None = None,
+                  ground_truth: dict | None = None, weight_steps: int | None = None, apply: bool = False) -> dict:
+        """
+        Scores the suspicious files with every child model once and finds the threshold, and optionally the weights,
+        with the highest F1 score against the ground truth.
+        :param original_dir: The directory containing the original files. Read from the config if not given.
+        :param suspicious_dir: The directory containing the files to analyze. Read from the config if not given.
+        :param ground_truth: A dictionary mapping file names to whether they are plagiarized. The config's ground truth
+        is used if not given. Files without ground truth are left out.
+        :param weight_steps: If given, every combination of weights in multiples of 1 / weight_steps is evaluated.
+        Otherwise, only the current weights are.
+        :param apply: Whether to replace the mediator's threshold and weights with the best ones.
+        :return: The evaluation of the best weights, as returned by evaluation.calibrate().
+        """
+        original_dir = original_dir if original_dir else self.__config_manager.get("ORIGINAL_FILES")
+        suspicious_dir = suspicious_dir if suspicious_dir else self.__config_manager.get("SUSPICIOUS_FILES")
+        ground_truth = ground_truth if ground_truth is not None else self.ground_truth
+        if not Path(suspicious_dir).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        s_files = sorted(child for child in Path(suspicious_dir).iterdir()
+                         if child.is_file() and Fm.extract_file_name(child) in ground_truth)
+        if not s_files:
+            raise ValueError("No ground truth found for the provided files.")
+        labels = np.array([bool(ground_truth[Fm.extract_file_name(f)]) for f in s_files])
+        model_scores, _ = self.score_models(original_dir, s_files)
+        weights = weight_grid(len(self.__models), weight_steps) if weight_steps else np.array([self.__weights])
+        result = calibrate(model_scores, labels, weights)
+        if apply:
+            self.threshold = result["threshold"]
+            self.__weights = list(result["weights"])
+        return result
+
+    def run_comparison(self, alternative_path: str | Path = None, show_ground_truth: bool = False,
+                       workers: int = 1, metrics_path: str | Path | None = None,
+                       profile_path: str | Path | None = None, top_k: int = 1, output: str | Path | None = None,
+                       output_format: str | None = None) -> None:
         """
         Runs a batch comparison between all the files in a directory and a single file using the child models.
+        :param workers: The number of processes used to compare the files.
+        :param top_k: The number of matches shown per file.
+        :param metrics_path: If given, stage timings and counters are collected during the run and written to this JSON
+        file. With several workers, only the work done in the current process is measured.
+        :param profile_path: If given, the run is profiled with cProfile and the stats are written to this file.
+        :param output: If given, the matches are written to this file or directory as every block of files is done
+        instead of being shown.
+        :param output_format: The format of output, "jsonl", "csv", "arrow" or "npz". Chosen by its extension if not
+        given.
         :return:
         """
-        sus_dir = self.__cm.get("SUSPICIOUS_FILES") if not alternative_path else alternative_path
+        if metrics_path is not None:
+            metrics.enable()
+        profiler = cProfile.Profile() if profile_path is not None else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            self.__print_comparison(alternative_path, show_ground_truth, workers, top_k, output, output_format)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_path)
+            if metrics_path is not None:
+                metrics.dump(metrics_path, {"cache": Fm.cache.stats()} if Fm.cache is not None else None)
+                metrics.disable()
+
+    def __print_comparison(self, alternative_path: str | Path, show_ground_truth: bool, workers: int,
+                           top_k: int, output: str | Path | None, output_format: str | None) -> None:
+        sus_dir = self.__config_manager.get("SUSPICIOUS_FILES") if not alternative_path else alternative_path
         if Fm.validate_file(sus_dir):
             size, correct = 0, 0
-            for f in sus_dir.iterdir():
-                if f.is_file():
-                    result = self.compare_dir(self.__cm.get("ORIGINAL_FILES"), f)
-                    # Check results
-                    file_stem = Fm.extract_file_name(f)
-                    expected = self.__ground_truth[file_stem]
-                    is_plag = result[0] > 60.0
-                    # Show main results
-                    print(f"{file_stem}".center(20, '-'))
-                    print(f"Results: {is_plag} ({result[0]:2f}% similarity with {result[1]})")
-                    if show_ground_truth:
-                        size += 1
-                        if is_plag == expected:
-                            correct += 1
-                        # Print results
-                        if file_stem in self.__ground_truth.keys():
-                            print(f"Expected result: {self.__ground_truth.get(file_stem)}")
-                        else:
-                            print(f"No ground truth found for file {file_stem}")
-            if show_ground_truth:
+            if output is not None:
+                sink = open_sink(output, output_format)
+            else:
+                sink = ConsoleSink(ground_truth=self.ground_truth if show_ground_truth else None)
+            with sink:
+                for files, matches, doc_ids in self.compare_blocks(self.__config_manager.get("ORIGINAL_FILES"),
+                                                                   sus_dir, top_k, workers=workers):
+                    sink.write(ResultBatch(files, matches, doc_ids, self.threshold))
+                    if show_ground_truth and matches.shape[1] > 0:
+                        # Check results
+                        is_plag = matches["score"][:, 0] > self.threshold
+                        expected = [self.ground_truth.get(Fm.extract_file_name(f)) for f in files]
+                        size += len(files)
+                        correct += sum(e == p for e, p in zip(expected, is_plag.tolist()))
+            if output is not None:
+                print(f"{sink.rows} results written to {output}")
+            if show_ground_truth and size:
                 print(f"Accuracy: {correct / size * 100:2f}%")
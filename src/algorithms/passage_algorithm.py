@@ -0,0 +1,233 @@
+"""
+This module locates copied passages between a suspicious document and the original documents using an inverted index
+of hashed word n-grams. Looking up a document costs time proportional to its length, not to the size of the corpus.
+"""
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from src.algorithms.model import BaseModel
+from src.util.file_manager import FileManager as Fm
+from src.util.text import Document, hash_ngrams, tokenize_spans
+
+
+class Passage(NamedTuple):
+    """
+    A passage of a suspicious document that matches a passage of an original document. Offsets are character
+    positions, with exclusive ends.
+    """
+    original: str
+    suspicious_start: int
+    suspicious_end: int
+    original_start: int
+    original_end: int
+    words: int
+
+
+class PassageAlgorithm(BaseModel):
+    """
+    This class indexes every n-gram of the original documents and merges the n-grams a suspicious document shares with
+    an original into passages. The similarity with an original is the percentage of the suspicious document's words
+    covered by passages of that original.
+    """
+    cost = 4.0
+
+    def __init__(self, ngram_size: int = 5, max_gap: int = 3, min_words: int = 8, max_postings: int = 100):
+        """
+        :param ngram_size: The number of words per indexed n-gram.
+        :param max_gap: The number of unmatched words allowed inside a passage.
+        :param min_words: The minimum number of suspicious words a passage must cover to be reported.
+        :param max_postings: N-grams found more often than this in the corpus are too common to locate a passage and
+        aren't indexed.
+        """
+        super().__init__()
+        self.__ngram_size = ngram_size
+        self.__max_gap = max_gap
+        self.__min_words = min_words
+        self.__max_postings = max_postings
+        self.__hashes = np.zeros(0, dtype=np.uint32)
+        self.__docs = np.zeros(0, dtype=np.int32)
+        self.__positions = np.zeros(0, dtype=np.int32)
+        self.__offsets: list[tuple[np.ndarray, np.ndarray]] = []
+        self.__doc_ids: list[str] = []
+        self.__source = None
+
+    @property
+    def doc_ids(self) -> list[str]:
+        return self.__doc_ids
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Builds the inverted n-gram index of every file in a directory unless it was already built for it.
+        :param f_dir: The directory containing the original files.
+        """
+        if not Path(f_dir).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        if self.__source == Path(f_dir):
+            return
+        self.__build(sorted(child for child in Path(f_dir).iterdir() if child.is_file()))
+        self.__source = Path(f_dir)
+
+    def __build(self, files: list[Path]) -> None:
+        hashes, docs, positions, offsets = [], [], [], []
+        for row, file in enumerate(files):
+            words, starts, ends = tokenize_spans(Fm.read_file(file))
+            doc_hashes = hash_ngrams(words, self.__ngram_size)
+            hashes.append(doc_hashes)
+            docs.append(np.full(len(doc_hashes), row, dtype=np.int32))
+            positions.append(np.arange(len(doc_hashes), dtype=np.int32))
+            offsets.append((starts, ends))
+        hashes = np.concatenate(hashes) if hashes else np.zeros(0, dtype=np.uint32)
+        order = np.argsort(hashes, kind="stable")
+        hashes = hashes[order]
+        docs = np.concatenate(docs)[order] if docs else np.zeros(0, dtype=np.int32)
+        positions = np.concatenate(positions)[order] if positions else np.zeros(0, dtype=np.int32)
+        # Drop the postings of n-grams that are too common
+        _, counts = np.unique(hashes, return_counts=True)
+        keep = np.repeat(counts <= self.__max_postings, counts)
+        self.__hashes, self.__docs, self.__positions = hashes[keep], docs[keep], positions[keep]
+        self.__offsets = offsets
+        self.__doc_ids = [str(f) for f in files]
+        self.__source = None
+
+    def __lookup(self, hashes: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        left = np.searchsorted(self.__hashes, hashes, side="left")
+        right = np.searchsorted(self.__hashes, hashes, side="right")
+        counts = right - left
+        query_positions = np.repeat(np.arange(len(hashes)), counts)
+        # Index of every posting of every n-gram: left[i], left[i] + 1, ..., right[i] - 1
+        postings = np.repeat(left - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.__docs[postings], query_positions, self.__positions[postings]
+
+    def __merge(self, query_positions: np.ndarray, doc_positions: np.ndarray) -> list[tuple[int, int, int, int]]:
+        # Chains matching n-grams into word ranges (inclusive) of the suspicious and the original document. N-grams are
+        # chained along their diagonal (original position - suspicious position), so the postings of an n-gram repeated
+        # elsewhere in the original open a span of their own instead of cutting the current one. Up to max_gap words
+        # may be inserted or removed between two chained n-grams.
+        n, gap = self.__ngram_size, self.__max_gap
+        open_spans: dict[int, list[int]] = {}
+        spans = []
+        for q, o in zip(query_positions.tolist(), doc_positions.tolist()):
+            diagonal = o - q
+            span = None
+            # Postings come by increasing q, so the closest diagonal with a span still open is taken
+            for offset in sorted(range(-gap, gap + 1), key=abs):
+                candidate = open_spans.get(diagonal + offset)
+                if candidate is None:
+                    continue
+                if q > candidate[1] + 1 + gap:
+                    spans.append(tuple(open_spans.pop(diagonal + offset)))
+                    continue
+                if o >= candidate[2]:
+                    span = open_spans.pop(diagonal + offset)
+                    break
+            if span is None:
+                span = [q, q + n - 1, o, o + n - 1]
+            else:
+                span = [span[0], max(span[1], q + n - 1), span[2], max(span[3], o + n - 1)]
+            if diagonal in open_spans:
+                spans.append(tuple(open_spans[diagonal]))
+            open_spans[diagonal] = span
+        spans.extend(tuple(span) for span in open_spans.values())
+        spans = [span for span in spans if span[1] - span[0] + 1 >= self.__min_words]
+        # A span inside a longer one only matches a phrase repeated in one of the documents
+        kept = []
+        for span in sorted(spans, key=lambda x: (x[0] - x[1], x[0], x[2])):
+            if not any(k[0] <= span[0] and span[1] <= k[1] for k in kept):
+                kept.append(span)
+        return sorted(kept)
+
+    def find_passages(self, f_dir: str | Path, s_file_path: str | Path) -> tuple[list[Passage], int]:
+        """
+        Locates the passages of a file that match passages of the files in a directory.
+        :param f_dir: The directory containing the original files.
+        :param s_file_path: The file to analyze.
+        :return: A tuple containing the matched passages, sorted by original and position, and the number of words of
+        the analyzed file.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        passages, starts = self.__find(Document(s_file_path))
+        return passages, len(starts)
+
+    def __find(self, document: Document) -> tuple[list[Passage], np.ndarray]:
+        words, starts, ends = document.spans
+        docs, query_positions, doc_positions = self.__lookup(hash_ngrams(words, self.__ngram_size))
+        order = np.lexsort((doc_positions, query_positions, docs))
+        docs, query_positions, doc_positions = docs[order], query_positions[order], doc_positions[order]
+        passages = []
+        boundaries = np.flatnonzero(np.diff(docs)) + 1
+        for doc_slice in np.split(np.arange(len(docs)), boundaries):
+            if len(doc_slice) == 0:
+                continue
+            row = int(docs[doc_slice[0]])
+            o_starts, o_ends = self.__offsets[row]
+            for q0, q1, o0, o1 in self.__merge(query_positions[doc_slice], doc_positions[doc_slice]):
+                passages.append(Passage(self.__doc_ids[row], int(starts[q0]), int(ends[q1]), int(o_starts[o0]),
+                                        int(o_ends[o1]), q1 - q0 + 1))
+        return passages, starts
+
+    def __coverage(self, document: Document) -> dict[str, float]:
+        passages, starts = self.__find(document)
+        n_words = len(starts)
+        covered: dict[str, np.ndarray] = {}
+        for passage in passages:
+            mask = covered.setdefault(passage.original, np.zeros(n_words, dtype=bool))
+            mask[(starts >= passage.suspicious_start) & (starts < passage.suspicious_end)] = True
+        return {original: mask.sum() / max(n_words, 1) * 100 for original, mask in covered.items()}
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        """
+        Calculates the percentage of a file covered by passages of a single original.
+        :param f_file_path: The original document.
+        :param s_file_path: The document to analyze.
+        :return: A tuple containing the coverage percentage and the original document's path.
+        """
+        if not Fm.validate_file(f_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        model = PassageAlgorithm(self.__ngram_size, self.__max_gap, self.__min_words, self.__max_postings)
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        model.__build([Path(f_file_path)])
+        return float(model.__coverage(Document(s_file_path)).get(str(Path(f_file_path)), 0.0)), str(f_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        """
+        Calculates the percentage of a file covered by passages of every original with at least one passage.
+        :param f_dir: The directory containing the files to compare.
+        :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most covering originals are returned, sorted by descending coverage.
+        :return: A list of tuples containing the coverage percentage and the original document's path.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        coverage = self.__coverage(Document(s_file_path))
+        return self.select_top_k_results(((float(score), path) for path, score in coverage.items()), top_k)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Calculates the coverage of a batch of files by every original. Originals without passages get 0.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of coverages and the original documents' paths.
+        """
+        return self.score_documents(f_dir, [Document(s_file) for s_file in s_files])
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Calculates the coverage of pre-analyzed documents by every original, reusing their word offsets.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of coverages and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        position = {doc_id: i for i, doc_id in enumerate(self.__doc_ids)}
+        scores = np.zeros((len(documents), len(self.__doc_ids)))
+        for i, document in enumerate(documents):
+            for path, score in self.__coverage(document).items():
+                scores[i, position[path]] = score
+        return scores, self.__doc_ids
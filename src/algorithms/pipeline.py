@@ -0,0 +1,214 @@
+"""
+This module contains an asyncio pipeline that scores a continuous stream of suspicious documents. Reading and scoring
+run as separate stages connected by bounded queues, so a burst of submissions makes submit() wait instead of piling up
+in memory, and documents are scored in micro-batches to use the vectorized comparison of the mediator.
+"""
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator, Iterable
+
+from src.algorithms.model import ModelMediator
+from src.util.file_manager import FileManager as Fm
+
+# Marks the end of the stream in the pipeline's queues
+_END = object()
+
+
+class IngestionPipeline:
+    """
+    This class reads submitted files in a background thread, groups them into micro-batches of at most batch_size
+    documents (waiting at most max_delay seconds to fill a batch) and scores every batch with the mediator. Results are
+    emitted as dictionaries, in completion order, through results().
+
+    Files are read through the file cache so the scoring stage doesn't read them again. With use_cache, a cache is
+    enabled while the pipeline runs if there isn't one already, and disabled again once the pipeline is drained.
+    """
+    def __init__(self, mediator: ModelMediator, original_dir: str | Path, queue_size: int = 64, batch_size: int = 32,
+                 max_delay: float = 0.05, top_k: int = 1, threshold: float | None = None, use_cache: bool = True):
+        """
+        :param mediator: The mediator that scores the files.
+        :param original_dir: The directory containing the original files.
+        :param queue_size: The maximum number of files waiting in every stage.
+        :param batch_size: The maximum number of files scored together.
+        :param max_delay: The maximum number of seconds to wait for a batch to fill.
+        :param top_k: The number of matches to return per file.
+        :param threshold: The similarity above which a file is considered plagiarized. Defaults to the mediator's.
+        :param use_cache: Whether to enable the file cache while the pipeline runs.
+        """
+        self.__mediator = mediator
+        self.__original_dir = Path(original_dir)
+        self.__batch_size = batch_size
+        self.__max_delay = max_delay
+        self.__top_k = top_k
+        self.__threshold = threshold
+        self.__incoming: asyncio.Queue | None = None
+        self.__ready: asyncio.Queue | None = None
+        self.__outgoing: asyncio.Queue | None = None
+        self.__queue_size = queue_size
+        self.__tasks: list[asyncio.Task] = []
+        self.__closed = False
+        self.__use_cache = use_cache
+        self.__owns_cache = False
+
+    async def start(self) -> None:
+        """
+        Prepares the child models and starts the reading and scoring stages.
+        """
+        if self.__use_cache and Fm.cache is None:
+            Fm.enable_cache()
+            self.__owns_cache = True
+        self.__incoming = asyncio.Queue(self.__queue_size)
+        self.__ready = asyncio.Queue(self.__queue_size)
+        self.__outgoing = asyncio.Queue(self.__queue_size)
+        await asyncio.to_thread(self.__mediator.prepare, self.__original_dir)
+        self.__tasks = [asyncio.create_task(self.__read()), asyncio.create_task(self.__score())]
+
+    async def submit(self, file_path: str | Path) -> None:
+        """
+        Submits a file to be scored. Waits while the pipeline is full.
+        :param file_path: The file to score.
+        """
+        if self.__closed:
+            raise ValueError("The pipeline is closed.")
+        await self.__incoming.put((Path(file_path), time.time()))
+
+    async def close(self) -> None:
+        """
+        Stops accepting files. Files already submitted are still scored.
+        """
+        if not self.__closed:
+            self.__closed = True
+            await self.__incoming.put(_END)
+
+    async def results(self) -> AsyncIterator[dict]:
+        """
+        Yields the result of every submitted file as soon as it is scored, until the pipeline is closed and drained.
+        :return: An asynchronous generator of result dictionaries.
+        """
+        try:
+            while (result := await self.__outgoing.get()) is not _END:
+                yield result
+            await asyncio.gather(*self.__tasks)
+        finally:
+            # Only the cache enabled by this pipeline is disabled, one enabled by the caller is left as it was
+            if self.__owns_cache:
+                Fm.disable_cache()
+                self.__owns_cache = False
+
+    async def __read(self) -> None:
+        try:
+            while (item := await self.__incoming.get()) is not _END:
+                file_path, submitted_at = item
+                try:
+                    await asyncio.to_thread(Fm.read_file, file_path)
+                except Exception as e:
+                    await self.__outgoing.put(self.__result(file_path, submitted_at, error=str(e)))
+                    continue
+                await self.__ready.put(item)
+        finally:
+            # The scoring stage always ends, even if reading failed
+            await self.__ready.put(_END)
+
+    async def __next_batch(self) -> tuple[list, bool]:
+        batch, ended = [], False
+        item = await self.__ready.get()
+        if item is _END:
+            return batch, True
+        batch.append(item)
+        deadline = asyncio.get_running_loop().time() + self.__max_delay
+        while len(batch) < self.__batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self.__ready.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if item is _END:
+                ended = True
+                break
+            batch.append(item)
+        return batch, ended
+
+    async def __score(self) -> None:
+        ended = False
+        try:
+            while not ended:
+                batch, ended = await self.__next_batch()
+                if not batch:
+                    continue
+                files = [file_path for file_path, _ in batch]
+                try:
+                    matches = await asyncio.to_thread(self.__mediator.compare_files, self.__original_dir, files,
+                                                      self.__top_k)
+                except Exception as e:
+                    # A failed batch is reported and the following ones are still scored
+                    for file_path, submitted_at in batch:
+                        await self.__outgoing.put(self.__result(file_path, submitted_at, error=str(e) or repr(e)))
+                    continue
+                for (file_path, submitted_at), file_matches in zip(batch, matches):
+                    await self.__outgoing.put(self.__result(file_path, submitted_at, file_matches))
+        finally:
+            # results() always ends, even if scoring failed
+            await self.__outgoing.put(_END)
+
+    def __result(self, file_path: Path, submitted_at: float, matches: list[tuple[float, str]] | None = None,
+                 error: str | None = None) -> dict:
+        completed_at = time.time()
+        best = matches[0] if matches else (0.0, "")
+        threshold = self.__threshold if self.__threshold is not None else self.__mediator.threshold
+        return {"file": str(file_path), "name": Fm.extract_file_name(file_path), "score": best[0],
+                "original": best[1], "is_plagiarism": best[0] > threshold,
+                "matches": [{"score": score, "original": original} for score, original in matches or []],
+                "error": error, "submitted_at": submitted_at, "completed_at": completed_at,
+                "latency_seconds": completed_at - submitted_at}
+
+    async def run(self, files: Iterable[str | Path]) -> list[dict]:
+        """
+        Scores a finite set of files through the pipeline.
+        :param files: The files to score.
+        :return: The results, in completion order.
+        """
+        await self.start()
+
+        async def feed() -> None:
+            for file_path in files:
+                await self.submit(file_path)
+            await self.close()
+
+        feeder = asyncio.create_task(feed())
+        results = [result async for result in self.results()]
+        await feeder
+        return results
+
+    async def watch(self, directory: str | Path, poll_interval: float = 0.5, stop: asyncio.Event | None = None) -> None:
+        """
+        Submits every file that appears or changes in a directory until the stop event is set, then closes the
+        pipeline.
+        :param directory: The directory to watch.
+        :param poll_interval: The number of seconds between two scans of the directory.
+        :param stop: The event that stops watching. The directory is watched forever if not given.
+        """
+        seen: dict[Path, int] = {}
+        stop = stop or asyncio.Event()
+        try:
+            while True:
+                for child in sorted(Path(directory).iterdir()):
+                    try:
+                        if not child.is_file():
+                            continue
+                        mtime = child.stat().st_mtime_ns
+                    except OSError:
+                        # Removed or renamed since the directory was listed
+                        continue
+                    if seen.get(child) != mtime:
+                        seen[child] = mtime
+                        await self.submit(child)
+                try:
+                    await asyncio.wait_for(stop.wait(), poll_interval)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+        finally:
+            await self.close()
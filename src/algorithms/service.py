@@ -0,0 +1,243 @@
+"""
+This module contains a local HTTP service that keeps the original corpus indexed in memory and scores submitted texts
+against it, so a request only pays for vectorizing its own text instead of re-processing every original.
+"""
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.fingerprint_algorithm import FingerprintIndex
+from src.algorithms.model import BaseModel, ModelMediator
+from src.util.text import Document
+
+
+class ScoringService:
+    """
+    This class scores texts against the originals of a directory with the average of one cosine model per vectorizer
+    type. The indexes are built (or loaded from index_dir) once and shared by every request.
+
+    With fingerprints enabled, exact and near-exact copies of an original are resolved by a FingerprintIndex before
+    any text is vectorized. Every result reports the stage that produced it: "exact", "near" or "cosine".
+    """
+    def __init__(self, original_dir: str | Path, vec_types: tuple[str, ...] = ("tfidf",),
+                 index_dir: str | Path | None = None, threshold: float | None = None,
+                 fingerprints: bool = False):
+        """
+        :param original_dir: The directory containing the original files.
+        :param vec_types: The vectorizer type of every cosine model.
+        :param index_dir: If given, the index of every model is loaded from index_dir/<vec_type> when it exists, and
+        saved there otherwise.
+        :param threshold: The similarity above which a text is considered plagiarized. Defaults to the threshold of
+        a ModelMediator.
+        :param fingerprints: Whether to resolve copies of the originals with a fingerprint lookup first.
+        """
+        if not Path(original_dir).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        self.__original_dir = Path(original_dir)
+        self.__vec_types = tuple(vec_types)
+        self.__models = [CosineAlgorithm(vec_type) for vec_type in vec_types]
+        self.__index_dir = Path(index_dir) if index_dir is not None else None
+        self.threshold = threshold if threshold is not None else ModelMediator.default_threshold
+        self.__doc_ids: list[str] = []
+        self.__fingerprints = FingerprintIndex() if fingerprints else None
+        self.__stages = Counter()
+        self.__lock = threading.Lock()
+
+    @property
+    def doc_ids(self) -> list[str]:
+        return self.__doc_ids
+
+    @property
+    def models(self) -> list[CosineAlgorithm]:
+        return self.__models
+
+    @property
+    def stages(self) -> dict[str, int]:
+        """
+        :return: The number of texts resolved by every stage since the service was loaded.
+        """
+        with self.__lock:
+            return dict(self.__stages)
+
+    def load(self) -> "ScoringService":
+        """
+        Builds or loads the index of every model.
+        :return: The service itself.
+        """
+        for vec_type, model in zip(self.__vec_types, self.__models):
+            index_dir = self.__index_dir / vec_type if self.__index_dir is not None else None
+            if index_dir is not None and (index_dir / "manifest.json").is_file():
+                index = model.load_index(index_dir)
+                if index.stale or index.source != self.__original_dir:
+                    model.fit(self.__original_dir).save(index_dir)
+            else:
+                model.fit(self.__original_dir)
+                if index_dir is not None:
+                    model.save_index(index_dir)
+            # Built eagerly so concurrent requests don't race to build it
+            _ = model.index.vocabulary
+        self.__doc_ids = self.__models[0].index.doc_ids
+        if self.__fingerprints is not None:
+            self.__fingerprints.fit(self.__doc_ids)
+        return self
+
+    def score_texts(self, texts: list[str], top_k: int = 1) -> list[dict]:
+        """
+        Scores several texts against every original. A text resolved by its fingerprints gets the similarity of its
+        stage with the copied original and its cosine similarity with every other original, as in
+        FingerprintAlgorithm.
+        :param texts: The texts to analyze.
+        :param top_k: The number of matches to return per text.
+        :return: A list with a dictionary per text containing its best score and original, its verdict, its top_k
+        matches and the stage that resolved it.
+        """
+        matches = [None] * len(texts)
+        if self.__fingerprints is not None:
+            matches = [self.__fingerprints.lookup(Document(text=text)) for text in texts]
+        # A copy's best match is its original, so a single match doesn't need the cosine scores
+        rest = [i for i, match in enumerate(matches) if top_k > 1 or match is None]
+        totals = np.zeros((len(texts), len(self.__doc_ids)))
+        for model in self.__models if rest else []:
+            scores = model.index.score_matrix([texts[i] for i in rest])
+            if model.index.doc_ids != self.__doc_ids:
+                position = {path: i for i, path in enumerate(model.index.doc_ids)}
+                scores = scores[:, [position[path] for path in self.__doc_ids]]
+            totals[rest] += scores
+        totals /= len(self.__models)
+        for i, match in enumerate(matches):
+            if match is not None:
+                totals[i, match[2]] = match[1]
+        stages = [match[0] if match is not None else "cosine" for match in matches]
+        results = []
+        for stage, ranked in zip(stages, BaseModel.get_top_k(totals, self.__doc_ids, top_k)):
+            best = ranked[0] if ranked else (0.0, "")
+            results.append({"score": best[0], "original": best[1], "is_plagiarism": best[0] > self.threshold,
+                            "matches": [{"score": score, "original": original} for score, original in ranked],
+                            "stage": stage})
+        with self.__lock:
+            self.__stages.update(stages)
+        return results
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    """
+    This class handles the requests of a ScoringServer:
+
+    - GET /health returns the number of indexed originals and the number of texts resolved by every stage.
+    - POST /score scores {"text": str, "top_k": int}.
+    - POST /score/batch scores {"texts": [str, ...], "top_k": int}.
+
+    A busy handler answers every score request with 503 Service Unavailable instead of scoring it.
+    """
+    server: "ScoringServer"
+
+    def __init__(self, request, client_address, server: "ScoringServer", busy: bool = False):
+        self.busy = busy
+        if busy:
+            # Busy requests are answered by the thread accepting connections, which a slow client must not hold
+            self.timeout = 5
+        super().__init__(request, client_address, server)
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self.__send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}."})
+            return
+        service = self.server.service
+        self.__send(HTTPStatus.OK, {"status": "ok", "documents": len(service.doc_ids),
+                                    "models": [model.index.vec_type for model in service.models],
+                                    "stages": service.stages})
+
+    def do_POST(self) -> None:
+        if self.path not in ("/score", "/score/batch"):
+            self.__send(HTTPStatus.NOT_FOUND, {"error": f"Unknown path {self.path}."})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        if length > self.server.max_body:
+            self.__send(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "The request body is too large."})
+            return
+        data = self.rfile.read(length)
+        if self.busy:
+            self.__send(HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many pending requests, try again later."},
+                        {"Retry-After": "1"})
+            return
+        try:
+            body = json.loads(data or b"{}")
+            top_k = int(body.get("top_k", 1))
+            texts = [body["text"]] if self.path == "/score" else body["texts"]
+            if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+                raise TypeError("texts must be a list of strings.")
+            if top_k < 1:
+                raise ValueError("top_k must be positive.")
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            self.__send(HTTPStatus.BAD_REQUEST, {"error": f"Invalid request: {e!r}"})
+            return
+        results = self.server.service.score_texts(texts, top_k)
+        self.__send(HTTPStatus.OK, results[0] if self.path == "/score" else {"results": results})
+
+    def __send(self, status: HTTPStatus, payload: dict, headers: dict[str, str] | None = None) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ScoringServer(HTTPServer):
+    """
+    This class serves a ScoringService over HTTP and handles requests concurrently on a fixed pool of worker threads.
+    At most max_pending requests are running or waiting for a worker; score requests beyond that are rejected with
+    503 Service Unavailable.
+    """
+    def __init__(self, service: ScoringService, host: str = "127.0.0.1", port: int = 8000, workers: int = 4,
+                 max_body: int = 16 * 2 ** 20, verbose: bool = False, max_pending: int = 64):
+        """
+        :param service: The loaded service that scores the requests.
+        :param host: The address to listen on.
+        :param port: The port to listen on, or 0 to pick a free one.
+        :param workers: The number of requests handled concurrently.
+        :param max_body: The largest accepted request body in bytes.
+        :param verbose: Whether to log every request.
+        :param max_pending: The maximum number of requests running or waiting for a worker.
+        """
+        if max_pending < workers:
+            raise ValueError("There must be at least one pending request per worker.")
+        super().__init__((host, port), ScoringHandler)
+        self.service = service
+        self.max_body = max_body
+        self.verbose = verbose
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+        self.__pending = threading.BoundedSemaphore(max_pending)
+
+    def process_request(self, request, client_address) -> None:
+        if self.__pending.acquire(blocking=False):
+            self.__executor.submit(self.__process, request, client_address, False)
+        else:
+            self.__process(request, client_address, True)
+
+    def __process(self, request, client_address, busy: bool) -> None:
+        try:
+            ScoringHandler(request, client_address, self, busy)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            if not busy:
+                self.__pending.release()
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.__executor.shutdown(wait=True)
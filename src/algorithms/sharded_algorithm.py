@@ -0,0 +1,392 @@
+"""
+This module splits the index of the original documents into shards, each one held by its own worker process, and
+answers queries by scatter-gather: a query is sent to every shard at once and the per-shard top-k results are merged.
+
+Workers are reached through sockets (multiprocessing.connection), so shards started locally with
+ShardedIndex.start() and shards started on other machines with src/wrapper/shard.py behave the same way. The
+coordinator only keeps the global term statistics: the document frequencies of every shard are summed into global IDF
+weights that are sent back to the shards, so scores match the unsharded CosineAlgorithm.
+"""
+import heapq
+import multiprocessing
+import secrets
+import zlib
+from collections import Counter
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+
+import numpy as np
+
+from src.algorithms.corpus_index import CorpusIndex, HashedVocabulary
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import BaseModel
+from src.util.file_manager import FileManager as Fm
+from src.util.metrics import metrics
+from src.util.text import Document
+
+
+def shard_of(doc_id: str | Path, n_shards: int) -> int:
+    """
+    Assigns a document to a shard by the hash of its file name, so the assignment doesn't depend on where the corpus
+    is mounted.
+    :param doc_id: The document's path.
+    :param n_shards: The number of shards.
+    :return: The index of the document's shard.
+    """
+    return zlib.crc32(Path(doc_id).name.encode("utf-8")) % n_shards
+
+
+class IndexShard:
+    """
+    This class holds the CorpusIndex of one shard inside a worker. Only the methods listed in commands can be called
+    remotely.
+    """
+    commands = ("fit", "statistics", "use_idf", "scores", "top_k")
+
+    def __init__(self):
+        self.__index: CorpusIndex | None = None
+
+    def fit(self, files: list[str], vec_type: str, n_features: int | None, compact: bool) -> int:
+        self.__index = CorpusIndex(vec_type, n_features=n_features, compact=compact).fit_files(
+            [Path(f) for f in files])
+        return len(self.__index.doc_ids)
+
+    def statistics(self) -> tuple[list[str] | None, np.ndarray, int]:
+        terms = None if self.__index.n_features is not None else [str(t) for t in self.__index.terms]
+        return terms, np.asarray(self.__index.df), len(self.__index.doc_ids)
+
+    def use_idf(self, idf: np.ndarray, oov_idf: float) -> None:
+        self.__index.use_idf(idf, oov_idf)
+
+    def scores(self, term_counts: list[Counter], norms: np.ndarray) -> tuple[np.ndarray, list[str]]:
+        vectors = self.__index.vectorize_counts(term_counts, norms)
+        return self.__index.score_vectors(vectors), self.__index.doc_ids
+
+    def top_k(self, term_counts: list[Counter], norms: np.ndarray, k: int) -> list[list[tuple[float, str]]]:
+        scores, doc_ids = self.scores(term_counts, norms)
+        return BaseModel.get_top_k(scores, doc_ids, k)
+
+
+def serve_shard(listener: Listener) -> None:
+    """
+    Serves an IndexShard to the first coordinator that connects to a listener, until it sends "close". Commands are
+    unpickled, so the listener must require an authkey and should only be reachable from trusted hosts.
+    :param listener: The listener the coordinator connects to.
+    """
+    shard = IndexShard()
+    with listener.accept() as connection:
+        while True:
+            command, args = connection.recv()
+            if command == "close":
+                connection.send((True, None))
+                return
+            try:
+                if command not in IndexShard.commands:
+                    raise ValueError(f"Unknown command {command}.")
+                connection.send((True, getattr(shard, command)(*args)))
+            except Exception as e:
+                connection.send((False, e))
+
+
+def _serve_local_shard(address_connection: Connection, authkey: bytes) -> None:
+    with Listener(("127.0.0.1", 0), authkey=authkey) as listener:
+        address_connection.send(listener.address)
+        address_connection.close()
+        serve_shard(listener)
+
+
+class ShardConnection:
+    """
+    This class sends commands to a shard served by serve_shard() and receives their results.
+    """
+    def __init__(self, address: tuple[str, int], authkey: bytes, process: multiprocessing.Process | None = None):
+        self.__connection = Client(address, authkey=authkey)
+        self.__process = process
+
+    def send(self, command: str, *args) -> None:
+        self.__connection.send((command, args))
+
+    def receive(self):
+        ok, result = self.__connection.recv()
+        if not ok:
+            raise result
+        return result
+
+    def call(self, command: str, *args):
+        self.send(command, *args)
+        return self.receive()
+
+    def close(self) -> None:
+        try:
+            self.call("close")
+        finally:
+            self.__connection.close()
+            if self.__process is not None:
+                self.__process.join()
+
+
+class ShardedIndex:
+    """
+    This class fits a corpus split into shards by document and scores queries against every shard in parallel. Query
+    rows are normalized by the coordinator over the global vocabulary before being sent, so every shard returns the
+    same similarities as an index fitted over the whole corpus.
+
+    The shards read the original files themselves, so remote workers need the corpus at the same paths.
+    """
+    def __init__(self, vec_type: str = "tfidf", n_shards: int = 2, n_features: int | None = None,
+                 compact: bool = False):
+        """
+        :param vec_type: The term weighting, "count" or "tfidf".
+        :param n_shards: The number of local workers started by start(). Ignored when connecting to remote workers.
+        :param n_features: If given, terms are hashed into this number of columns instead of being stored in a
+        vocabulary.
+        :param compact: Whether the shards store float32 raw counts instead of the weighted matrix.
+        """
+        if vec_type not in CorpusIndex.vec_types:
+            raise ValueError("Invalid vectorizer type.")
+        self.__vec_type = vec_type
+        self.__n_shards = n_shards
+        self.__n_features = n_features
+        self.__compact = compact
+        self.__shards: list[ShardConnection] = []
+        self.__vocabulary: dict[str, int] | HashedVocabulary = {}
+        self.__idf = np.zeros(0)
+        self.__oov_idf = 1.0
+        self.__doc_ids: list[str] = []
+        self.__source = None
+
+    @property
+    def doc_ids(self) -> list[str]:
+        return self.__doc_ids
+
+    @property
+    def source(self) -> Path | None:
+        return self.__source
+
+    @property
+    def n_shards(self) -> int:
+        return len(self.__shards)
+
+    def start(self, addresses: list[tuple[str, int]] | None = None, authkey: bytes | None = None) -> "ShardedIndex":
+        """
+        Connects to the shard workers, starting n_shards local worker processes if no addresses are given.
+        :param addresses: The (host, port) addresses of workers started with src/wrapper/shard.py.
+        :param authkey: The key shared with the remote workers. Required with addresses, since the workers unpickle
+        every command they receive.
+        :return: The index itself.
+        """
+        if self.__shards:
+            return self
+        if addresses is not None:
+            if not authkey:
+                raise ValueError("An authkey is required to connect to remote shards.")
+            self.__shards = [ShardConnection(tuple(address), authkey) for address in addresses]
+            return self
+        authkey = secrets.token_bytes(16)
+        for _ in range(self.__n_shards):
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_serve_local_shard, args=(sender, authkey), daemon=True)
+            process.start()
+            self.__shards.append(ShardConnection(receiver.recv(), authkey, process))
+        return self
+
+    def close(self) -> None:
+        """
+        Stops the shard workers.
+        """
+        shards, self.__shards = self.__shards, []
+        for shard in shards:
+            shard.close()
+
+    def __enter__(self) -> "ShardedIndex":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __gather(self, command: str, *args) -> list:
+        # Every shard works on the command at the same time; results are collected in shard order
+        for shard in self.__shards:
+            shard.send(command, *args)
+        return [shard.receive() for shard in self.__shards]
+
+    def fit(self, original_dir: str | Path) -> "ShardedIndex":
+        """
+        Splits the files of a directory across the shards, fits every shard and sends them the global term weights.
+        :param original_dir: The directory containing the original documents.
+        :return: The fitted index.
+        """
+        original_dir = Path(original_dir)
+        if not original_dir.is_dir():
+            raise ValueError("The provided path is not a directory.")
+        if not self.__shards:
+            self.start()
+        files = sorted(str(child) for child in original_dir.iterdir() if child.is_file())
+        parts = [[] for _ in self.__shards]
+        for file in files:
+            parts[shard_of(file, len(parts))].append(file)
+        with metrics.time("shard.fit"):
+            for shard, part in zip(self.__shards, parts):
+                shard.send("fit", part, self.__vec_type, self.__n_features, self.__compact)
+            for shard in self.__shards:
+                shard.receive()
+            statistics = self.__gather("statistics")
+            shard_columns = self.__merge_statistics(statistics)
+            for shard, columns in zip(self.__shards, shard_columns):
+                shard.send("use_idf", self.__idf[columns], self.__oov_idf)
+            for shard in self.__shards:
+                shard.receive()
+        self.__doc_ids = files
+        self.__source = original_dir
+        return self
+
+    def __merge_statistics(self, statistics: list[tuple[list[str] | None, np.ndarray, int]]) -> list[np.ndarray]:
+        # Sums the document frequencies of every shard and returns the global column of every shard's columns
+        n_docs = sum(n for _, _, n in statistics)
+        if self.__n_features is not None:
+            self.__vocabulary = HashedVocabulary(self.__n_features)
+            df = np.sum([shard_df for _, shard_df, _ in statistics], axis=0)
+            shard_columns = [np.arange(self.__n_features) for _ in statistics]
+        else:
+            terms = sorted(set().union(*(shard_terms for shard_terms, _, _ in statistics)))
+            self.__vocabulary = {term: i for i, term in enumerate(terms)}
+            df = np.zeros(len(terms), dtype=np.int64)
+            shard_columns = []
+            for shard_terms, shard_df, _ in statistics:
+                columns = np.fromiter((self.__vocabulary[t] for t in shard_terms), dtype=np.int64,
+                                      count=len(shard_terms))
+                np.add.at(df, columns, shard_df)
+                shard_columns.append(columns)
+        self.__idf, self.__oov_idf = CorpusIndex.compute_idf(self.__vec_type, df, n_docs)
+        return shard_columns
+
+    def norms(self, term_counts: list[Counter]) -> np.ndarray:
+        """
+        Calculates the norm of the weighted rows of several documents over the global vocabulary.
+        :param term_counts: The term counts of every document.
+        :return: The norm of every document's row.
+        """
+        norms = np.zeros(len(term_counts))
+        for i, counts in enumerate(term_counts):
+            columns: dict[int, float] = {}
+            oov = 0.0
+            for term, count in counts.items():
+                col = self.__vocabulary.get(term)
+                if col is None:
+                    oov += (count * self.__oov_idf) ** 2
+                else:
+                    # Terms that share a hashed column are summed before the norm is calculated
+                    columns[col] = columns.get(col, 0) + count
+            weights = np.fromiter(columns.values(), dtype=np.float64, count=len(columns))
+            weights *= self.__idf[np.fromiter(columns.keys(), dtype=np.int64, count=len(columns))]
+            norms[i] = np.sqrt(np.dot(weights, weights) + oov)
+        return norms
+
+    def score_counts(self, term_counts: list[Counter]) -> tuple[np.ndarray, list[str]]:
+        """
+        Calculates the cosine similarity between several documents and every original.
+        :param term_counts: The term counts of every document.
+        :return: A tuple containing a (documents x originals) array of similarity percentages and the original
+        documents' paths, in sorted order.
+        """
+        scores = np.zeros((len(term_counts), len(self.__doc_ids)))
+        position = {path: i for i, path in enumerate(self.__doc_ids)}
+        with metrics.time("shard.score"):
+            for shard_scores, shard_ids in self.__gather("scores", term_counts, self.norms(term_counts)):
+                scores[:, [position[path] for path in shard_ids]] = shard_scores
+        return scores, self.__doc_ids
+
+    def top_k(self, term_counts: list[Counter], k: int) -> list[list[tuple[float, str]]]:
+        """
+        Finds the k most similar originals of several documents. Every shard only returns its own k best matches.
+        :param term_counts: The term counts of every document.
+        :param k: The number of matches to return per document.
+        :return: A list with the top k (similarity, path) tuples of every document, sorted by descending similarity.
+        """
+        with metrics.time("shard.top_k"):
+            parts = self.__gather("top_k", term_counts, self.norms(term_counts), k)
+        return [list(heapq.merge(*(part[i] for part in parts), key=lambda x: -x[0]))[:k]
+                for i in range(len(term_counts))]
+
+
+class ShardedCosineAlgorithm(BaseModel):
+    """
+    This class returns the cosine similarity of a ShardedIndex. Its scores are the same as CosineAlgorithm's with the
+    same vectorizer type. The shard workers are started on the first comparison and stopped by close().
+    """
+    cost = 1.0
+
+    def __init__(self, vec_type: str = "tfidf", n_shards: int = 2, addresses: list[tuple[str, int]] | None = None,
+                 authkey: bytes | None = None, n_features: int | None = None, compact: bool = False):
+        """
+        :param vec_type: The vectorizer type, "count" or "tfidf".
+        :param n_shards: The number of local worker processes, if no addresses are given.
+        :param addresses: The (host, port) addresses of remote workers started with src/wrapper/shard.py.
+        :param authkey: The key shared with the remote workers.
+        :param n_features: If given, the shards hash terms into this number of columns instead of storing a vocabulary.
+        :param compact: Whether the shards store float32 raw counts instead of the weighted matrix.
+        """
+        super().__init__()
+        self.__vec_type = vec_type
+        self.__index = ShardedIndex(vec_type, n_shards, n_features, compact)
+        self.__addresses = addresses
+        self.__authkey = authkey
+
+    @property
+    def index(self) -> ShardedIndex:
+        return self.__index
+
+    def prepare(self, f_dir: str | Path) -> None:
+        """
+        Starts the shard workers and fits them over a directory unless they are already fitted over it.
+        :param f_dir: The directory containing the original files.
+        """
+        if self.__index.source == Path(f_dir):
+            return
+        self.__index.start(self.__addresses, self.__authkey)
+        self.__index.fit(f_dir)
+
+    def close(self) -> None:
+        self.__index.close()
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        # A single pair doesn't need the shards
+        return CosineAlgorithm(self.__vec_type).compare_text(f_file_path, s_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        """
+        Compares all the files in a directory against a single file. With top_k, only the best matches of every shard
+        are sent back and merged.
+        :param f_dir: The directory containing the files to compare.
+        :param s_file_path: The file to compare against.
+        :param top_k: If given, only the top_k most similar files are returned, sorted by descending similarity.
+        :return: A list of tuples containing the cosine similarity and the path of every original.
+        """
+        if not Fm.validate_file(s_file_path, create=False):
+            raise ValueError("The provided path is not a file.")
+        self.prepare(f_dir)
+        term_counts = [Document(s_file_path).term_counts]
+        if top_k is not None:
+            return self.__index.top_k(term_counts, top_k)[0]
+        scores, doc_ids = self.__index.score_counts(term_counts)
+        return self.select_top_k(scores[0], doc_ids, None)
+
+    def score_files(self, f_dir: str | Path, s_files: list[Path]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares a batch of files against all the files in a directory.
+        :param f_dir: The directory containing the files to compare.
+        :param s_files: The files to compare against.
+        :return: A tuple containing a (files x originals) array of similarities and the original documents' paths.
+        """
+        return self.score_documents(f_dir, [Document(s_file) for s_file in s_files])
+
+    def score_documents(self, f_dir: str | Path, documents: list[Document]) -> tuple[np.ndarray, list[str]]:
+        """
+        Compares pre-analyzed documents against all the files in a directory, sending their term counts to every shard.
+        :param f_dir: The directory containing the files to compare.
+        :param documents: The documents to compare against.
+        :return: A tuple containing a (documents x originals) array of similarities and the original documents' paths.
+        """
+        self.prepare(f_dir)
+        return self.__index.score_counts([document.term_counts for document in documents])
@@ -0,0 +1,242 @@
+"""
+This module contains a benchmark harness that generates synthetic corpora with util.generator.Generator, runs the
+comparison models against them and reports timings, memory usage and accuracy in a machine-readable format.
+"""
+import contextlib
+import io
+import json
+import platform
+import resource
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.util.generator import Generator
+
+# Parameters that identify a scenario across reports
+SCENARIO_KEYS = ("n_originals", "n_suspicious", "doc_length", "plagiarism_rate", "vec_type", "workers", "seed")
+
+# Run by measure_startup() in a fresh interpreter, so the modules imported by the caller don't hide the import cost
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import ModelMediator
+imported = time.perf_counter()
+mediator = ModelMediator(CosineAlgorithm(sys.argv[3]))
+mediator.compare_files(sys.argv[1], [sys.argv[2]])
+scored = time.perf_counter()
+print(json.dumps({"import_seconds": imported - start, "first_score_seconds": scored - imported,
+                  "sklearn_loaded": any(name.split(".")[0] == "sklearn" for name in sys.modules)}))
+"""
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    """
+    Summarizes a list of measurements.
+    :param values: The measurements.
+    :return: A dictionary containing the mean, median, 90th and 99th percentiles and the maximum.
+    """
+    if not values:
+        return {"mean": 0.0, "p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"mean": float(np.mean(values)), "p50": float(p50), "p90": float(p90), "p99": float(p99),
+            "max": float(np.max(values))}
+
+
+def classification_metrics(predicted: dict[str, bool], expected: dict[str, bool]) -> dict[str, float]:
+    """
+    Compares predicted verdicts against a ground truth.
+    :param predicted: The predicted verdict of every file.
+    :param expected: The expected verdict of every file.
+    :return: A dictionary containing the accuracy, precision and recall of the predictions.
+    """
+    keys = [k for k in predicted if k in expected]
+    tp = sum(predicted[k] and expected[k] for k in keys)
+    fp = sum(predicted[k] and not expected[k] for k in keys)
+    fn = sum(not predicted[k] and expected[k] for k in keys)
+    correct = sum(predicted[k] == expected[k] for k in keys)
+    return {"accuracy": correct / len(keys) if keys else 0.0,
+            "precision": tp / (tp + fp) if tp + fp else 0.0,
+            "recall": tp / (tp + fn) if tp + fn else 0.0}
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident memory of the current process.
+    :return: The peak resident set size in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def _generate_corpus(corpus_dir: Path, n_originals: int, n_suspicious: int, doc_length: int, plagiarism_rate: float,
+                     seed: int) -> dict:
+    return Generator().generate_corpus(corpus_dir, n_originals, n_suspicious, doc_length, plagiarism_rate, seed=seed)
+
+
+def run_scenario(n_originals: int, n_suspicious: int, doc_length: int = 300, plagiarism_rate: float = 0.3,
+                 vec_type: str = "tfidf", threshold: float = 60.0, workers: int = 1, seed: int = 0,
+                 work_dir: str | Path | None = None) -> dict:
+    """
+    Generates a corpus and measures the cosine model and the mediator against it. The corpus is generated in a separate
+    process, so the generated documents don't count towards the peak memory.
+    :param n_originals: The number of original files.
+    :param n_suspicious: The number of suspicious files.
+    :param doc_length: The average number of words per file.
+    :param plagiarism_rate: The fraction of suspicious files that are plagiarized.
+    :param vec_type: The vectorizer used by the cosine model.
+    :param threshold: The similarity above which a file is considered plagiarized.
+    :param workers: The number of processes used by the mediator's batch comparison.
+    :param seed: The seed of the generated corpus.
+    :param work_dir: The directory where the corpus is generated. A temporary directory is used if not given.
+    :return: A dictionary containing the scenario's parameters and measurements. peak_rss_mb is the peak memory of
+    the process and rss_increase_mb its increase over the models' imports.
+    """
+    # Imported here so the memory used by the models is part of the scenario's process
+    from src.algorithms.cosine_algorithm import CosineAlgorithm
+    from src.algorithms.model import ModelMediator
+    from src.util.config import ConfigManager
+
+    corpus_dir = Path(work_dir) if work_dir is not None else Path(tempfile.mkdtemp())
+    try:
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            ground_truth = executor.submit(_generate_corpus, corpus_dir, n_originals, n_suspicious, doc_length,
+                                           plagiarism_rate, seed).result()
+        generate_seconds = time.perf_counter() - start
+        baseline_rss_mb = peak_rss_mb()
+        original_dir, suspicious_dir = corpus_dir / "original", corpus_dir / "suspicious"
+        s_files = sorted(suspicious_dir.iterdir())
+
+        model = CosineAlgorithm(vec_type)
+        start = time.perf_counter()
+        model.fit(original_dir)
+        fit_seconds = time.perf_counter() - start
+
+        latencies = []
+        for s_file in s_files:
+            start = time.perf_counter()
+            model.compare_texts(original_dir, s_file)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        config_path = corpus_dir / "config.json"
+        with open(config_path, "w") as f:
+            json.dump({"ORIGINAL_FILES": str(original_dir), "SUSPICIOUS_FILES": str(suspicious_dir),
+                       "GROUND_TRUTH": str(corpus_dir / "groundTruth.json")}, f)
+        mediator = ModelMediator(CosineAlgorithm(vec_type), config_mgr=ConfigManager(config_path),
+                                 threshold=threshold)
+        start = time.perf_counter()
+        results = mediator.compare_batch(original_dir, suspicious_dir, workers=workers)
+        batch_seconds = time.perf_counter() - start
+        predicted = {Path(path).stem: bool(matches and matches[0][0] > threshold) for path, matches in results.items()}
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            mediator.run_comparison(workers=workers)
+        run_comparison_seconds = time.perf_counter() - start
+
+        return {"n_originals": n_originals, "n_suspicious": n_suspicious, "doc_length": doc_length,
+                "plagiarism_rate": plagiarism_rate, "vec_type": vec_type, "threshold": threshold, "workers": workers,
+                "seed": seed, "generate_seconds": generate_seconds, "fit_seconds": fit_seconds,
+                "latency_ms": percentiles(latencies), "batch_seconds": batch_seconds,
+                "docs_per_second": n_suspicious / batch_seconds if batch_seconds else 0.0,
+                "run_comparison_seconds": run_comparison_seconds, "peak_rss_mb": peak_rss_mb(),
+                "rss_increase_mb": peak_rss_mb() - baseline_rss_mb,
+                **classification_metrics(predicted, ground_truth)}
+    finally:
+        if work_dir is None:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+
+def measure_startup(original_dir: str | Path, s_file: str | Path, vec_type: str = "tfidf") -> dict:
+    """
+    Measures how long a new process takes to import the models and score its first file, which is what short-lived
+    CLI and batch jobs pay on every run.
+    :param original_dir: The directory containing the original files.
+    :param s_file: The file to score.
+    :param vec_type: The vectorizer used by the cosine model.
+    :return: A dictionary containing the import, first score and whole process times in seconds, and whether
+    scikit-learn was imported.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).parents[2]), env.get("PYTHONPATH")]))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT, str(original_dir), str(s_file), vec_type],
+                            capture_output=True, text=True, env=env, check=True).stdout
+    process_seconds = time.perf_counter() - start
+    return {**json.loads(output.splitlines()[-1]), "process_seconds": process_seconds}
+
+
+def run_startup(n_originals: int = 200, doc_length: int = 300, vec_type: str = "tfidf", runs: int = 5, seed: int = 0,
+                work_dir: str | Path | None = None) -> dict:
+    """
+    Generates a corpus and measures the startup of several new processes against it.
+    :param n_originals: The number of original files.
+    :param doc_length: The average number of words per file.
+    :param vec_type: The vectorizer used by the cosine model.
+    :param runs: The number of processes to measure.
+    :param seed: The seed of the generated corpus.
+    :param work_dir: The directory where the corpus is generated. A temporary directory is used if not given.
+    :return: A dictionary containing the parameters, the percentiles of every measured time and whether any run
+    imported scikit-learn.
+    """
+    corpus_dir = Path(work_dir) if work_dir is not None else Path(tempfile.mkdtemp())
+    try:
+        Generator().generate_corpus(corpus_dir, n_originals, 1, doc_length, seed=seed)
+        s_file = next((corpus_dir / "suspicious").iterdir())
+        results = [measure_startup(corpus_dir / "original", s_file, vec_type) for _ in range(runs)]
+        return {"n_originals": n_originals, "doc_length": doc_length, "vec_type": vec_type, "runs": runs,
+                **{key: percentiles([r[key] for r in results])
+                   for key in ("import_seconds", "first_score_seconds", "process_seconds")},
+                "sklearn_loaded": any(r["sklearn_loaded"] for r in results)}
+    finally:
+        if work_dir is None:
+            shutil.rmtree(corpus_dir, ignore_errors=True)
+
+
+def run_benchmark(scenarios: list[dict], isolate: bool = True) -> dict:
+    """
+    Runs several scenarios. Each scenario runs in its own process by default so its peak memory isn't affected by the
+    previous ones.
+    :param scenarios: The keyword arguments of every call to run_scenario().
+    :param isolate: Whether to run every scenario in a separate process.
+    :return: A dictionary containing the environment and the results of every scenario.
+    """
+    results = []
+    for scenario in scenarios:
+        if isolate:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                results.append(executor.submit(run_scenario, **scenario).result())
+        else:
+            results.append(run_scenario(**scenario))
+    return {"version": 1, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "platform": platform.platform(), "scenarios": results}
+
+
+def compare_reports(baseline: dict, current: dict,
+                    metrics: tuple[str, ...] = ("fit_seconds", "batch_seconds", "peak_rss_mb", "accuracy")) -> list[dict]:
+    """
+    Matches the scenarios of two benchmark reports and calculates the relative change of their metrics.
+    :param baseline: The report to compare against.
+    :param current: The new report.
+    :param metrics: The metrics to compare.
+    :return: A list with the ratio current / baseline of every metric of every scenario found in both reports.
+    """
+    previous = {tuple(s[k] for k in SCENARIO_KEYS): s for s in baseline["scenarios"]}
+    changes = []
+    for scenario in current["scenarios"]:
+        old = previous.get(tuple(scenario[k] for k in SCENARIO_KEYS))
+        if old is None:
+            continue
+        ratios = {m: scenario[m] / old[m] if old[m] else None for m in metrics}
+        changes.append({"scenario": {k: scenario[k] for k in SCENARIO_KEYS}, "ratios": ratios})
+    return changes
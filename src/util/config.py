@@ -15,19 +15,19 @@ class ConfigManager:
             self.__initialize_env_vars(None)
 
     def __initialize_env_vars(self, json_path: str | None) -> None:
+        self.__env_vars = {
+            "PROJECT_ROOT": Path.cwd().parent.parent
+        }
+        # Add global environment variables
+        self.__env_vars.update({"SRC": self.__env_vars.get("PROJECT_ROOT") / "src"})
+        self.__env_vars.update({"UTIL": self.__env_vars.get("SRC") / "util"})
+        self.__env_vars.update({"RESOURCES": self.__env_vars.get("PROJECT_ROOT") / "resources"})
+        self.__env_vars.update({"ORIGINAL_FILES": self.__env_vars.get("RESOURCES") / "original"})
+        self.__env_vars.update({"SUSPICIOUS_FILES": self.__env_vars.get("RESOURCES") / "suspicious"})
+        self.__env_vars.update({"GROUND_TRUTH": self.__env_vars.get("RESOURCES") / "groundTruth.json"})
+        # Override the defaults with the values of the json file
         if json_path is not None:
             self.from_json(json_path)
-        else:
-            self.__env_vars = {
-                "PROJECT_ROOT": Path.cwd().parent.parent
-            }
-            # Add global environment variables
-            self.__env_vars.update({"SRC": self.__env_vars.get("PROJECT_ROOT") / "src"})
-            self.__env_vars.update({"UTIL": self.__env_vars.get("SRC") / "util"})
-            self.__env_vars.update({"RESOURCES": self.__env_vars.get("PROJECT_ROOT") / "resources"})
-            self.__env_vars.update({"ORIGINAL_FILES": self.__env_vars.get("RESOURCES") / "original"})
-            self.__env_vars.update({"SUSPICIOUS_FILES": self.__env_vars.get("RESOURCES") / "suspicious"})
-            self.__env_vars.update({"GROUND_TRUTH": self.__env_vars.get("RESOURCES") / "groundTruth.json"})
 
     def __update_attr(self, key: str, value: str | Path) -> None:
         self.__env_vars[key] = value
@@ -0,0 +1,151 @@
+"""
+This module contains an in-memory LRU cache of decoded documents keyed by their content hash, so documents that are
+compared repeatedly are only read from disk once.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable
+
+from src.util.metrics import metrics
+
+
+class CacheEntry:
+    def __init__(self, key: str, text: str, nbytes: int):
+        self.key = key
+        self.text = text
+        self.nbytes = nbytes
+        self.extras: dict[str, Any] = {}
+
+
+class FileCache:
+    """
+    This class caches the decoded text of files, and optionally derived data such as term counts, up to a total size in
+    bytes. Paths are mapped to content hashes using their size and modification time, so a file is read again as soon
+    as it changes on disk, and identical files share a single entry.
+    """
+    def __init__(self, max_bytes: int = 256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.__entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.__paths: dict[str, tuple[int, int, str]] = {}
+        self.__size = 0
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Returns the cache counters.
+        :return: A dictionary containing the hits, misses, evictions, entries and size in bytes of the cache.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self),
+                "bytes": self.__size}
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+            self.__paths.clear()
+            self.__size = 0
+
+    def __lookup(self, file_path: Path) -> CacheEntry | None:
+        stat = file_path.stat()
+        known = self.__paths.get(str(file_path))
+        if known is None or known[:2] != (stat.st_size, stat.st_mtime_ns):
+            self.__paths.pop(str(file_path), None)
+            return None
+        entry = self.__entries.get(known[2])
+        if entry is not None:
+            self.__entries.move_to_end(known[2])
+        return entry
+
+    def __load(self, file_path: Path) -> CacheEntry:
+        stat = file_path.stat()
+        with metrics.time("read"):
+            with open(file_path, "rb") as f:
+                content = f.read()
+        metrics.count("bytes_read", len(content))
+        key = hashlib.sha256(content).hexdigest()
+        self.__paths[str(file_path)] = (stat.st_size, stat.st_mtime_ns, key)
+        entry = self.__entries.get(key)
+        if entry is None:
+            # Same newline handling as reading the file in text mode
+            text = content.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+            entry = CacheEntry(key, text, sys.getsizeof(text))
+            self.__entries[key] = entry
+            self.__size += entry.nbytes
+            self.__evict()
+        else:
+            self.__entries.move_to_end(key)
+        return entry
+
+    def __evict(self) -> None:
+        while self.__size > self.max_bytes and len(self.__entries) > 1:
+            _, entry = self.__entries.popitem(last=False)
+            self.__size -= entry.nbytes
+            self.evictions += 1
+
+    def __entry(self, file_path: Path) -> CacheEntry:
+        entry = self.__lookup(file_path)
+        if entry is None:
+            self.misses += 1
+            metrics.count("cache_misses")
+            return self.__load(file_path)
+        self.hits += 1
+        metrics.count("cache_hits")
+        return entry
+
+    def read(self, file_path: str | Path) -> str:
+        """
+        Returns the decoded content of a file, reading it from disk only if it isn't cached or changed.
+        :param file_path: The file to read.
+        :return: The file's content.
+        """
+        with self.__lock:
+            return self.__entry(Path(file_path)).text
+
+    def derive(self, file_path: str | Path, kind: str, func: Callable[[str], Any]) -> Any:
+        """
+        Returns data derived from a file's content (e.g. its term counts), computing and caching it on first use.
+        :param file_path: The file to read.
+        :param kind: The name of the derived data. Different kinds of data are cached separately.
+        :param func: The function that derives the data from the file's text.
+        :return: The derived data.
+        """
+        with self.__lock:
+            entry = self.__entry(Path(file_path))
+            if kind in entry.extras:
+                return entry.extras[kind]
+            text = entry.text
+        value = func(text)
+        with self.__lock:
+            if kind not in entry.extras:
+                entry.extras[kind] = value
+                nbytes = self.estimate_size(value)
+                entry.nbytes += nbytes
+                if self.__entries.get(entry.key) is entry:
+                    self.__size += nbytes
+                    self.__evict()
+        return value
+
+    @staticmethod
+    def estimate_size(value: Any) -> int:
+        """
+        Estimates the memory used by a cached value.
+        :param value: The value to measure.
+        :return: The approximate size in bytes.
+        """
+        if hasattr(value, "nbytes"):
+            return int(value.nbytes)
+        if isinstance(value, dict):
+            return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+        return sys.getsizeof(value)
@@ -5,7 +5,10 @@ Authors: Youthan Irigoyen, Eduardo Rodríguez
 Creation date: 04-20-2023
 """
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterator
+
+from src.util.file_cache import FileCache
+from src.util.metrics import metrics
 
 
 class UnitaryFile:
@@ -35,6 +38,22 @@ class UnitaryFile:
 
 
 class FileManager:
+    cache: FileCache | None = None
+
+    @staticmethod
+    def enable_cache(max_bytes: int = 256 * 2 ** 20) -> FileCache:
+        """
+        Makes read_file() and read_derived() go through an in-memory cache of decoded files.
+        :param max_bytes: The maximum size of the cache in bytes.
+        :return: The new cache.
+        """
+        FileManager.cache = FileCache(max_bytes)
+        return FileManager.cache
+
+    @staticmethod
+    def disable_cache() -> None:
+        FileManager.cache = None
+
     @staticmethod
     def validate_file(file_path: Any, create: bool = True) -> bool | None:
         curr_file = UnitaryFile(file_path)
@@ -48,10 +67,56 @@ class FileManager:
 
     @staticmethod
     def read_file(file_path: Path) -> str:
-        with open(file_path, 'r', encoding="utf-8") as file:
-            file_contents = file.read()
+        if FileManager.cache is not None:
+            return FileManager.cache.read(file_path)
+        with metrics.time("read"):
+            with open(file_path, 'r', encoding="utf-8") as file:
+                file_contents = file.read()
+        if metrics.enabled:
+            metrics.count("bytes_read", Path(file_path).stat().st_size)
         return file_contents
 
+    @staticmethod
+    def read_chunks(file_path: Path, chunk_size: int = 2 ** 20) -> Iterator[str]:
+        """
+        Reads a file in chunks of bounded size. Chunks end at a whitespace character, so no word is split between two
+        chunks unless it is longer than chunk_size.
+        :param file_path: The file to read.
+        :param chunk_size: The number of characters read at a time.
+        :return: A generator of the file's chunks.
+        """
+        tail = ""
+        with open(file_path, 'r', encoding="utf-8") as file:
+            while chunk := file.read(chunk_size):
+                chunk = tail + chunk
+                cut = len(chunk)
+                while cut > 0 and not chunk[cut - 1].isspace():
+                    cut -= 1
+                if cut == 0:
+                    if len(chunk) < 2 * chunk_size:
+                        # Keep reading until the word ends
+                        tail = chunk
+                        continue
+                    cut = len(chunk)
+                tail = chunk[cut:]
+                yield chunk[:cut]
+        if tail:
+            yield tail
+        metrics.count("bytes_read", Path(file_path).stat().st_size)
+
+    @staticmethod
+    def read_derived(file_path: Path, kind: str, func: Callable[[str], Any]) -> Any:
+        """
+        Returns data derived from a file's content, cached alongside the file's text when the cache is enabled.
+        :param file_path: The file to read.
+        :param kind: The name of the derived data.
+        :param func: The function that derives the data from the file's text.
+        :return: The derived data.
+        """
+        if FileManager.cache is not None:
+            return FileManager.cache.derive(file_path, kind, func)
+        return func(FileManager.read_file(file_path))
+
     @staticmethod
     def create_corpus(*args: Path) -> list[str]:
         corpus = []
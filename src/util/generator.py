@@ -4,6 +4,8 @@ This module contains a set of classes that generate different useful data types
 Author: Youthan Irigoyen
 Creation date: 04-20-2023
 """
+import json
+import random
 import secrets
 import string
 
@@ -47,3 +49,81 @@ class Generator:
             curr_file = Path.joinpath(parent_directory, curr_filename)
             with open(curr_file, "w") as file:
                 file.write(self.random_string())
+
+    @staticmethod
+    def random_vocabulary(size: int, rng: random.Random) -> list[str]:
+        """
+        Generates a list of distinct random lowercase words.
+        :param size: The number of words to generate.
+        :param rng: The random number generator to use.
+        :return: A list of size words.
+        """
+        words = set()
+        while len(words) < size:
+            words.add(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 10))))
+        return sorted(words)
+
+    @staticmethod
+    def random_text(n_words: int, vocabulary: list[str], cum_weights: list[float], rng: random.Random) -> list[str]:
+        """
+        Generates a random sequence of words drawn from a vocabulary.
+        :param n_words: The number of words to generate.
+        :param vocabulary: The words to draw from.
+        :param cum_weights: The cumulative weights of the words in the vocabulary.
+        :param rng: The random number generator to use.
+        :return: A list of n_words words.
+        """
+        return rng.choices(vocabulary, cum_weights=cum_weights, k=n_words)
+
+    def generate_corpus(self, parent_directory: str | Path, n_originals: int, n_suspicious: int, doc_length: int = 300,
+                        plagiarism_rate: float = 0.3, copy_ratio: float = 0.8, vocabulary_size: int = 20000,
+                        seed: int = 0) -> dict[str, bool]:
+        """
+        Generates a reproducible corpus with the same layout as the resources directory: an "original" directory, a
+        "suspicious" directory and a groundTruth.json file. Word frequencies follow Zipf's law. A plagiarized file
+        copies copy_ratio of the words of a random original and replaces the others with random words.
+        :param parent_directory: The directory where the corpus will be created.
+        :param n_originals: The number of original files.
+        :param n_suspicious: The number of suspicious files.
+        :param doc_length: The average number of words per file. Lengths vary between half and one and a half times it.
+        :param plagiarism_rate: The fraction of suspicious files that are plagiarized.
+        :param copy_ratio: The fraction of words a plagiarized file keeps from its original.
+        :param vocabulary_size: The number of distinct words in the corpus.
+        :param seed: The seed of the random number generator.
+        :return: The ground truth, mapping every suspicious file's name to whether it is plagiarized.
+        """
+        parent_directory = Path(parent_directory)
+        if not parent_directory.is_dir():
+            raise ValueError('Path is not a directory')
+        rng = random.Random(seed)
+        vocabulary = self.random_vocabulary(vocabulary_size, rng)
+        rng.shuffle(vocabulary)
+        cum_weights, total = [], 0.0
+        for rank in range(1, vocabulary_size + 1):
+            total += 1 / rank
+            cum_weights.append(total)
+        original_dir, suspicious_dir = parent_directory / "original", parent_directory / "suspicious"
+        fm.validate_file(original_dir)
+        fm.validate_file(suspicious_dir)
+        originals = []
+        for i in range(n_originals):
+            words = self.random_text(rng.randint(doc_length // 2, doc_length * 3 // 2), vocabulary, cum_weights, rng)
+            originals.append(words)
+            (original_dir / f"org-{i:06d}.txt").write_text(" ".join(words), encoding="utf-8")
+        ground_truth = {}
+        for i in range(n_suspicious):
+            name = f"FID-{i:06d}"
+            plagiarized = n_originals > 0 and rng.random() < plagiarism_rate
+            if plagiarized:
+                words = list(rng.choice(originals))
+                for j in range(len(words)):
+                    if rng.random() >= copy_ratio:
+                        words[j] = self.random_text(1, vocabulary, cum_weights, rng)[0]
+            else:
+                words = self.random_text(rng.randint(doc_length // 2, doc_length * 3 // 2), vocabulary, cum_weights,
+                                         rng)
+            ground_truth[name] = plagiarized
+            (suspicious_dir / f"{name}.txt").write_text(" ".join(words), encoding="utf-8")
+        with open(parent_directory / "groundTruth.json", "w") as f:
+            json.dump(ground_truth, f, indent=2)
+        return ground_truth
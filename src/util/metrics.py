@@ -0,0 +1,150 @@
+"""
+This module contains a lightweight registry of stage timings and counters. It is disabled by default: timing a stage
+then returns a shared no-op context manager and counting does nothing, so instrumented code runs at full speed.
+"""
+import contextlib
+import json
+import math
+import threading
+import time
+from pathlib import Path
+
+# Upper bound of the first histogram bucket; every following bucket doubles it
+_FIRST_BUCKET = 1e-6
+_N_BUCKETS = 40
+_DISABLED = contextlib.nullcontext()
+
+
+class StageTimer:
+    def __init__(self, metrics: "Metrics", stage: str):
+        self.__metrics = metrics
+        self.__stage = stage
+        self.__start = 0.0
+
+    def __enter__(self) -> "StageTimer":
+        self.__start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.__metrics.record(self.__stage, time.perf_counter() - self.__start)
+
+
+class Histogram:
+    """
+    This class accumulates durations in logarithmic buckets, so its size doesn't depend on the number of measurements.
+    """
+    def __init__(self):
+        self.buckets = [0] * _N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        index = 0 if seconds <= _FIRST_BUCKET else min(math.ceil(math.log2(seconds / _FIRST_BUCKET)), _N_BUCKETS - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimates a percentile as the upper bound of the bucket that contains it.
+        :param q: The percentile, between 0 and 100.
+        :return: The estimated duration in seconds.
+        """
+        target, seen = q / 100 * self.count, 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min(_FIRST_BUCKET * 2 ** index, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {"count": self.count, "total_seconds": self.total,
+                "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+                "p50_ms": self.percentile(50) * 1000, "p90_ms": self.percentile(90) * 1000,
+                "p99_ms": self.percentile(99) * 1000, "max_ms": self.max * 1000,
+                "histogram_ms": {f"{_FIRST_BUCKET * 2 ** i * 1000:g}": c for i, c in enumerate(self.buckets) if c}}
+
+
+class Metrics:
+    """
+    This class collects per-stage duration histograms and counters (documents, bytes read, ...) of the current process.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.__stages: dict[str, Histogram] = {}
+        self.__counters: dict[str, float] = {}
+        self.__start = time.perf_counter()
+        self.__lock = threading.Lock()
+
+    def enable(self) -> None:
+        self.reset()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.__lock:
+            self.__stages = {}
+            self.__counters = {}
+            self.__start = time.perf_counter()
+
+    def time(self, stage: str) -> contextlib.AbstractContextManager:
+        """
+        Measures the duration of a block of code.
+        :param stage: The name of the stage being measured.
+        :return: A context manager that records the duration of its block when metrics are enabled.
+        """
+        if not self.enabled:
+            return _DISABLED
+        return StageTimer(self, stage)
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self.__lock:
+            histogram = self.__stages.get(stage)
+            if histogram is None:
+                histogram = self.__stages[stage] = Histogram()
+            histogram.add(seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        """
+        Increases a counter when metrics are enabled.
+        :param name: The name of the counter.
+        :param value: The amount to add.
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__counters[name] = self.__counters.get(name, 0) + value
+
+    def summary(self) -> dict:
+        """
+        Summarizes the collected metrics.
+        :return: A dictionary containing the elapsed time, the summary of every stage, the counters and the number of
+        documents processed per second.
+        """
+        with self.__lock:
+            elapsed = time.perf_counter() - self.__start
+            counters = dict(self.__counters)
+            stages = {name: histogram.summary() for name, histogram in self.__stages.items()}
+        return {"wall_seconds": elapsed, "stages": stages, "counters": counters,
+                "documents_per_second": counters.get("documents", 0) / elapsed if elapsed else 0.0}
+
+    def dump(self, json_path: str | Path, extra: dict | None = None) -> dict:
+        """
+        Writes the summary of the collected metrics to a JSON file.
+        :param json_path: The file to write.
+        :param extra: Additional entries to include in the summary.
+        :return: The written summary.
+        """
+        summary = self.summary()
+        summary.update(extra or {})
+        with open(json_path, "w") as f:
+            json.dump(summary, f, indent=2)
+        return summary
+
+
+# Metrics shared by the models, the mediator and the file manager
+metrics = Metrics()
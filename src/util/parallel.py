@@ -0,0 +1,69 @@
+"""
+This module contains helpers to shard work across a pool of processes. The object the work is run against (a fitted
+model, index or mediator) is sent to every worker once when the pool starts instead of once per task.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from math import ceil
+from typing import Any, Callable, Iterator
+
+_target = None
+
+
+def _initialize_worker(target: Any) -> None:
+    global _target
+    _target = target
+
+
+def _run_shard(func: Callable[[Any, list], Any], shard: list) -> Any:
+    return func(_target, shard)
+
+
+def split(items: list, n_shards: int) -> list[list]:
+    """
+    Splits a list into at most n_shards contiguous shards of similar size.
+    :param items: The items to split.
+    :param n_shards: The maximum number of shards.
+    :return: A list of shards that, concatenated, give back the original list.
+    """
+    if not items:
+        return []
+    size = ceil(len(items) / max(n_shards, 1))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def map_shards(func: Callable[[Any, list], Any], target: Any, shards: list[list], workers: int = 1) -> list:
+    """
+    Applies func(target, shard) to every shard, using a process pool when more than one worker is requested.
+    :param func: A module-level (picklable) function receiving the target and a shard.
+    :param target: The object shared by every task. It is pickled once per worker.
+    :param shards: The shards to process.
+    :param workers: The number of processes to use. With 1 or fewer, shards are processed in the current process.
+    :return: The results of every shard, in the same order as the shards.
+    """
+    return list(imap_shards(func, target, shards, workers))
+
+
+def imap_shards(func: Callable[[Any, list], Any], target: Any, shards: list[list], workers: int = 1) -> Iterator:
+    """
+    Same as map_shards(), yielding the result of every shard as soon as it and the previous ones are done so they can
+    be consumed while the next shards are processed.
+    :param func: A module-level (picklable) function receiving the target and a shard.
+    :param target: The object shared by every task. It is pickled once per worker.
+    :param shards: The shards to process.
+    :param workers: The number of processes to use. With 1 or fewer, shards are processed in the current process.
+    :return: An iterator over the results of every shard, in the same order as the shards.
+    """
+    if workers <= 1 or len(shards) <= 1:
+        for shard in shards:
+            yield func(target, shard)
+        return
+    executor = ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_initialize_worker,
+                                   initargs=(target,))
+    try:
+        yield from executor.map(partial(_run_shard, func), shards)
+    except BaseException:
+        # The consumer stopped or a shard failed: the shards not started yet are dropped instead of waited for
+        executor.shutdown(cancel_futures=True)
+        raise
+    executor.shutdown()
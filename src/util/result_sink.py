@@ -0,0 +1,302 @@
+"""
+This module contains the destinations comparison results are written to. Results arrive in batches, one per block of
+suspicious files, and every batch is written with a single bulk write as soon as it is complete, so a run that stops
+halfway keeps every batch written before the last one.
+
+A batch is expanded into one row per match, with the columns file, rank, original, score and plagiarized. Paths are
+encoded once per file and once per original instead of once per row.
+"""
+import json
+import os
+import sys
+import zipfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, TextIO
+
+import numpy as np
+
+from src.util.file_manager import FileManager as Fm
+
+
+class ResultBatch:
+    """
+    This class holds the top matches of a block of suspicious files, as returned by ModelMediator.compare_blocks().
+    """
+    def __init__(self, files: list[str | Path], matches: np.ndarray, doc_ids: list[str], threshold: float):
+        """
+        :param files: The suspicious files' paths.
+        :param matches: A (files x top_k) array of MATCH_DTYPE records sorted by descending similarity.
+        :param doc_ids: The original documents' paths the doc field of matches refers to.
+        :param threshold: The similarity above which a file is considered plagiarized.
+        """
+        self.files = [str(f) for f in files]
+        self.matches = matches
+        self.doc_ids = doc_ids
+        self.threshold = threshold
+
+    def __len__(self) -> int:
+        return self.matches.size
+
+    def columns(self, files: np.ndarray, originals: np.ndarray) -> dict[str, np.ndarray]:
+        """
+        Expands the batch into columns with one row per match.
+        :param files: The value written for every suspicious file, in the order of files.
+        :param originals: The value written for every original document, in the order of doc_ids.
+        :return: A dictionary mapping every column's name to its values.
+        """
+        n_files, k = self.matches.shape
+        scores = self.matches["score"].ravel()
+        return {"file": np.repeat(files, k), "rank": np.tile(np.arange(1, k + 1, dtype=np.int32), n_files),
+                "original": originals[self.matches["doc"].ravel()], "score": scores,
+                "plagiarized": scores > self.threshold}
+
+
+class ResultSink(ABC):
+    """
+    This class writes batches of comparison results to a destination. Subclasses choose how paths are encoded and how a
+    batch's columns are written.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.__originals: tuple[list[str], np.ndarray] | None = None
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def encode(self, value: str) -> str:
+        """
+        :param value: A file's path.
+        :return: The path as written by this sink.
+        """
+        return value
+
+    def write(self, batch: ResultBatch) -> None:
+        """
+        Writes every match of a batch.
+        :param batch: The results of a block of suspicious files.
+        """
+        # Consecutive batches share the same originals, so they are only encoded once. Blocks scored in other
+        # processes come with their own copy of the list, so it is compared by value
+        if self.__originals is None or (self.__originals[0] is not batch.doc_ids
+                                        and self.__originals[0] != batch.doc_ids):
+            self.__originals = (batch.doc_ids, self.__encode_all(batch.doc_ids))
+        self.write_columns(batch.columns(self.__encode_all(batch.files), self.__originals[1]), batch)
+        self.rows += len(batch)
+        self.batches += 1
+
+    def __encode_all(self, values: list[str]) -> np.ndarray:
+        encoded = np.empty(len(values), dtype=object)
+        encoded[:] = [self.encode(value) for value in values]
+        return encoded
+
+    @abstractmethod
+    def write_columns(self, columns: dict[str, np.ndarray], batch: ResultBatch) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TextSink(ResultSink, ABC):
+    """
+    This class writes every batch to a text file as a single string and flushes it.
+    """
+    def __init__(self, path: str | Path, header: str = ""):
+        """
+        :param path: The file the results are written to. It is overwritten.
+        :param header: Text written at the beginning of the file.
+        """
+        super().__init__()
+        self.path = Path(path)
+        self.__file = open(self.path, "w", encoding="utf-8", newline="")
+        if header:
+            self.__file.write(header)
+
+    def write_columns(self, columns: dict[str, np.ndarray], batch: ResultBatch) -> None:
+        self.__file.write(self.format(columns))
+        self.__file.flush()
+
+    @abstractmethod
+    def format(self, columns: dict[str, np.ndarray]) -> str:
+        pass
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class JsonLinesSink(TextSink):
+    """
+    This class writes one JSON object per match.
+    """
+    def encode(self, value: str) -> str:
+        return json.dumps(value)
+
+    def format(self, columns: dict[str, np.ndarray]) -> str:
+        plagiarized = np.where(columns["plagiarized"], "true", "false")
+        return "".join([f'{{"file": {f}, "rank": {r}, "original": {o}, "score": {s:f}, "plagiarized": {p}}}\n'
+                        for f, r, o, s, p in zip(columns["file"].tolist(), columns["rank"].tolist(),
+                                                 columns["original"].tolist(), columns["score"].tolist(),
+                                                 plagiarized.tolist())])
+
+
+class CsvSink(TextSink):
+    """
+    This class writes one comma separated row per match, after a header with the column names.
+    """
+    def __init__(self, path: str | Path):
+        super().__init__(path, "file,rank,original,score,plagiarized\r\n")
+
+    def encode(self, value: str) -> str:
+        # Quoted as the csv module does
+        if any(c in value for c in ',"\r\n'):
+            return '"' + value.replace('"', '""') + '"'
+        return value
+
+    def format(self, columns: dict[str, np.ndarray]) -> str:
+        plagiarized = np.where(columns["plagiarized"], "true", "false")
+        return "".join([f"{f},{r},{o},{s:f},{p}\r\n"
+                        for f, r, o, s, p in zip(columns["file"].tolist(), columns["rank"].tolist(),
+                                                 columns["original"].tolist(), columns["score"].tolist(),
+                                                 plagiarized.tolist())])
+
+
+class ArrowSink(ResultSink):
+    """
+    This class writes every batch as a record batch of an Arrow IPC stream, which can be read up to the last complete
+    batch even if the run stops. Requires pyarrow.
+    """
+    def __init__(self, path: str | Path):
+        """
+        :param path: The file the results are written to. It is overwritten.
+        """
+        super().__init__()
+        try:
+            import pyarrow.ipc
+        except ImportError as e:
+            raise ImportError("pyarrow is required to write Arrow files.") from e
+        self.__pa = pyarrow
+        self.path = Path(path)
+        self.__file = pyarrow.OSFile(str(self.path), "wb")
+        self.__schema = pyarrow.schema([("file", pyarrow.string()), ("rank", pyarrow.int32()),
+                                        ("original", pyarrow.string()), ("score", pyarrow.float32()),
+                                        ("plagiarized", pyarrow.bool_())])
+        self.__writer = pyarrow.ipc.new_stream(self.__file, self.__schema)
+
+    def write_columns(self, columns: dict[str, np.ndarray], batch: ResultBatch) -> None:
+        record_batch = self.__pa.record_batch([self.__pa.array(columns[field.name], field.type)
+                                               for field in self.__schema], schema=self.__schema)
+        self.__writer.write_batch(record_batch)
+        self.__file.flush()
+
+    def close(self) -> None:
+        self.__writer.close()
+        self.__file.close()
+
+
+class NumpySink(ResultSink):
+    """
+    This class writes every batch as a separate .npz file of columns in a directory. Every file is written under a
+    temporary name and renamed once complete.
+    """
+    def __init__(self, path: str | Path):
+        """
+        :param path: The directory the batches are written to. It is created if it doesn't exist, and the batches of
+        a previous run are removed from it.
+        """
+        super().__init__()
+        self.path = Path(path)
+        if self.path.exists() and not self.path.is_dir():
+            raise ValueError("The provided path is not a directory.")
+        self.path.mkdir(parents=True, exist_ok=True)
+        for part in [*self.path.glob("part-*.npz"), *self.path.glob("part-*.tmp")]:
+            part.unlink()
+
+    def write_columns(self, columns: dict[str, np.ndarray], batch: ResultBatch) -> None:
+        part = self.path / f"part-{self.batches:05d}.npz"
+        temporary = part.with_suffix(".tmp")
+        # Written as np.savez() does, which can't take a column called file
+        with zipfile.ZipFile(temporary, "w") as archive:
+            for name, values in columns.items():
+                with archive.open(f"{name}.npy", "w", force_zip64=True) as f:
+                    np.lib.format.write_array(f, values.astype(str) if values.dtype == object else values)
+        os.replace(temporary, part)
+
+    @staticmethod
+    def read(path: str | Path) -> dict[str, np.ndarray]:
+        """
+        Reads the batches written to a directory.
+        :param path: The directory the batches were written to.
+        :return: A dictionary mapping every column's name to the values of all the batches.
+        """
+        if not Path(path).is_dir():
+            raise ValueError("The provided path is not a directory.")
+        parts = []
+        for part in sorted(Path(path).glob("part-*.npz")):
+            with np.load(part) as data:
+                parts.append({name: data[name] for name in data.files})
+        if not parts:
+            return {}
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+class ConsoleSink(ResultSink):
+    """
+    This class writes a readable report of every file's matches, optionally next to the expected result.
+    """
+    def __init__(self, stream: TextIO | None = None, ground_truth: dict | None = None):
+        """
+        :param stream: The stream the report is written to. Defaults to the standard output.
+        :param ground_truth: If given, the expected result of every file, by file name, is shown after its matches.
+        """
+        super().__init__()
+        self.stream = stream
+        self.ground_truth = ground_truth
+
+    def write_columns(self, columns: dict[str, np.ndarray], batch: ResultBatch) -> None:
+        lines = []
+        k = batch.matches.shape[1]
+        for i, f in enumerate(batch.files):
+            if k == 0:
+                continue
+            file_stem = Fm.extract_file_name(f)
+            rows = slice(i * k, (i + 1) * k)
+            scores, originals = columns["score"][rows].tolist(), columns["original"][rows].tolist()
+            lines.append(f"{file_stem}".center(20, '-'))
+            lines.append(f"Results: {bool(columns['plagiarized'][i * k])} ({scores[0]:2f}% similarity with "
+                         f"{originals[0]})")
+            lines.extend(f"Also similar: {score:2f}% similarity with {path}"
+                         for score, path in zip(scores[1:], originals[1:]))
+            if self.ground_truth is not None:
+                if file_stem in self.ground_truth.keys():
+                    lines.append(f"Expected result: {self.ground_truth.get(file_stem)}")
+                else:
+                    lines.append(f"No ground truth found for file {file_stem}")
+        if lines:
+            stream = self.stream if self.stream is not None else sys.stdout
+            stream.write("\n".join(lines) + "\n")
+            stream.flush()
+
+
+# Sinks by format name, also the extension they are chosen by in open_sink()
+SINKS: dict[str, Callable[[str | Path], ResultSink]] = {"jsonl": JsonLinesSink, "csv": CsvSink, "arrow": ArrowSink,
+                                                        "npz": NumpySink}
+
+
+def open_sink(path: str | Path, output_format: str | None = None) -> ResultSink:
+    """
+    Opens a sink writing to a path.
+    :param path: The file or directory the results are written to.
+    :param output_format: One of "jsonl", "csv", "arrow" or "npz". Chosen by the path's extension if not given, and a
+    path without extension is written as a directory of .npz files.
+    :return: The opened sink.
+    """
+    if output_format is None:
+        output_format = Path(path).suffix.lstrip(".").lower() or "npz"
+    if output_format not in SINKS:
+        raise ValueError(f"Unknown output format {output_format}.")
+    return SINKS[output_format](path)
@@ -0,0 +1,140 @@
+"""
+This module contains text helpers shared by the models that work on word sequences instead of term counts.
+"""
+import hashlib
+import re
+import zlib
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.util.file_manager import FileManager as Fm
+from src.util.metrics import metrics
+
+# Same words as the default token pattern of the scikit-learn vectorizers
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Splits a text into lowercase words.
+    :param text: The text to split.
+    :return: The text's words, in order.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def tokenize_spans(text: str) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Splits a text into lowercase words and keeps the character offsets of every word.
+    :param text: The text to split.
+    :return: A tuple containing the words, their start offsets and their end offsets.
+    """
+    matches = list(TOKEN_PATTERN.finditer(text))
+    words = [m.group().lower() for m in matches]
+    starts = np.fromiter((m.start() for m in matches), dtype=np.int64, count=len(matches))
+    ends = np.fromiter((m.end() for m in matches), dtype=np.int64, count=len(matches))
+    return words, starts, ends
+
+
+def hash_ngrams(words: list[str], n: int) -> np.ndarray:
+    """
+    Hashes every sequence of n consecutive words.
+    :param words: The words to combine.
+    :param n: The number of words per n-gram.
+    :return: An array with the 32-bit hash of the n-gram starting at every position.
+    """
+    count = max(len(words) - n + 1, 0)
+    return np.fromiter((zlib.crc32(" ".join(words[i:i + n]).encode("utf-8")) for i in range(count)),
+                       dtype=np.uint32, count=count)
+
+
+def text_digest(words: list[str]) -> bytes:
+    """
+    Hashes the normalized form of a text, so copies that only differ in case, whitespace or punctuation get the same
+    digest.
+    :param words: The text's words, as returned by tokenize().
+    :return: A 16-byte digest of the words.
+    """
+    return hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+
+
+def winnow(hashes: np.ndarray, window: int) -> np.ndarray:
+    """
+    Selects the winnowing fingerprints of a sequence of hashes: the minimum hash of every window of consecutive
+    hashes. Any shared run of at least window + n - 1 words, where n is the size of the hashed n-grams, shares at least
+    one fingerprint.
+    :param hashes: The n-gram hashes of a text, in order (see hash_ngrams()).
+    :param window: The number of consecutive hashes per window.
+    :return: The sorted distinct fingerprints.
+    """
+    if len(hashes) == 0:
+        return np.zeros(0, dtype=hashes.dtype)
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, min(window, len(hashes)))
+    return np.unique(windows.min(axis=1))
+
+
+class Document:
+    """
+    This class holds the analysis of a document shared by every model: its text, its words (with their character
+    offsets) and its term counts. Every part is computed the first time a model asks for it and kept, so the models of
+    an ensemble read and tokenize each document only once.
+    """
+    def __init__(self, path: str | Path | None = None, text: str | None = None):
+        """
+        :param path: The document's file. The file is read on first use.
+        :param text: The document's text, if it isn't read from a file.
+        """
+        if path is None and text is None:
+            raise ValueError("A document needs a path or a text.")
+        self.path = Path(path) if path is not None else None
+        self.__text = text
+        self.__words: list[str] | None = None
+        self.__spans: tuple[np.ndarray, np.ndarray] | None = None
+        self.__term_counts: Counter | None = None
+
+    @property
+    def size(self) -> int:
+        """
+        :return: The size of the document in bytes, without reading its file.
+        """
+        if self.__text is None:
+            return self.path.stat().st_size
+        return len(self.__text.encode("utf-8"))
+
+    @property
+    def text(self) -> str:
+        if self.__text is None:
+            self.__text = Fm.read_file(self.path)
+        return self.__text
+
+    @property
+    def words(self) -> list[str]:
+        """
+        :return: The document's lowercase words, in order (see tokenize()).
+        """
+        if self.__words is None:
+            with metrics.time("tokenize"):
+                self.__words = tokenize(self.text)
+        return self.__words
+
+    @property
+    def spans(self) -> tuple[list[str], np.ndarray, np.ndarray]:
+        """
+        :return: A tuple containing the document's words, their start offsets and their end offsets (see
+        tokenize_spans()).
+        """
+        if self.__spans is None:
+            with metrics.time("tokenize"):
+                self.__words, *self.__spans = tokenize_spans(self.text)
+        return self.__words, *self.__spans
+
+    @property
+    def term_counts(self) -> Counter:
+        """
+        :return: The number of occurrences of every word of the document.
+        """
+        if self.__term_counts is None:
+            self.__term_counts = Counter(self.words)
+        return self.__term_counts
@@ -0,0 +1,52 @@
+import argparse
+import itertools
+import json
+import sys
+
+from src.util.benchmark import compare_reports, run_benchmark, run_startup
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks the comparison models against generated corpora.")
+    parser.add_argument("--originals", type=int, nargs="+", default=[1000], help="Numbers of original files.")
+    parser.add_argument("--suspicious", type=int, default=200, help="Number of suspicious files.")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[300], help="Average numbers of words per file.")
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.3], help="Plagiarism rates.")
+    parser.add_argument("--vec-type", default="tfidf", choices=["count", "tfidf"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="File where the results are written.")
+    parser.add_argument("--baseline", help="Previous results to compare against.")
+    parser.add_argument("--startup", action="store_true",
+                        help="Measure the import and first score time of new processes instead.")
+    parser.add_argument("--startup-budget", type=float,
+                        help="Exit with an error if the median startup time exceeds this number of seconds.")
+    args = parser.parse_args()
+    # Measure startup
+    if args.startup:
+        startup = run_startup(args.originals[0], args.lengths[0], args.vec_type, seed=args.seed)
+        with open(args.output, "w") as f:
+            json.dump({"startup": startup}, f, indent=2)
+        print(f"import {startup['import_seconds']['p50']:.3f}s, first score {startup['first_score_seconds']['p50']:.3f}s, "
+              f"process {startup['process_seconds']['p50']:.3f}s, scikit-learn loaded: {startup['sklearn_loaded']}")
+        if args.startup_budget is not None and startup["process_seconds"]["p50"] > args.startup_budget:
+            print(f"Startup exceeds the budget of {args.startup_budget:.3f}s.")
+            sys.exit(1)
+        sys.exit(0)
+    # Run benchmarks
+    scenarios = [{"n_originals": n, "n_suspicious": args.suspicious, "doc_length": length, "plagiarism_rate": rate,
+                  "vec_type": args.vec_type, "workers": args.workers, "seed": args.seed}
+                 for n, length, rate in itertools.product(args.originals, args.lengths, args.rates)]
+    report = run_benchmark(scenarios)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for s in report["scenarios"]:
+        print(f"{s['n_originals']} originals, {s['doc_length']} words, {s['plagiarism_rate']:.0%} plagiarism: "
+              f"fit {s['fit_seconds']:.2f}s, p50 {s['latency_ms']['p50']:.2f}ms, p99 {s['latency_ms']['p99']:.2f}ms, "
+              f"{s['docs_per_second']:.1f} docs/s, {s['peak_rss_mb']:.1f} MiB, accuracy {s['accuracy']:.2%}")
+    # Compare against a previous run
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            for change in compare_reports(json.load(f), report):
+                ratios = ", ".join(f"{k} x{v:.2f}" for k, v in change["ratios"].items() if v is not None)
+                print(f"{change['scenario']['n_originals']} originals: {ratios}")
@@ -0,0 +1,27 @@
+import argparse
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import ModelMediator
+from src.util.ioutils import load_from_json_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Finds the threshold and model weights that best fit a ground truth.")
+    parser.add_argument("--originals", help="Directory containing the original files. Read from the config if omitted.")
+    parser.add_argument("--suspicious", help="Directory containing the files to analyze. Read from the config if omitted.")
+    parser.add_argument("--ground-truth", help="JSON file with the expected results. Read from the config if omitted.")
+    parser.add_argument("--vec-types", nargs="+", default=["count", "tfidf"], choices=["count", "tfidf"])
+    parser.add_argument("--weight-steps", type=int, default=10,
+                        help="Number of increments each model weight is divided in.")
+    args = parser.parse_args()
+    mediator = ModelMediator(*(CosineAlgorithm(vec_type=vec_type) for vec_type in args.vec_types))
+    ground_truth = load_from_json_file(args.ground_truth) if args.ground_truth else None
+    # Score once, evaluate every threshold and weight combination
+    result = mediator.calibrate(args.originals, args.suspicious, ground_truth,
+                                args.weight_steps if len(args.vec_types) > 1 else None)
+    for vec_type, model in zip(args.vec_types, result["models"]):
+        print(f"{vec_type}: threshold {model['threshold']:2f}, F1 {model['f1_score']:4f}, "
+              f"accuracy {model['accuracy_score'] * 100:2f}%, ROC-AUC {model['roc_auc']:4f}")
+    weights = ", ".join(f"{weight:.2f}" for weight in result["weights"])
+    print(f"Best weights ({weights}): threshold {result['threshold']:2f}, F1 {result['f1_score']:4f}, "
+          f"accuracy {result['accuracy_score'] * 100:2f}%, ROC-AUC {result['roc_auc']:4f}")
@@ -0,0 +1,26 @@
+import argparse
+
+from src.algorithms.collusion import CollusionDetector
+from src.util.config import ConfigManager
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Finds groups of suspicious files copied from one another.")
+    parser.add_argument("--suspicious", help="Directory containing the submissions. Read from the config if omitted.")
+    parser.add_argument("--vec-type", default="tfidf", choices=["count", "tfidf"])
+    parser.add_argument("--threshold", type=float, default=60.0, help="Similarity percentage above which a pair is kept.")
+    parser.add_argument("--pairs", action="store_true", help="List every pair above the threshold.")
+    args = parser.parse_args()
+    suspicious_dir = args.suspicious or ConfigManager().get("SUSPICIOUS_FILES")
+    detector = CollusionDetector(args.vec_type, args.threshold).fit(suspicious_dir)
+    clusters = detector.clusters()
+    for n, cluster in enumerate(clusters, start=1):
+        print(f"Cluster {n}".center(20, '-'))
+        print(f"{len(cluster['files'])} files, {cluster['pairs']} pairs, "
+              f"{cluster['max_score']:2f}% max and {cluster['mean_score']:2f}% mean similarity")
+        for path in cluster["files"]:
+            print(path)
+    if args.pairs:
+        for score, first, second in detector.pairs():
+            print(f"{score:2f}% similarity between {first} and {second}")
+    print(f"{len(clusters)} clusters in {len(detector.doc_ids)} files")
@@ -0,0 +1,35 @@
+import argparse
+
+from src.algorithms.service import ScoringServer, ScoringService
+from src.util.config import ConfigManager
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serves the comparison models over HTTP on a warm index.")
+    parser.add_argument("--originals", help="Directory containing the original files. Read from the config if omitted.")
+    parser.add_argument("--vec-types", nargs="+", default=["tfidf"], choices=["count", "tfidf"])
+    parser.add_argument("--index-dir", help="Directory where the indexes are saved and reloaded from.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="Number of requests handled concurrently.")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="Number of requests running or queued before new ones are rejected with 503.")
+    parser.add_argument("--threshold", type=float,
+                        help="Similarity percentage above which a text is considered plagiarized.")
+    parser.add_argument("--fingerprints", action="store_true",
+                        help="Resolve exact and near-exact copies with a fingerprint lookup before vectorizing.")
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    args = parser.parse_args()
+    # Load the indexes once
+    original_dir = args.originals or ConfigManager().get("ORIGINAL_FILES")
+    service = ScoringService(original_dir, tuple(args.vec_types), args.index_dir, args.threshold,
+                             fingerprints=args.fingerprints).load()
+    server = ScoringServer(service, args.host, args.port, args.workers, verbose=args.verbose,
+                           max_pending=args.max_pending)
+    print(f"Serving {len(service.doc_ids)} originals on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,42 @@
+import argparse
+import ipaddress
+import os
+from multiprocessing.connection import Listener
+
+from src.algorithms.sharded_algorithm import serve_shard
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Serves a shard of the original files' index to a coordinator. Requests are unpickled, so the "
+                    "authkey must be set to a secret shared only with the coordinator, and the shard should only be "
+                    "reachable from trusted hosts.")
+    parser.add_argument("--host", help="Address to listen on. Defaults to 127.0.0.1, or 0.0.0.0 with --public.")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--public", action="store_true",
+                        help="Allow listening on an address other hosts can reach.")
+    parser.add_argument("--authkey", default=os.environ.get("SHARD_AUTHKEY"),
+                        help="Secret key shared with the coordinator. Read from SHARD_AUTHKEY if omitted.")
+    args = parser.parse_args()
+    if not args.authkey:
+        parser.error("An authkey is required: pass --authkey or set SHARD_AUTHKEY.")
+    host = args.host or ("0.0.0.0" if args.public else "127.0.0.1")
+    if not is_loopback(host) and not args.public:
+        parser.error(f"Listening on {host} exposes the shard to other hosts: pass --public to allow it.")
+    # Serve coordinators one after the other
+    with Listener((host, args.port), authkey=args.authkey.encode("utf-8")) as listener:
+        print(f"Serving a shard on {host}:{listener.address[1]}")
+        try:
+            while True:
+                serve_shard(listener)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,52 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms.ann_algorithm import AnnAlgorithm, measure_recall
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.util.generator import Generator
+
+
+class TestAnnAlgorithm(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.test_dir = Path(tempfile.mkdtemp())
+        cls.ground_truth = Generator().generate_corpus(cls.test_dir, 64, 16, doc_length=120, plagiarism_rate=0.5,
+                                                       vocabulary_size=2000, seed=3)
+        cls.original_dir = cls.test_dir / "original"
+        cls.s_files = sorted((cls.test_dir / "suspicious").iterdir())
+        cls.plagiarized = [f for f in cls.s_files if cls.ground_truth[f.stem]]
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.test_dir)
+
+    def test_invalid_method(self) -> None:
+        self.assertRaises(ValueError, AnnAlgorithm, method="hnsw")
+
+    def test_exhaustive_probe(self) -> None:
+        model = AnnAlgorithm(n_components=32, n_lists=8, n_probe=8)
+        self.assertEqual(measure_recall(model, self.original_dir, self.s_files), 1.0)
+        scores, doc_ids = model.score_files(self.original_dir, self.s_files)
+        self.assertEqual(scores.shape, (len(self.s_files), 64))
+        self.assertEqual(model.embeddings.dtype, np.float32)
+        self.assertTrue(np.all(scores <= 100.0001))
+
+    def test_finds_plagiarized_originals(self) -> None:
+        cosine = CosineAlgorithm("tfidf")
+        expected, doc_ids = cosine.score_files(self.original_dir, self.plagiarized)
+        for method in AnnAlgorithm.methods:
+            model = AnnAlgorithm(n_components=32, method=method, n_lists=8, n_probe=2)
+            scores, ann_ids = model.score_files(self.original_dir, self.plagiarized)
+            self.assertEqual(ann_ids, doc_ids)
+            np.testing.assert_array_equal(scores.argmax(axis=1), expected.argmax(axis=1))
+
+    def test_probe_prunes_candidates(self) -> None:
+        model = AnnAlgorithm(n_components=32, n_lists=8, n_probe=1)
+        results = model.compare_texts(self.original_dir, self.plagiarized[0])
+        self.assertLess(len(results), 64)
+        best = model.get_max_similarity(results)
+        self.assertAlmostEqual(best[0], model.compare_text(best[1], self.plagiarized[0])[0], places=4)
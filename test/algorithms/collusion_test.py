@@ -0,0 +1,61 @@
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms.collusion import CollusionDetector
+from src.algorithms.corpus_index import CorpusIndex
+from src.algorithms.model import ModelMediator
+from src.util.generator import Generator
+
+
+class TestCollusionDetector(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.test_dir = Path(tempfile.mkdtemp())
+        Generator().generate_corpus(cls.test_dir, 10, 30, doc_length=60, plagiarism_rate=0.6, seed=5)
+        cls.suspicious_dir = cls.test_dir / "suspicious"
+        # Two submissions copied from another one
+        source = (cls.suspicious_dir / "FID-000000.txt").read_text(encoding="utf-8")
+        (cls.suspicious_dir / "FID-900000.txt").write_text(source, encoding="utf-8")
+        (cls.suspicious_dir / "FID-900001.txt").write_text(source + " and a few words more", encoding="utf-8")
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.test_dir)
+
+    def test_graph_matches_brute_force(self) -> None:
+        index = CorpusIndex("tfidf").fit(self.suspicious_dir)
+        expected = np.triu((index.matrix @ index.matrix.T).toarray() * 100, k=1)
+        expected[expected <= 30.0] = 0
+        # Few dense terms and small blocks so both parts of the join and several blocks are used
+        for dense_terms, memory_budget in ((3, 512), (1024, 64 * 2 ** 20), (0, 1024)):
+            detector = CollusionDetector("tfidf", 30.0, dense_terms, memory_budget).fit(self.suspicious_dir)
+            self.assertEqual(detector.doc_ids, index.doc_ids)
+            np.testing.assert_allclose(detector.graph.toarray(), expected, atol=1e-3)
+
+    def test_clusters(self) -> None:
+        detector = CollusionDetector("tfidf", 80.0).fit(self.suspicious_dir)
+        copies = {str(self.suspicious_dir / name) for name in ("FID-000000.txt", "FID-900000.txt", "FID-900001.txt")}
+        cluster = next(c for c in detector.clusters() if copies & set(c["files"]))
+        self.assertTrue(copies <= set(cluster["files"]))
+        self.assertGreaterEqual(cluster["pairs"], 2)
+        self.assertLessEqual(cluster["max_score"], 100.0)
+        pairs = detector.pairs()
+        self.assertEqual(len(pairs), detector.graph.nnz)
+        self.assertEqual([p[0] for p in pairs], sorted((p[0] for p in pairs), reverse=True))
+
+    def test_mediator(self) -> None:
+        clusters = ModelMediator(threshold=80.0).find_collusion(self.suspicious_dir)
+        self.assertEqual(clusters, CollusionDetector("tfidf", 80.0).fit(self.suspicious_dir).clusters())
+        self.assertEqual(ModelMediator(threshold=100.0).find_collusion(self.suspicious_dir), [])
+
+    def test_loaded_on_first_use(self) -> None:
+        code = "import sys, src.algorithms.model; print('src.algorithms.collusion' in sys.modules)"
+        loaded = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=Path(__file__).resolve().parents[2]).stdout.strip()
+        self.assertEqual(loaded, "False")
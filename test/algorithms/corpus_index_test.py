@@ -0,0 +1,177 @@
+import os
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms.corpus_index import CorpusIndex, DocIds
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.util.file_manager import FileManager
+
+
+class TestCorpusIndex(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.original_dir.mkdir()
+        texts = ["the quick brown fox jumps over the lazy dog",
+                 "a journey of a thousand miles begins with a single step",
+                 "the lazy dog sleeps while the quick fox runs away"]
+        for i, text in enumerate(texts):
+            (self.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        self.suspicious = self.test_dir / "suspicious.txt"
+        self.suspicious.write_text("the quick brown fox runs over a sleeping zebra", encoding="utf-8")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_fit(self) -> None:
+        index = CorpusIndex("tfidf").fit(self.original_dir)
+        self.assertTrue(index.is_fitted())
+        self.assertEqual(index.matrix.shape[0], 3)
+        self.assertEqual(index.doc_ids, sorted(str(f) for f in self.original_dir.iterdir()))
+
+    def test_count_scores_match_pairwise(self) -> None:
+        algorithm = CosineAlgorithm("count")
+        indexed = dict((path, score) for score, path in algorithm.compare_texts(self.original_dir, self.suspicious))
+        for original in self.original_dir.iterdir():
+            expected = algorithm.compare_text(original, self.suspicious)[0]
+            self.assertAlmostEqual(indexed[str(original)], expected)
+
+    def test_index_reused(self) -> None:
+        algorithm = CosineAlgorithm("tfidf")
+        algorithm.compare_texts(self.original_dir, self.suspicious)
+        index = algorithm.index
+        algorithm.compare_texts(self.original_dir, self.suspicious)
+        self.assertIs(algorithm.index, index)
+
+    def test_invalid_vectorizer(self) -> None:
+        self.assertRaises(ValueError, CorpusIndex, "bm25")
+
+    def test_not_fitted(self) -> None:
+        self.assertRaises(ValueError, CorpusIndex().vectorize, ["text"])
+
+    def test_vectorize_stream(self) -> None:
+        index = CorpusIndex("tfidf").fit(self.original_dir)
+        expected = index.vectorize([self.suspicious.read_text(encoding="utf-8")]).toarray()
+        streamed = index.vectorize_stream(FileManager.read_chunks(self.suspicious, chunk_size=7)).toarray()
+        np.testing.assert_allclose(streamed, expected)
+
+    def test_stream_threshold(self) -> None:
+        streamed = CosineAlgorithm("tfidf", stream_threshold=0, chunk_size=5)
+        expected = CosineAlgorithm("tfidf")
+        scores, _ = streamed.score_files(self.original_dir, [self.suspicious, self.suspicious])
+        expected_scores, _ = expected.score_files(self.original_dir, [self.suspicious, self.suspicious])
+        np.testing.assert_allclose(scores, expected_scores)
+
+    def test_save_load(self) -> None:
+        index = CorpusIndex("tfidf").fit(self.original_dir)
+        index.save(self.test_dir / "index")
+        loaded = CorpusIndex.load(self.test_dir / "index")
+        self.assertEqual(loaded.doc_ids, index.doc_ids)
+        self.assertEqual(loaded.stale, [])
+        text = self.suspicious.read_text(encoding="utf-8")
+        np.testing.assert_allclose(loaded.score(text), index.score(text))
+        np.testing.assert_allclose(pickle.loads(pickle.dumps(loaded)).score(text), index.score(text))
+
+    def test_load_stale(self) -> None:
+        CorpusIndex().fit(self.original_dir).save(self.test_dir / "index")
+        changed = self.original_dir / "org-001.txt"
+        changed.write_text("a completely different text", encoding="utf-8")
+        os.utime(changed, ns=(0, 0))
+        with self.assertWarns(RuntimeWarning):
+            loaded = CorpusIndex.load(self.test_dir / "index")
+        self.assertEqual(loaded.stale, [str(changed)])
+
+    def test_load_missing(self) -> None:
+        self.assertRaises(FileNotFoundError, CorpusIndex.load, self.test_dir / "index")
+
+    def scores_by_doc(self, index: CorpusIndex) -> dict[str, float]:
+        return dict(zip(index.doc_ids, index.score(self.suspicious.read_text(encoding="utf-8"))))
+
+    def assert_same_scores(self, index: CorpusIndex, expected: CorpusIndex) -> None:
+        scores, expected_scores = self.scores_by_doc(index), self.scores_by_doc(expected)
+        self.assertEqual(scores.keys(), expected_scores.keys())
+        for doc_id, score in expected_scores.items():
+            self.assertAlmostEqual(scores[doc_id], score)
+
+    def test_add_and_reweight(self) -> None:
+        new = self.test_dir / "new.txt"
+        new.write_text("zebras and foxes never sleep", encoding="utf-8")
+        index = CorpusIndex("tfidf", reweight_ratio=10).fit(self.original_dir)
+        index.add(new)
+        index.reweight()
+        shutil.copy(new, self.original_dir / "new.txt")
+        expected = CorpusIndex("tfidf").fit(self.original_dir)
+        self.assertEqual(len(index.doc_ids), 4)
+        self.assertAlmostEqual(sorted(self.scores_by_doc(index).values())[-1],
+                               sorted(self.scores_by_doc(expected).values())[-1])
+
+    def test_sync(self) -> None:
+        index = CorpusIndex("tfidf", reweight_ratio=0).fit(self.original_dir)
+        (self.original_dir / "org-000.txt").unlink()
+        changed = self.original_dir / "org-001.txt"
+        changed.write_text("a sleeping zebra and a quick fox", encoding="utf-8")
+        os.utime(changed, ns=(0, 0))
+        added = self.original_dir / "org-003.txt"
+        added.write_text("the brown fox is quick", encoding="utf-8")
+        touched = self.original_dir / "org-002.txt"
+        os.utime(touched, ns=(0, 0))
+        result = index.sync()
+        self.assertEqual(result, ([added], [changed], [str(self.original_dir / "org-000.txt")]))
+        self.assert_same_scores(index, CorpusIndex("tfidf").fit(self.original_dir))
+        self.assertEqual(index.sync(), ([], [], []))
+
+    def test_sync_save_load(self) -> None:
+        index = CorpusIndex("tfidf").fit(self.original_dir)
+        index.save(self.test_dir / "index")
+        loaded = CorpusIndex.load(self.test_dir / "index")
+        (self.original_dir / "org-003.txt").write_text("the brown fox is quick", encoding="utf-8")
+        loaded.sync()
+        loaded.rebuild()
+        self.assert_same_scores(loaded, CorpusIndex("tfidf").fit(self.original_dir))
+
+    def test_compact_and_hashed_scores(self) -> None:
+        text = self.suspicious.read_text(encoding="utf-8")
+        expected = CorpusIndex("tfidf").fit(self.original_dir).score(text)
+        for options in ({"compact": True}, {"n_features": 2 ** 20}, {"n_features": 2 ** 20, "compact": True}):
+            index = CorpusIndex("tfidf", **options).fit(self.original_dir)
+            np.testing.assert_allclose(index.score(text), expected, rtol=1e-5)
+            np.testing.assert_allclose(index.score_rows(index.vectorize([text]), np.array([2, 0])), expected[[[2, 0]]],
+                                       rtol=1e-5)
+        compact = CorpusIndex("tfidf", n_features=2 ** 20, compact=True).fit(self.original_dir)
+        self.assertEqual(compact.matrix.dtype, np.float32)
+        self.assertEqual(len(compact.vocabulary), 2 ** 20)
+
+    def test_doc_ids(self) -> None:
+        paths = [str(self.original_dir / "org-000.txt"), "/other/dír/á.txt", str(self.original_dir / "org-001.txt")]
+        doc_ids = DocIds(paths)
+        self.assertEqual((len(doc_ids), doc_ids[1], doc_ids[-1], list(doc_ids)), (3, paths[1], paths[2], paths))
+        self.assertEqual(doc_ids, paths)
+        self.assertEqual(doc_ids[np.array([True, False, True])], [paths[0], paths[2]])
+        self.assertEqual(DocIds(paths[:1]) + DocIds(paths[1:]), doc_ids)
+        self.assertNotEqual(doc_ids, DocIds(paths[::-1]))
+        self.assertEqual(pickle.loads(pickle.dumps(doc_ids)), doc_ids)
+        # Indexes keep their ids interned through incremental changes
+        index = CorpusIndex("tfidf").fit(self.original_dir)
+        (self.original_dir / "org-003.txt").write_text("the brown fox is quick", encoding="utf-8")
+        index.add(self.original_dir / "org-003.txt")
+        index.remove(self.original_dir / "org-001.txt")
+        self.assertIsInstance(index.doc_ids, DocIds)
+        self.assertEqual(index.doc_ids, [str(self.original_dir / f"org-{i:03d}.txt") for i in (0, 2, 3)])
+
+    def test_compact_save_load_and_sync(self) -> None:
+        index = CorpusIndex("tfidf", n_features=2 ** 16, compact=True).fit(self.original_dir)
+        (self.original_dir / "org-003.txt").write_text("a single step towards the quick fox", encoding="utf-8")
+        index.sync()
+        expected = CorpusIndex("tfidf", n_features=2 ** 16).fit(self.original_dir)
+        text = self.suspicious.read_text(encoding="utf-8")
+        np.testing.assert_allclose(index.score(text), expected.score(text), rtol=1e-5)
+        index.save(self.test_dir / "index")
+        loaded = CorpusIndex.load(self.test_dir / "index")
+        self.assertTrue(loaded.compact)
+        self.assertEqual(loaded.n_features, 2 ** 16)
+        np.testing.assert_allclose(loaded.score(text), expected.score(text), rtol=1e-5)
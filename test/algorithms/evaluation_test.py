@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+from sklearn.metrics import f1_score, roc_auc_score
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.evaluation import calibrate, ensemble_max, threshold_curve, weight_grid
+from src.algorithms.model import ModelMediator
+from src.util.generator import Generator
+
+
+class TestEvaluation(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.test_dir = Path(tempfile.mkdtemp())
+        cls.ground_truth = Generator().generate_corpus(cls.test_dir, 30, 40, doc_length=60, plagiarism_rate=0.4, seed=2)
+        cls.original_dir = cls.test_dir / "original"
+        cls.suspicious_dir = cls.test_dir / "suspicious"
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.test_dir)
+
+    def test_threshold_curve(self) -> None:
+        rng = np.random.default_rng(0)
+        # Rounded so several files share a score
+        scores = np.round(rng.random(200) * 20) * 5
+        labels = rng.random(200) < scores / 100
+        curve = threshold_curve(scores, labels)
+        self.assertAlmostEqual(curve["roc_auc"], roc_auc_score(labels, scores))
+        for threshold, f1 in zip(curve["thresholds"], curve["f1"]):
+            self.assertAlmostEqual(f1, f1_score(labels, scores > threshold, zero_division=0.0))
+        self.assertEqual(curve["f1_score"], curve["f1"].max())
+        self.assertAlmostEqual(curve["accuracy_score"], np.mean((scores > curve["threshold"]) == labels))
+        self.assertTrue(np.isnan(threshold_curve(scores, np.ones(200, dtype=bool))["roc_auc"]))
+        with self.assertRaises(ValueError):
+            threshold_curve(scores, labels[1:])
+
+    def test_weight_grid(self) -> None:
+        grid = weight_grid(3, 10)
+        self.assertEqual(grid.shape, (36, 3))
+        np.testing.assert_allclose(grid.sum(axis=1), 1.0)
+        self.assertTrue((grid > 0).all())
+        self.assertEqual(weight_grid(1).tolist(), [[1.0]])
+
+    def test_ensemble_max(self) -> None:
+        rng = np.random.default_rng(1)
+        model_scores = rng.random((2, 50, 7)) * 100
+        weights = weight_grid(2, 4)
+        expected = np.stack([(w[0] * model_scores[0] + w[1] * model_scores[1]).max(axis=1) for w in weights])
+        np.testing.assert_allclose(ensemble_max(model_scores, weights, memory_budget=256), expected)
+
+    def test_mediator_calibrate(self) -> None:
+        mediator = ModelMediator(CosineAlgorithm("count"), CosineAlgorithm("tfidf"), weights=[1.0, 3.0])
+        result = mediator.calibrate(self.original_dir, self.suspicious_dir, self.ground_truth)
+        self.assertEqual(result["weights"], [1.0, 3.0])
+        # The best threshold reproduces its F1 score through the regular comparison
+        mediator.threshold = result["threshold"]
+        results = mediator.compare_batch(self.original_dir, self.suspicious_dir)
+        labels = [self.ground_truth[Path(f).stem] for f in results]
+        predicted = [matches[0][0] > mediator.threshold for matches in results.values()]
+        self.assertAlmostEqual(result["f1_score"], f1_score(labels, predicted))
+        # Searching the weights never does worse than the current ones
+        searched = mediator.calibrate(self.original_dir, self.suspicious_dir, self.ground_truth, weight_steps=4,
+                                      apply=True)
+        self.assertGreaterEqual(searched["f1_score"], result["f1_score"])
+        self.assertEqual((mediator.weights, mediator.threshold), (searched["weights"], searched["threshold"]))
+        self.assertEqual(len(searched["models"]), 2)
+
+    def test_calibrate_without_ground_truth(self) -> None:
+        with self.assertRaises(ValueError):
+            ModelMediator(CosineAlgorithm("tfidf")).calibrate(self.original_dir, self.suspicious_dir, {})
+        result = calibrate(np.zeros((1, 4, 3)), np.array([True, False, True, False]))
+        self.assertEqual(result["threshold"], 0.0)
@@ -0,0 +1,97 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import numpy as np
+
+from src.algorithms.fingerprint_algorithm import FingerprintAlgorithm
+from src.algorithms.model import ModelMediator
+from src.util.metrics import metrics
+from src.util.text import Document, text_digest, tokenize, winnow
+
+
+class TestFingerprintAlgorithm(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.original_dir.mkdir()
+        originals = ["the quick brown fox jumps over the lazy dog near the quiet river bank at dawn while the birds "
+                     "sing softly in the tall green trees and the farmer walks slowly to the old red barn",
+                     "a journey of a thousand miles begins with a single step taken today by those who dare to leave "
+                     "the comfort of home behind and walk towards the unknown horizon with hope",
+                     "all that glitters is not gold and not all who wander are lost"]
+        for i, text in enumerate(originals):
+            (self.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        self.exact = self.test_dir / "FID-01.txt"
+        self.exact.write_text("A Journey of a  thousand miles, begins with a single step\ntaken today by those who "
+                              "dare to leave the comfort of home behind and walk towards the unknown horizon with "
+                              "HOPE!", encoding="utf-8")
+        self.near = self.test_dir / "FID-02.txt"
+        self.near.write_text(originals[0].replace("at dawn", "at dusk"), encoding="utf-8")
+        self.other = self.test_dir / "FID-03.txt"
+        self.other.write_text("nothing that glitters is gold", encoding="utf-8")
+        self.model = FingerprintAlgorithm(vec_type="count", near_threshold=0.6)
+
+    def tearDown(self) -> None:
+        metrics.disable()
+        shutil.rmtree(self.test_dir)
+
+    def test_text_digest_and_winnow(self) -> None:
+        self.assertEqual(text_digest(tokenize("Hello,   World")), text_digest(tokenize("hello world")))
+        self.assertNotEqual(text_digest(tokenize("hello world")), text_digest(tokenize("world hello")))
+        hashes = np.array([5, 3, 8, 1, 9, 2], dtype=np.uint32)
+        self.assertEqual(winnow(hashes, 3).tolist(), [1, 3])
+        self.assertEqual(winnow(hashes[:2], 3).tolist(), [3])
+        self.assertEqual(len(winnow(np.zeros(0, dtype=np.uint32), 3)), 0)
+
+    def test_resolve_files(self) -> None:
+        results = self.model.resolve_files(self.original_dir, [self.exact, self.near, self.other])
+        self.assertEqual([r["stage"] for r in results], ["exact", "near", "cosine"])
+        self.assertEqual(results[0]["score"], 100.0)
+        self.assertEqual(results[0]["original"], str(self.original_dir / "org-001.txt"))
+        self.assertEqual(results[1]["original"], str(self.original_dir / "org-000.txt"))
+        self.assertEqual(results[2]["original"], str(self.original_dir / "org-002.txt"))
+
+    def test_copies_keep_cosine_scores(self) -> None:
+        metrics.enable()
+        scores, doc_ids = self.model.score_files(self.original_dir, [self.exact, self.other])
+        expected = self.model.scorer.score_files(self.original_dir, [self.exact, self.other])[0]
+        # Only the copied original's column holds the fingerprint score
+        self.assertEqual(scores[0, 1], 100.0)
+        np.testing.assert_allclose(scores[0, [0, 2]], expected[0, [0, 2]])
+        self.assertTrue((scores[0, [0, 2]] > 0).all())
+        np.testing.assert_allclose(scores[1], expected[1])
+        counters = metrics.summary()["counters"]
+        self.assertEqual((counters["fingerprint.exact"], counters["fingerprint.cosine"]), (1, 1))
+        top = self.model.compare_texts(self.original_dir, self.exact, top_k=3)
+        self.assertEqual(top[0], (100.0, str(self.original_dir / "org-001.txt")))
+        self.assertTrue(all(score > 0 for score, _ in top[1:]))
+
+    def test_single_match_skips_vectorizing(self) -> None:
+        self.model.prepare(self.original_dir)
+        with mock.patch.object(self.model.scorer, "score_documents", wraps=self.model.scorer.score_documents) as score:
+            top = self.model.compare_texts(self.original_dir, self.exact, top_k=1)
+            self.model.resolve_files(self.original_dir, [self.exact])
+        self.assertEqual(top, [(100.0, str(self.original_dir / "org-001.txt"))])
+        score.assert_not_called()
+
+    def test_prepare_refits_on_change(self) -> None:
+        self.model.prepare(self.original_dir)
+        with mock.patch.object(self.model.index, "fit", wraps=self.model.index.fit) as fit:
+            self.model.prepare(self.original_dir)
+            fit.assert_not_called()
+            (self.original_dir / "org-003.txt").write_text("a brand new original text", encoding="utf-8")
+            self.model.scorer.index.sync()
+            self.model.prepare(self.original_dir)
+            fit.assert_called_once()
+
+    def test_compare_text(self) -> None:
+        self.assertEqual(self.model.compare_text(self.original_dir / "org-001.txt", self.exact)[0], 100.0)
+        expected = self.model.scorer.compare_text(self.original_dir / "org-002.txt", self.other)
+        self.assertAlmostEqual(self.model.compare_text(self.original_dir / "org-002.txt", self.other)[0], expected[0])
+
+    def test_mediator(self) -> None:
+        mediator = ModelMediator(self.model)
+        self.assertEqual(mediator.compare_dir(self.original_dir, self.exact), (100.0, str(self.original_dir / "org-001.txt")))
+        self.assertIsNone(self.model.index.lookup(Document(text="")))
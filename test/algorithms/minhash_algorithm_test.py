@@ -0,0 +1,60 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.algorithms.minhash_algorithm import MinHashAlgorithm, measure_recall, shingle_hashes
+from src.algorithms.model import ModelMediator
+
+
+class TestMinHashAlgorithm(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.original_dir.mkdir()
+        originals = ["the quick brown fox jumps over the lazy dog near the quiet river bank",
+                     "a journey of a thousand miles begins with a single step taken today",
+                     "all that glitters is not gold and not all who wander are lost"]
+        for i, text in enumerate(originals):
+            (self.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        self.suspicious = self.test_dir / "FID-01.txt"
+        self.suspicious.write_text("a journey of a thousand miles begins with a single small step", encoding="utf-8")
+        self.model = MinHashAlgorithm(vec_type="count")
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_shingle_hashes(self) -> None:
+        self.assertEqual(len(shingle_hashes("one two three four", 3)), 2)
+        self.assertEqual(len(shingle_hashes("one two", 3)), 1)
+        self.assertEqual(len(shingle_hashes("", 3)), 0)
+
+    def test_candidates(self) -> None:
+        self.model.prepare(self.original_dir)
+        rows = self.model.candidates(self.suspicious.read_text(encoding="utf-8"))
+        self.assertIn(1, rows.tolist())
+        self.assertEqual(len(self.model.candidates("")), 0)
+
+    def test_compare_texts(self) -> None:
+        results = self.model.compare_texts(self.original_dir, self.suspicious)
+        best = self.model.get_max_similarity(results)
+        self.assertEqual(best[1], str(self.original_dir / "org-001.txt"))
+        expected = self.model.scorer.compare_text(self.original_dir / "org-001.txt", self.suspicious)
+        self.assertAlmostEqual(best[0], expected[0])
+
+    def test_score_files(self) -> None:
+        scores, doc_ids = self.model.score_files(self.original_dir, [self.suspicious])
+        self.assertEqual(scores.shape, (1, 3))
+        self.assertEqual(doc_ids[int(scores[0].argmax())], str(self.original_dir / "org-001.txt"))
+
+    def test_mediator(self) -> None:
+        mediator = ModelMediator(self.model)
+        result = mediator.compare_dir(self.original_dir, self.suspicious)
+        self.assertEqual(result[1], str(self.original_dir / "org-001.txt"))
+
+    def test_measure_recall(self) -> None:
+        self.assertEqual(measure_recall(self.model, self.original_dir, [self.suspicious]), 1.0)
+        self.assertEqual(measure_recall(self.model, self.original_dir, [self.suspicious], {"FID-01": False}), 1.0)
+
+    def test_invalid_bands(self) -> None:
+        self.assertRaises(ValueError, MinHashAlgorithm, num_perm=128, bands=3)
@@ -0,0 +1,197 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.minhash_algorithm import MinHashAlgorithm
+from src.algorithms.model import MATCH_DTYPE, BaseModel, ModelMediator
+from src.algorithms.passage_algorithm import PassageAlgorithm
+from src.util.file_manager import FileManager as Fm
+from src.util.text import Document
+
+
+class ConstantModel(BaseModel):
+    """
+    This class returns the same similarity for every original and counts the files it scores.
+    """
+    def __init__(self, score: float, cost: float):
+        super().__init__()
+        self.score = score
+        self.cost = cost
+        self.scored = 0
+
+    def compare_text(self, f_file_path: str | Path, s_file_path: str | Path) -> tuple[float, str]:
+        self.scored += 1
+        return self.score, str(f_file_path)
+
+    def compare_texts(self, f_dir: str | Path, s_file_path: str | Path,
+                      top_k: int | None = None) -> list[tuple[float, str]]:
+        self.scored += 1
+        return self.select_top_k_results([(self.score, str(f)) for f in sorted(Path(f_dir).iterdir())], top_k)
+
+
+class TestModelMediator(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.suspicious_dir = self.test_dir / "suspicious"
+        self.original_dir.mkdir()
+        self.suspicious_dir.mkdir()
+        originals = ["the quick brown fox jumps over the lazy dog",
+                     "a journey of a thousand miles begins with a single step",
+                     "the lazy dog sleeps while the quick fox runs away",
+                     "all that glitters is not gold"]
+        suspicious = ["the quick brown fox jumps over a lazy cat",
+                      "a journey of a thousand steps begins with a single mile",
+                      "nothing that glitters is gold"]
+        for i, text in enumerate(originals):
+            (self.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        for i, text in enumerate(suspicious):
+            (self.suspicious_dir / f"FID-{i:02d}.txt").write_text(text, encoding="utf-8")
+        self.mediator = ModelMediator(CosineAlgorithm("count"), CosineAlgorithm("tfidf"))
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_compare_batch_matches_compare_dir(self) -> None:
+        results = self.mediator.compare_batch(self.original_dir, self.suspicious_dir)
+        self.assertEqual(len(results), 3)
+        for s_file in self.suspicious_dir.iterdir():
+            expected = self.mediator.compare_dir(self.original_dir, s_file)
+            self.assertEqual(results[str(s_file)][0][1], expected[1])
+            self.assertAlmostEqual(results[str(s_file)][0][0], expected[0])
+
+    def test_compare_batch_block_size(self) -> None:
+        full = self.mediator.compare_batch(self.original_dir, self.suspicious_dir, top_k=3)
+        blocked = self.mediator.compare_batch(self.original_dir, self.suspicious_dir, top_k=3, block_size=1)
+        self.assertEqual(full.keys(), blocked.keys())
+        for key, matches in full.items():
+            self.assertEqual(len(matches), 3)
+            self.assertEqual([m[1] for m in matches], [m[1] for m in blocked[key]])
+
+    def test_compare_batch_workers(self) -> None:
+        sequential = self.mediator.compare_batch(self.original_dir, self.suspicious_dir, top_k=2)
+        parallel = self.mediator.compare_batch(self.original_dir, self.suspicious_dir, top_k=2, workers=2)
+        self.assertEqual(list(sequential.keys()), list(parallel.keys()))
+        for key, matches in sequential.items():
+            self.assertEqual([m[1] for m in matches], [m[1] for m in parallel[key]])
+            for expected, result in zip(matches, parallel[key]):
+                self.assertAlmostEqual(expected[0], result[0])
+
+    def test_score_matrix_workers(self) -> None:
+        model = CosineAlgorithm("tfidf")
+        s_files = sorted(self.suspicious_dir.iterdir())
+        sequential, doc_ids = model.score_matrix(self.original_dir, s_files)
+        parallel, parallel_ids = model.score_matrix(self.original_dir, s_files, workers=2)
+        self.assertEqual(doc_ids, parallel_ids)
+        np.testing.assert_allclose(sequential, parallel)
+
+    def test_compare_batch_fail(self) -> None:
+        self.assertRaises(ValueError, self.mediator.compare_batch, self.original_dir, "NOT_A_DIR")
+
+    def test_get_top_k(self) -> None:
+        scores = np.array([[10.0, 50.0, 30.0], [5.0, 1.0, 7.0]])
+        result = BaseModel.get_top_k(scores, ["a", "b", "c"], 2)
+        self.assertEqual(result, [[(50.0, "b"), (30.0, "c")], [(7.0, "c"), (5.0, "a")]])
+        self.assertEqual(len(BaseModel.get_top_k(scores, ["a", "b", "c"], 10)[0]), 3)
+
+    def test_ground_truth_loaded_on_demand(self) -> None:
+        with mock.patch("src.algorithms.model.load_from_json_file", return_value={"FID-00": True}) as load:
+            mediator = ModelMediator(CosineAlgorithm("count"))
+            load.assert_not_called()
+            self.assertEqual(mediator.ground_truth, {"FID-00": True})
+            self.assertEqual(mediator.ground_truth, {"FID-00": True})
+            load.assert_called_once()
+
+    def test_select_top_k(self) -> None:
+        scores = np.array([0.1, 0.9, 0.5])
+        self.assertEqual(BaseModel.select_top_k(scores, ["a", "b", "c"], 2), [(0.9, "b"), (0.5, "c")])
+        self.assertEqual(BaseModel.select_top_k(scores[:2], ["a", "b", "c"], 1, np.array([2, 0])), [(0.9, "a")])
+        self.assertEqual(BaseModel.select_top_k(scores, ["a", "b", "c"], None), [(0.1, "a"), (0.9, "b"), (0.5, "c")])
+        results = [(0.1, "a"), (0.9, "b"), (0.5, "c")]
+        self.assertEqual(BaseModel.select_top_k_results(iter(results), 2), [(0.9, "b"), (0.5, "c")])
+        self.assertEqual(BaseModel.select_top_k_results(results, None), results)
+
+    def test_top_matches(self) -> None:
+        for s_file in self.suspicious_dir.iterdir():
+            expected = self.mediator.compare_files(self.original_dir, [s_file], 2)[0]
+            matches = self.mediator.top_matches(self.original_dir, s_file, 2)
+            self.assertEqual(matches[0][1], expected[0][1])
+            np.testing.assert_allclose([m[0] for m in matches], [m[0] for m in expected])
+            self.assertEqual(self.mediator.compare_dir(self.original_dir, s_file), matches[0])
+
+    def test_compare_texts_top_k(self) -> None:
+        s_file = next(self.suspicious_dir.iterdir())
+        for model in (CosineAlgorithm("tfidf"), MinHashAlgorithm(), PassageAlgorithm()):
+            full = model.compare_texts(self.original_dir, s_file)
+            top = model.compare_texts(self.original_dir, s_file, top_k=2)
+            self.assertEqual(top, sorted(full, key=lambda x: -x[0])[:2])
+
+    def test_get_top_k_array(self) -> None:
+        scores = np.array([[10.0, 50.0, 30.0], [5.0, 1.0, 7.0]])
+        result = BaseModel.get_top_k_array(scores, 2)
+        self.assertEqual(result.dtype, MATCH_DTYPE)
+        np.testing.assert_array_equal(result["doc"], [[1, 2], [2, 0]])
+        np.testing.assert_allclose(result["score"], [[50.0, 30.0], [7.0, 5.0]])
+
+    def test_compare_files_array(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        expected = self.mediator.compare_files(self.original_dir, s_files, top_k=2)
+        result, doc_ids = self.mediator.compare_files_array(self.original_dir, s_files, top_k=2)
+        self.assertEqual(result.shape, (len(s_files), 2))
+        for row, matches in zip(result, expected):
+            self.assertEqual([doc_ids[i] for i in row["doc"]], [m[1] for m in matches])
+            np.testing.assert_allclose(row["score"], [m[0] for m in matches], rtol=1e-6)
+
+    def test_weights(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        count, tfidf = CosineAlgorithm("count"), CosineAlgorithm("tfidf")
+        mediator = ModelMediator(count, tfidf, weights=[3.0, 1.0])
+        count_scores, doc_ids = count.score_files(self.original_dir, s_files)
+        tfidf_scores, _ = tfidf.score_files(self.original_dir, s_files)
+        expected = BaseModel.get_top_k((3 * count_scores + tfidf_scores) / 4, doc_ids, 2)
+        for result, matches in zip(mediator.compare_files(self.original_dir, s_files, 2), expected):
+            self.assertEqual([m[1] for m in result], [m[1] for m in matches])
+            np.testing.assert_allclose([m[0] for m in result], [m[0] for m in matches])
+        self.assertRaises(ValueError, ModelMediator, count, weights=[1.0, 2.0])
+        self.assertRaises(ValueError, ModelMediator, count, weights=[0.0])
+
+    def test_cascade_skips_decided_files(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        # The cheap model alone keeps every file below the threshold whatever the expensive one returns
+        cheap, expensive = ConstantModel(10.0, cost=1.0), ConstantModel(50.0, cost=5.0)
+        mediator = ModelMediator(expensive, cheap, weights=[1.0, 3.0], cascade=True)
+        results = mediator.compare_files(self.original_dir, s_files)
+        self.assertEqual(expensive.scored, 0)
+        self.assertEqual(cheap.scored, len(s_files))
+        self.assertEqual([r[0][0] for r in results], [10.0] * len(s_files))
+        self.assertAlmostEqual(mediator.compare_single(s_files[0], s_files[1])[0], 10.0)
+        self.assertEqual(expensive.scored, 0)
+
+    def test_cascade_keeps_verdicts(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        full = ModelMediator(CosineAlgorithm("count"), CosineAlgorithm("tfidf"), threshold=30.0)
+        cascade = ModelMediator(CosineAlgorithm("count"), CosineAlgorithm("tfidf"), threshold=30.0, cascade=True)
+        for expected, result in zip(full.compare_files(self.original_dir, s_files),
+                                    cascade.compare_files(self.original_dir, s_files)):
+            self.assertEqual(expected[0][0] > 30.0, result[0][0] > 30.0)
+
+    def test_compare_files_reads_once(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        mediator = ModelMediator(CosineAlgorithm("count"), CosineAlgorithm("tfidf"), MinHashAlgorithm(),
+                                 PassageAlgorithm(ngram_size=2, min_words=2))
+        mediator.prepare(self.original_dir)
+        with mock.patch.object(Fm, "read_file", wraps=Fm.read_file) as read_file:
+            mediator.compare_files(self.original_dir, s_files)
+        self.assertEqual(sorted(call.args[0] for call in read_file.call_args_list), s_files)
+
+    def test_score_documents_matches_score_files(self) -> None:
+        s_files = sorted(self.suspicious_dir.iterdir())
+        for model in (CosineAlgorithm("tfidf"), MinHashAlgorithm(), PassageAlgorithm(ngram_size=2, min_words=2)):
+            expected, doc_ids = model.score_files(self.original_dir, s_files)
+            scores, document_ids = model.score_documents(self.original_dir, [Document(f) for f in s_files])
+            self.assertEqual(doc_ids, document_ids)
+            np.testing.assert_allclose(scores, expected)
@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from src.algorithms.model import ModelMediator
+from src.algorithms.passage_algorithm import PassageAlgorithm
+from src.util.text import tokenize
+
+
+class TestPassageAlgorithm(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.original_dir.mkdir()
+        self.copied = "the results of the second experiment show a clear improvement over the baseline model"
+        self.original = self.original_dir / "org-001.txt"
+        self.original.write_text(f"Introduction to the topic. {self.copied}. Closing remarks.", encoding="utf-8")
+        (self.original_dir / "org-002.txt").write_text("an unrelated text about gardening and the weather in spring",
+                                                      encoding="utf-8")
+        self.suspicious = self.test_dir / "FID-01.txt"
+        self.suspicious.write_text(f"My own words come first. {self.copied}! And my own words end it.",
+                                   encoding="utf-8")
+        self.model = PassageAlgorithm()
+
+    def tearDown(self) -> None:
+        shutil.rmtree(self.test_dir)
+
+    def test_find_passages(self) -> None:
+        passages, n_words = self.model.find_passages(self.original_dir, self.suspicious)
+        self.assertEqual(len(passages), 1)
+        passage = passages[0]
+        self.assertEqual(passage.original, str(self.original))
+        suspicious_text = self.suspicious.read_text(encoding="utf-8")
+        original_text = self.original.read_text(encoding="utf-8")
+        self.assertEqual(suspicious_text[passage.suspicious_start:passage.suspicious_end], self.copied)
+        self.assertEqual(original_text[passage.original_start:passage.original_end], self.copied)
+        self.assertEqual(passage.words, len(tokenize(self.copied)))
+        self.assertEqual(n_words, len(tokenize(suspicious_text)))
+
+    def test_repeated_phrase(self) -> None:
+        # A verbatim copy of an original that repeats a phrase is a single passage
+        phrase = "as the committee noted in its final report on the matter"
+        words = [f"word{i}" for i in range(200)]
+        for position in (20, 90, 160):
+            words[position:position + 11] = phrase.split()
+        text = " ".join(words[:200])
+        self.original.write_text(text, encoding="utf-8")
+        self.suspicious.write_text(text, encoding="utf-8")
+        passages, n_words = PassageAlgorithm().find_passages(self.original_dir, self.suspicious)
+        self.assertEqual([(p.suspicious_start, p.suspicious_end, p.original_start, p.original_end, p.words)
+                          for p in passages], [(0, len(text), 0, len(text), 200)])
+        # Copied with a few words changed, the copy is still one passage
+        words[50:52] = ["changed", "words"]
+        self.suspicious.write_text(" ".join(words[:200]), encoding="utf-8")
+        passages, _ = PassageAlgorithm().find_passages(self.original_dir, self.suspicious)
+        self.assertEqual([p.words for p in passages], [200])
+
+    def test_compare_texts(self) -> None:
+        results = self.model.compare_texts(self.original_dir, self.suspicious)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][1], str(self.original))
+        self.assertGreater(results[0][0], 50.0)
+
+    def test_compare_text(self) -> None:
+        self.assertGreater(self.model.compare_text(self.original, self.suspicious)[0], 50.0)
+        self.assertEqual(self.model.compare_text(self.original_dir / "org-002.txt", self.suspicious)[0], 0.0)
+
+    def test_mediator(self) -> None:
+        result = ModelMediator(self.model).compare_batch(self.original_dir, self.test_dir)
+        self.assertEqual(result[str(self.suspicious)][0][1], str(self.original))
+
+    def test_compare_text_fail(self) -> None:
+        self.assertRaises(ValueError, self.model.find_passages, self.original_dir, "NOT_A_FILE")
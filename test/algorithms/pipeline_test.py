@@ -0,0 +1,150 @@
+import asyncio
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import ModelMediator
+from src.algorithms.pipeline import IngestionPipeline
+from src.util.file_manager import FileManager as Fm
+
+
+class TestIngestionPipeline(TestCase):
+    def setUp(self) -> None:
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.original_dir = self.test_dir / "original"
+        self.suspicious_dir = self.test_dir / "suspicious"
+        self.original_dir.mkdir()
+        self.suspicious_dir.mkdir()
+        originals = ["the quick brown fox jumps over the lazy dog",
+                     "a journey of a thousand miles begins with a single step",
+                     "all that glitters is not gold"]
+        suspicious = ["the quick brown fox jumps over a lazy cat",
+                      "a journey of a thousand steps begins with a single mile",
+                      "nothing that glitters is gold",
+                      "the quick brown fox jumps over the lazy dog"]
+        for i, text in enumerate(originals):
+            (self.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        for i, text in enumerate(suspicious):
+            (self.suspicious_dir / f"FID-{i:02d}.txt").write_text(text, encoding="utf-8")
+        self.s_files = sorted(self.suspicious_dir.iterdir())
+        self.mediator = ModelMediator(CosineAlgorithm("count"))
+
+    def tearDown(self) -> None:
+        Fm.disable_cache()
+        shutil.rmtree(self.test_dir)
+
+    def test_run_matches_compare_files(self) -> None:
+        pipeline = IngestionPipeline(self.mediator, self.original_dir, queue_size=1, batch_size=2)
+        results = asyncio.run(pipeline.run(self.s_files))
+        self.assertEqual(sorted(r["file"] for r in results), [str(f) for f in self.s_files])
+        expected = dict(zip(map(str, self.s_files), self.mediator.compare_files(self.original_dir, self.s_files)))
+        for result in results:
+            self.assertIsNone(result["error"])
+            self.assertEqual(result["original"], expected[result["file"]][0][1])
+            self.assertAlmostEqual(result["score"], expected[result["file"]][0][0])
+            self.assertGreaterEqual(result["latency_seconds"], 0)
+        self.assertTrue(next(r for r in results if r["name"] == "FID-03")["is_plagiarism"])
+
+    def test_missing_file_reports_error(self) -> None:
+        pipeline = IngestionPipeline(self.mediator, self.original_dir)
+        results = asyncio.run(pipeline.run([self.suspicious_dir / "missing.txt", self.s_files[0]]))
+        errors = [r for r in results if r["error"] is not None]
+        self.assertEqual(len(results), 2)
+        self.assertEqual([r["name"] for r in errors], ["missing"])
+        self.assertEqual(errors[0]["matches"], [])
+
+    def test_watch(self) -> None:
+        async def watch() -> list[dict]:
+            pipeline = IngestionPipeline(self.mediator, self.original_dir, max_delay=0.01)
+            await pipeline.start()
+            stop = asyncio.Event()
+            watcher = asyncio.create_task(pipeline.watch(self.suspicious_dir, poll_interval=0.01, stop=stop))
+            results = []
+            async for result in pipeline.results():
+                results.append(result)
+                if len(results) == len(self.s_files):
+                    stop.set()
+            await watcher
+            return results
+
+        results = asyncio.run(watch())
+        self.assertEqual(sorted(r["file"] for r in results), [str(f) for f in self.s_files])
+
+    def test_watch_skips_vanished_files(self) -> None:
+        iterdir, is_file = Path.iterdir, Path.is_file
+
+        def listed(directory: Path):
+            # A file removed between the listing and its stat
+            yield from iterdir(directory)
+            if directory == self.suspicious_dir:
+                yield directory / "vanished.txt"
+
+        async def watch() -> list[dict]:
+            pipeline = IngestionPipeline(self.mediator, self.original_dir, max_delay=0.01)
+            await pipeline.start()
+            stop = asyncio.Event()
+            watcher = asyncio.create_task(pipeline.watch(self.suspicious_dir, poll_interval=0.01, stop=stop))
+            results = []
+            async for result in pipeline.results():
+                results.append(result)
+                if len(results) == len(self.s_files):
+                    stop.set()
+            await watcher
+            return results
+
+        with mock.patch.object(Path, "iterdir", listed), \
+                mock.patch.object(Path, "is_file", lambda path: path.name == "vanished.txt" or is_file(path)):
+            results = asyncio.run(asyncio.wait_for(watch(), 10))
+        self.assertEqual(sorted(r["file"] for r in results), [str(f) for f in self.s_files])
+
+    def test_failed_watch_closes_pipeline(self) -> None:
+        async def watch() -> list[dict]:
+            pipeline = IngestionPipeline(self.mediator, self.original_dir)
+            await pipeline.start()
+            watcher = asyncio.create_task(pipeline.watch(self.test_dir / "missing"))
+            results = [result async for result in pipeline.results()]
+            with self.assertRaises(FileNotFoundError):
+                await watcher
+            return results
+
+        self.assertEqual(asyncio.run(asyncio.wait_for(watch(), 10)), [])
+
+    def test_threshold_follows_mediator(self) -> None:
+        mediator = ModelMediator(CosineAlgorithm("count"), threshold=101.0)
+        results = asyncio.run(IngestionPipeline(mediator, self.original_dir).run(self.s_files))
+        self.assertFalse(any(r["is_plagiarism"] for r in results))
+        mediator.threshold = 99.0
+        results = asyncio.run(IngestionPipeline(mediator, self.original_dir).run(self.s_files))
+        self.assertEqual([r["name"] for r in results if r["is_plagiarism"]], ["FID-03"])
+        results = asyncio.run(IngestionPipeline(mediator, self.original_dir, threshold=101.0).run(self.s_files))
+        self.assertFalse(any(r["is_plagiarism"] for r in results))
+
+    def test_failed_batch_reports_error(self) -> None:
+        pipeline = IngestionPipeline(self.mediator, self.original_dir, batch_size=2)
+        with mock.patch.object(self.mediator, "compare_files", side_effect=RuntimeError("scoring failed")):
+            results = asyncio.run(asyncio.wait_for(pipeline.run(self.s_files), 5))
+        self.assertEqual(sorted(r["file"] for r in results), [str(f) for f in self.s_files])
+        self.assertTrue(all(r["error"] == "scoring failed" and r["matches"] == [] for r in results))
+
+    def test_cache_is_restored(self) -> None:
+        Fm.disable_cache()
+        asyncio.run(IngestionPipeline(self.mediator, self.original_dir).run(self.s_files))
+        self.assertIsNone(Fm.cache)
+        cache = Fm.enable_cache()
+        asyncio.run(IngestionPipeline(self.mediator, self.original_dir).run(self.s_files))
+        self.assertIs(Fm.cache, cache)
+        Fm.disable_cache()
+        asyncio.run(IngestionPipeline(self.mediator, self.original_dir, use_cache=False).run(self.s_files))
+        self.assertIsNone(Fm.cache)
+
+    def test_submit_after_close(self) -> None:
+        async def submit() -> None:
+            pipeline = IngestionPipeline(self.mediator, self.original_dir)
+            await pipeline.start()
+            await pipeline.close()
+            await pipeline.submit(self.s_files[0])
+
+        with self.assertRaises(ValueError):
+            asyncio.run(submit())
@@ -0,0 +1,126 @@
+import json
+import shutil
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase, mock
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.service import ScoringServer, ScoringService
+
+
+class TestScoringService(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.test_dir = Path(tempfile.mkdtemp())
+        cls.original_dir = cls.test_dir / "original"
+        cls.original_dir.mkdir()
+        originals = ["the quick brown fox jumps over the lazy dog",
+                     "a journey of a thousand miles begins with a single step",
+                     "all that glitters is not gold"]
+        for i, text in enumerate(originals):
+            (cls.original_dir / f"org-{i:03d}.txt").write_text(text, encoding="utf-8")
+        cls.service = ScoringService(cls.original_dir, ("count", "tfidf")).load()
+        cls.server = ScoringServer(cls.service, port=0, workers=2)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+        shutil.rmtree(cls.test_dir)
+
+    def request(self, path: str, payload: dict | None = None, url: str | None = None) -> tuple[int, dict]:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        try:
+            with urllib.request.urlopen(urllib.request.Request((url or self.url) + path, data=data)) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_health(self) -> None:
+        status, body = self.request("/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(body["documents"], 3)
+        self.assertEqual(body["models"], ["count", "tfidf"])
+
+    def test_score_matches_models(self) -> None:
+        text = "the quick brown fox jumps over a lazy cat"
+        status, body = self.request("/score", {"text": text, "top_k": 2})
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body["matches"]), 2)
+        self.assertEqual(Path(body["original"]).name, "org-000.txt")
+        expected = sum(CosineAlgorithm(vec_type).fit(self.original_dir).score(text)[0]
+                       for vec_type in ("count", "tfidf")) / 2
+        self.assertAlmostEqual(body["score"], expected)
+
+    def test_score_batch_concurrent(self) -> None:
+        texts = ["all that glitters is gold", "a journey of a thousand steps", "the lazy dog"]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            responses = list(executor.map(lambda _: self.request("/score/batch", {"texts": texts}), range(8)))
+        for status, body in responses:
+            self.assertEqual(status, 200)
+            self.assertEqual([Path(r["original"]).name for r in body["results"]],
+                             ["org-002.txt", "org-001.txt", "org-000.txt"])
+
+    def test_invalid_requests(self) -> None:
+        self.assertEqual(self.request("/score", {"texts": ["missing text"]})[0], 400)
+        self.assertEqual(self.request("/score", {"text": "a text", "top_k": 0})[0], 400)
+        self.assertEqual(self.request("/score/batch", {"texts": [1, 2]})[0], 400)
+        self.assertEqual(self.request("/score/batch", {"texts": "not a list"})[0], 400)
+        self.assertEqual(self.request("/score/batch", {"texts": {"a": "text"}})[0], 400)
+        self.assertEqual(self.request("/unknown", {"text": "a text"})[0], 404)
+        self.assertEqual(self.request("/unknown")[0], 404)
+
+    def test_pending_limit(self) -> None:
+        server = ScoringServer(self.service, port=0, workers=1, max_pending=1)
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        started, release = threading.Event(), threading.Event()
+
+        def score_texts(texts: list[str], top_k: int = 1) -> list[dict]:
+            started.set()
+            release.wait(10)
+            return [{"text": text} for text in texts]
+        try:
+            with mock.patch.object(self.service, "score_texts", side_effect=score_texts), \
+                    ThreadPoolExecutor(max_workers=1) as executor:
+                first = executor.submit(self.request, "/score", {"text": "a text"}, url)
+                self.assertTrue(started.wait(10))
+                self.assertEqual(self.request("/score", {"text": "a text"}, url)[0], 503)
+                self.assertEqual(self.request("/health", url=url)[0], 200)
+                release.set()
+                self.assertEqual(first.result(10), (200, {"text": "a text"}))
+            self.assertEqual(self.request("/score", {"text": "a journey"}, url)[0], 200)
+        finally:
+            release.set()
+            server.shutdown()
+            server.server_close()
+
+    def test_index_dir(self) -> None:
+        index_dir = self.test_dir / "index"
+        ScoringService(self.original_dir, ("tfidf",), index_dir).load()
+        self.assertTrue((index_dir / "tfidf" / "manifest.json").is_file())
+        service = ScoringService(self.original_dir, ("tfidf",), index_dir).load()
+        self.assertEqual(len(service.doc_ids), 3)
+        self.assertEqual(service.score_texts(["all that glitters is not gold"])[0]["original"],
+                         str(self.original_dir / "org-002.txt"))
+
+    def test_fingerprints(self) -> None:
+        service = ScoringService(self.original_dir, ("tfidf",), fingerprints=True).load()
+        results = service.score_texts(["ALL that glitters, is not gold.", "the lazy dog"], top_k=2)
+        self.assertEqual([r["stage"] for r in results], ["exact", "cosine"])
+        self.assertEqual((results[0]["score"], results[0]["original"]), (100.0, str(self.original_dir / "org-002.txt")))
+        self.assertEqual(len(results[1]["matches"]), 2)
+        self.assertEqual(service.stages, {"exact": 1, "cosine": 1})
+        # The other matches of a copy come from the cosine scores
+        expected = ScoringService(self.original_dir, ("tfidf",)).load().score_texts(["ALL that glitters, is not gold."],
+                                                                                   top_k=3)[0]["matches"]
+        self.assertEqual(results[0]["matches"][1:], expected[1:2])
+        self.assertEqual(len(service.score_texts(["ALL that glitters, is not gold."], top_k=5)[0]["matches"]), 3)
+        self.assertEqual(len(service.score_texts(["ALL that glitters, is not gold."])[0]["matches"]), 1)
@@ -0,0 +1,78 @@
+import shutil
+import tempfile
+import threading
+from multiprocessing.connection import Listener
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import ModelMediator
+from src.algorithms.sharded_algorithm import ShardedCosineAlgorithm, ShardedIndex, serve_shard, shard_of
+from src.util.generator import Generator
+from src.util.text import Document
+
+
+class TestShardedCosineAlgorithm(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.test_dir = Path(tempfile.mkdtemp())
+        Generator().generate_corpus(cls.test_dir, 40, 6, doc_length=60, plagiarism_rate=0.5, seed=3)
+        cls.original_dir = cls.test_dir / "original"
+        cls.s_files = sorted((cls.test_dir / "suspicious").iterdir())
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(cls.test_dir)
+
+    def test_shard_of(self) -> None:
+        self.assertEqual(shard_of("/a/org-001.txt", 4), shard_of("/b/org-001.txt", 4))
+        self.assertLess(shard_of("org-002.txt", 3), 3)
+
+    def test_scores_match_unsharded(self) -> None:
+        for vec_type, n_features, compact in (("tfidf", None, False), ("count", None, False), ("tfidf", 2 ** 12, True)):
+            model = ShardedCosineAlgorithm(vec_type, n_shards=3, n_features=n_features, compact=compact)
+            try:
+                scores, doc_ids = model.score_files(self.original_dir, self.s_files)
+            finally:
+                model.close()
+            expected, expected_ids = CosineAlgorithm(vec_type, n_features=n_features,
+                                                     compact=compact).score_files(self.original_dir, self.s_files)
+            self.assertEqual(doc_ids, expected_ids)
+            np.testing.assert_allclose(scores, expected, atol=1e-3 if compact else 1e-9)
+
+    def test_top_k_merge(self) -> None:
+        model = ShardedCosineAlgorithm("tfidf", n_shards=3)
+        try:
+            top = model.compare_texts(self.original_dir, self.s_files[0], top_k=5)
+            full = model.compare_texts(self.original_dir, self.s_files[0])
+            mediator = ModelMediator(model)
+            best = mediator.compare_dir(self.original_dir, self.s_files[0])
+        finally:
+            model.close()
+        self.assertEqual(model.index.n_shards, 0)
+        expected = sorted(full, key=lambda x: -x[0])[:5]
+        self.assertEqual([m[1] for m in top], [m[1] for m in expected])
+        np.testing.assert_allclose([m[0] for m in top], [m[0] for m in expected])
+        self.assertEqual(best, top[0])
+
+    def test_remote_workers(self) -> None:
+        listeners = [Listener(("127.0.0.1", 0), authkey=b"secret") for _ in range(2)]
+        threads = [threading.Thread(target=serve_shard, args=(listener,), daemon=True) for listener in listeners]
+        for thread in threads:
+            thread.start()
+        index = ShardedIndex("tfidf")
+        try:
+            index.start([listener.address for listener in listeners], b"secret").fit(self.original_dir)
+            term_counts = [Document(s_file).term_counts for s_file in self.s_files]
+            scores, _ = index.score_counts(term_counts)
+        finally:
+            index.close()
+            for thread, listener in zip(threads, listeners):
+                thread.join()
+                listener.close()
+        expected, _ = CosineAlgorithm("tfidf").score_files(self.original_dir, self.s_files)
+        np.testing.assert_allclose(scores, expected, atol=1e-9)
+        with self.assertRaises(ValueError):
+            ShardedIndex("tfidf").start([("127.0.0.1", 1)])
@@ -0,0 +1,59 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src.util.benchmark import classification_metrics, compare_reports, percentiles, run_scenario, run_startup
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_percentiles(self):
+        result = percentiles([1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(result["p50"], 2.5)
+        self.assertEqual(result["max"], 4.0)
+        self.assertEqual(percentiles([])["mean"], 0.0)
+
+    def test_classification_metrics(self):
+        predicted = {"a": True, "b": True, "c": False, "d": False}
+        expected = {"a": True, "b": False, "c": True, "d": False}
+        self.assertEqual(classification_metrics(predicted, expected),
+                         {"accuracy": 0.5, "precision": 0.5, "recall": 0.5})
+
+    def test_run_scenario(self):
+        # Act
+        result = run_scenario(30, 10, doc_length=80, plagiarism_rate=0.5, work_dir=self.test_dir)
+
+        # Assert
+        self.assertEqual(result["n_originals"], 30)
+        self.assertGreater(result["docs_per_second"], 0)
+        self.assertGreaterEqual(result["accuracy"], 0.9)
+        self.assertGreaterEqual(result["rss_increase_mb"], 0)
+        self.assertLessEqual(result["rss_increase_mb"], result["peak_rss_mb"])
+
+        # Compare against itself
+        report = {"scenarios": [result]}
+        changes = compare_reports(report, report)
+        self.assertEqual(changes[0]["ratios"]["accuracy"], 1.0)
+
+    def test_threshold_reaches_run_comparison(self):
+        with mock.patch("src.algorithms.model.ModelMediator.run_comparison", autospec=True) as run_comparison:
+            result = run_scenario(10, 4, doc_length=40, threshold=35.0, work_dir=self.test_dir)
+        self.assertEqual(run_comparison.call_args[0][0].threshold, 35.0)
+        self.assertEqual(result["threshold"], 35.0)
+
+    def test_run_startup(self):
+        # Act
+        result = run_startup(20, doc_length=50, runs=1, work_dir=self.test_dir)
+
+        # Assert
+        self.assertGreater(result["import_seconds"]["p50"], 0)
+        self.assertGreater(result["first_score_seconds"]["p50"], 0)
+        self.assertGreaterEqual(result["process_seconds"]["p50"], result["import_seconds"]["p50"])
+        self.assertFalse(result["sklearn_loaded"])
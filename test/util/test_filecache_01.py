@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.util.file_cache import FileCache
+from src.util.file_manager import FileManager
+
+
+class TestFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.file = self.test_dir / "file.txt"
+        self.file.write_text("hello world", encoding="utf-8")
+        self.cache = FileCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_read_hit(self):
+        self.assertEqual(self.cache.read(self.file), "hello world")
+        self.assertEqual(self.cache.read(self.file), "hello world")
+        self.assertEqual(self.cache.stats()["hits"], 1)
+        self.assertEqual(self.cache.stats()["misses"], 1)
+
+    def test_invalidation(self):
+        self.cache.read(self.file)
+        self.file.write_text("goodbye world", encoding="utf-8")
+        os.utime(self.file, ns=(0, 0))
+        self.assertEqual(self.cache.read(self.file), "goodbye world")
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_same_content_shares_entry(self):
+        copy = self.test_dir / "copy.txt"
+        shutil.copy(self.file, copy)
+        self.cache.read(self.file)
+        self.cache.read(copy)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_eviction(self):
+        cache = FileCache(max_bytes=1)
+        other = self.test_dir / "other.txt"
+        other.write_text("another file", encoding="utf-8")
+        cache.read(self.file)
+        cache.read(other)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_derive(self):
+        calls = []
+
+        def split(text):
+            calls.append(text)
+            return text.split()
+
+        self.assertEqual(self.cache.derive(self.file, "words", split), ["hello", "world"])
+        self.assertEqual(self.cache.derive(self.file, "words", split), ["hello", "world"])
+        self.assertEqual(len(calls), 1)
+
+    def test_file_manager_cache(self):
+        cache = FileManager.enable_cache()
+        try:
+            self.assertEqual(FileManager.read_derived(self.file, "upper", str.upper), "HELLO WORLD")
+            self.assertEqual(FileManager.read_derived(self.file, "upper", str.upper), "HELLO WORLD")
+            self.assertEqual(cache.stats()["hits"], 1)
+        finally:
+            FileManager.disable_cache()
+        self.assertIsNone(FileManager.cache)
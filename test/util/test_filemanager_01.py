@@ -99,6 +99,19 @@ class TestFileManager(unittest.TestCase):
         # Delete the temporary file
         os.remove(temp_file)
 
+    def test_read_chunks(self):
+        temp_file = Path("temp_chunks.txt")
+        text = "hello world\nthis is a streamed   file averyveryverylongword end"
+        with open(temp_file, "w") as f:
+            f.write(text)
+
+        # Test that chunks rebuild the file and never split a word
+        chunks = list(FileManager.read_chunks(temp_file, chunk_size=16))
+        self.assertEqual("".join(chunks), text)
+        self.assertEqual(sum(len(chunk.split()) for chunk in chunks), len(text.split()))
+
+        os.remove(temp_file)
+
     def test_create_corpus(self):
         # Mock the read_file method to return a string
         FileManager.read_file = MagicMock(return_value="hello world")
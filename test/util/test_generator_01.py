@@ -49,3 +49,26 @@ class TestGenerator(unittest.TestCase):
         # Assert
         self.assertFalse(os.path.exists(invalid_dir))
 
+    def test_generate_corpus(self):
+        # Act
+        ground_truth = self.generator.generate_corpus(self.test_dir, 10, 8, doc_length=50, plagiarism_rate=0.5)
+
+        # Assert
+        self.assertEqual(len(os.listdir(os.path.join(self.test_dir, "original"))), 10)
+        self.assertEqual(sorted(ground_truth), sorted(f[:-4] for f in os.listdir(os.path.join(self.test_dir, "suspicious"))))
+        self.assertTrue(os.path.isfile(os.path.join(self.test_dir, "groundTruth.json")))
+
+    def test_generate_corpus_reproducible(self):
+        # Arrange
+        other_dir = tempfile.mkdtemp()
+
+        # Act
+        first = self.generator.generate_corpus(self.test_dir, 5, 5, doc_length=20, seed=3)
+        second = self.generator.generate_corpus(other_dir, 5, 5, doc_length=20, seed=3)
+
+        # Assert
+        self.assertEqual(first, second)
+        with open(os.path.join(self.test_dir, "original", "org-000000.txt")) as f, \
+                open(os.path.join(other_dir, "original", "org-000000.txt")) as g:
+            self.assertEqual(f.read(), g.read())
+        shutil.rmtree(other_dir)
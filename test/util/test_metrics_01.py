@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src.util.metrics import Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_disabled(self):
+        with self.metrics.time("stage"):
+            pass
+        self.metrics.count("documents")
+        summary = self.metrics.summary()
+        self.assertEqual(summary["stages"], {})
+        self.assertEqual(summary["counters"], {})
+
+    def test_enabled(self):
+        self.metrics.enable()
+        for _ in range(3):
+            with self.metrics.time("stage"):
+                pass
+        self.metrics.count("documents", 4)
+        summary = self.metrics.summary()
+        self.assertEqual(summary["stages"]["stage"]["count"], 3)
+        self.assertEqual(summary["counters"]["documents"], 4)
+        self.assertGreater(summary["documents_per_second"], 0)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in (0.001, 0.002, 0.004, 1.0):
+            histogram.add(seconds)
+        self.assertEqual(histogram.count, 4)
+        self.assertLessEqual(histogram.percentile(50), 0.003)
+        self.assertEqual(histogram.percentile(100), 1.0)
+
+    def test_dump(self):
+        self.metrics.enable()
+        self.metrics.count("bytes_read", 10)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        self.metrics.dump(path, {"cache": {"hits": 1}})
+        with open(path) as f:
+            summary = json.load(f)
+        os.remove(path)
+        self.assertEqual(summary["counters"]["bytes_read"], 10)
+        self.assertEqual(summary["cache"]["hits"], 1)
@@ -0,0 +1,29 @@
+import time
+import unittest
+
+from src.util.parallel import imap_shards, map_shards
+
+
+def _sleep_shard(delay: float, shard: list) -> list:
+    time.sleep(delay)
+    return [item * 2 for item in shard]
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_map_shards(self):
+        shards = [[1, 2], [3], [4, 5]]
+        self.assertEqual(map_shards(_sleep_shard, 0.0, shards, workers=2), [[2, 4], [6], [8, 10]])
+        self.assertEqual(map_shards(_sleep_shard, 0.0, shards), [[2, 4], [6], [8, 10]])
+
+    def test_imap_shards_stops_early(self):
+        start = time.perf_counter()
+        results = imap_shards(_sleep_shard, 0.3, [[i] for i in range(20)], workers=2)
+        self.assertEqual(next(results), [0])
+        results.close()
+        # The 18 shards not started yet are dropped instead of taking 10 rounds of 0.3 seconds
+        self.assertLess(time.perf_counter() - start, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import numpy as np
+
+from src.algorithms.cosine_algorithm import CosineAlgorithm
+from src.algorithms.model import MATCH_DTYPE, ModelMediator
+from src.util.config import ConfigManager
+from src.util.generator import Generator
+from src.util.result_sink import ConsoleSink, CsvSink, JsonLinesSink, NumpySink, ResultBatch, open_sink
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class TestResultSink(unittest.TestCase):
+
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.doc_ids = ["/originals/org-0.txt", '/originals/a, "quoted" name.txt', "/originals/org-2.txt"]
+        matches = np.zeros((2, 2), dtype=MATCH_DTYPE)
+        matches["doc"] = [[1, 0], [2, 1]]
+        matches["score"] = [[75.5, 12.25], [60.0, 3.0]]
+        self.batch = ResultBatch(["/suspicious/FID-1.txt", Path("/suspicious/FID-2.txt")], matches, self.doc_ids, 60.0)
+        self.expected = [("/suspicious/FID-1.txt", 1, self.doc_ids[1], 75.5, True),
+                         ("/suspicious/FID-1.txt", 2, self.doc_ids[0], 12.25, False),
+                         ("/suspicious/FID-2.txt", 1, self.doc_ids[2], 60.0, False),
+                         ("/suspicious/FID-2.txt", 2, self.doc_ids[1], 3.0, False)]
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_json_lines(self):
+        with JsonLinesSink(self.test_dir / "results.jsonl") as sink:
+            sink.write(self.batch)
+            sink.write(self.batch)
+        self.assertEqual((sink.rows, sink.batches), (8, 2))
+        with open(self.test_dir / "results.jsonl", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([tuple(row.values()) for row in rows], self.expected * 2)
+        self.assertEqual(list(rows[0]), ["file", "rank", "original", "score", "plagiarized"])
+
+    def test_csv(self):
+        with open_sink(self.test_dir / "results.csv") as sink:
+            self.assertIsInstance(sink, CsvSink)
+            sink.write(self.batch)
+        with open(self.test_dir / "results.csv", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([(r["file"], int(r["rank"]), r["original"], float(r["score"]), r["plagiarized"] == "true")
+                          for r in rows], self.expected)
+
+    def test_numpy(self):
+        with open_sink(self.test_dir / "results") as sink:
+            self.assertIsInstance(sink, NumpySink)
+            sink.write(self.batch)
+            # Every written batch can be read while the run goes on
+            self.assertEqual(len(NumpySink.read(self.test_dir / "results")["file"]), 4)
+            sink.write(self.batch)
+        columns = NumpySink.read(self.test_dir / "results")
+        rows = list(zip(*(columns[name].tolist() for name in ("file", "rank", "original", "score", "plagiarized"))))
+        self.assertEqual(rows, self.expected * 2)
+        self.assertEqual(sorted(p.name for p in (self.test_dir / "results").iterdir()),
+                         ["part-00000.npz", "part-00001.npz"])
+        with self.assertRaises(ValueError):
+            open_sink(self.test_dir / "results.txt", "xml")
+        with self.assertRaises(ValueError):
+            open_sink(self.test_dir / "results.json")
+        self.assertFalse((self.test_dir / "results.json").exists())
+        # A new run replaces the batches of the previous one
+        with open_sink(self.test_dir / "results") as sink:
+            sink.write(self.batch)
+        self.assertEqual(len(NumpySink.read(self.test_dir / "results")["file"]), 4)
+
+    def test_originals_encoded_once(self):
+        with mock.patch.object(JsonLinesSink, "encode", side_effect=json.dumps) as encode:
+            with JsonLinesSink(self.test_dir / "results.jsonl") as sink:
+                sink.write(self.batch)
+                # Same originals in a new list, as received from a worker process
+                sink.write(ResultBatch(self.batch.files, self.batch.matches, list(self.doc_ids), 60.0))
+        self.assertEqual(encode.call_count, 2 * len(self.batch.files) + len(self.doc_ids))
+
+    @unittest.skipIf(pyarrow is None, "pyarrow is not installed")
+    def test_arrow(self):
+        with open_sink(self.test_dir / "results.arrow") as sink:
+            sink.write(self.batch)
+        with pyarrow.OSFile(str(self.test_dir / "results.arrow"), "rb") as f:
+            table = pyarrow.ipc.open_stream(f).read_all()
+        self.assertEqual([tuple(row.values()) for row in table.to_pylist()], self.expected)
+
+    def test_console(self):
+        stream = io.StringIO()
+        ConsoleSink(stream, {"FID-1": True}).write(self.batch)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[:4], ["-------FID-1--------",
+                                     f"Results: True (75.500000% similarity with {self.doc_ids[1]})",
+                                     f"Also similar: 12.250000% similarity with {self.doc_ids[0]}",
+                                     "Expected result: True"])
+        self.assertEqual(lines[-1], "No ground truth found for file FID-2")
+
+    def test_run_comparison(self):
+        corpus_dir = self.test_dir / "corpus"
+        corpus_dir.mkdir()
+        Generator().generate_corpus(corpus_dir, 10, 12, doc_length=40, seed=4)
+        config_path = corpus_dir / "config.json"
+        config_path.write_text(json.dumps({"ORIGINAL_FILES": str(corpus_dir / "original"),
+                                           "SUSPICIOUS_FILES": str(corpus_dir / "suspicious"),
+                                           "GROUND_TRUTH": str(corpus_dir / "groundTruth.json")}))
+        mediator = ModelMediator(CosineAlgorithm("tfidf"), config_mgr=ConfigManager(config_path))
+        mediator.run_comparison(top_k=2, output=self.test_dir / "results.jsonl")
+        with open(self.test_dir / "results.jsonl", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        expected = mediator.compare_batch(corpus_dir / "original", corpus_dir / "suspicious", top_k=2)
+        self.assertEqual([(row["file"], row["original"]) for row in rows],
+                         [(f, path) for f, matches in expected.items() for _, path in matches])
+        np.testing.assert_allclose([row["score"] for row in rows],
+                                   [score for matches in expected.values() for score, _ in matches], atol=1e-4)
+
+
+if __name__ == '__main__':
+    unittest.main()